@@ -7,12 +7,16 @@
     var self = this;
 
     self.init = function() {
-      $('form.activity-refine .btn.download').on('click', function(e) {
+      $('form.activity-refine .download').on('click', function(e) {
+        var $form = $('form.activity-refine');
         e.preventDefault();
 
-        $('form.activity-refine').append('<input type="hidden" name="format" value="xlsx">');
-        $('form.activity-refine').submit();
-        $('form.activity-refine input[name="format"]').remove();
+        $form.append($('<input type="hidden" name="format" class="download-option">').val($(this).data('format')));
+        if ($(this).data('sheet')) {
+          $form.append($('<input type="hidden" name="sheet" class="download-option">').val($(this).data('sheet')));
+        }
+        $form.submit();
+        $form.find('input.download-option').remove();
       });
 
       Highcharts.setOptions({
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+#
+# Compare the speed of the matrix-based entropy calculation used for bias
+# scores with the original pure-Python loops, on random tables of source
+# counts.
+#
+#   python benchmark_entropy.py --groups 100 200 500 --parties 60
+#
+import argparse
+import random
+import timeit
+
+from dexter.processing.bias import BiasCalculator
+
+parser = argparse.ArgumentParser(description='Benchmark the bias entropy calculation.')
+parser.add_argument('--groups', type=int, nargs='+', default=[10, 100, 300, 1000], help='numbers of medium groups (table columns) to try')
+parser.add_argument('--parties', type=int, default=60, help='number of political parties (table rows)')
+parser.add_argument('--repeat', type=int, default=5, help='times to run each calculation, the fastest is reported')
+parser.add_argument('--seed', type=int, default=1, help='random seed')
+args = parser.parse_args()
+
+calc = BiasCalculator()
+rand = random.Random(args.seed)
+
+print "%8s %8s %12s %12s %8s" % ('groups', 'parties', 'loops (ms)', 'matrix (ms)', 'speed-up')
+
+for groups in args.groups:
+    table = {}
+    for g in xrange(groups):
+        table['group %d' % g] = dict(
+                ('party %d' % p, rand.randint(1, 500))
+                for p in xrange(args.parties) if rand.random() < 0.6)
+
+    if calc.calculate_entropy(table) != calc.calculate_entropy_loops(table):
+        raise ValueError("Results differ for %d groups" % groups)
+
+    loops = min(timeit.repeat(lambda: calc.calculate_entropy_loops(table), number=1, repeat=args.repeat))
+    matrix = min(timeit.repeat(lambda: calc.calculate_entropy(table), number=1, repeat=args.repeat))
+
+    print "%8d %8d %12.2f %12.2f %7.1fx" % (groups, args.parties, loops * 1000, matrix * 1000, loops / matrix)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+#
+# Compare the speed of merging extracted entities and keywords into a
+# document using the Document merge indexes, with the original linear
+# scans over the document's collections.
+#
+#   python benchmark_merging.py --entities 100 500 1000
+#
+# Each run adds the entities and keywords from one extractor, then merges
+# those from a second extractor, half of which are already on the document
+# with different capitalisation.
+#
+import argparse
+import timeit
+
+from dexter.models import Document, DocumentEntity, DocumentKeyword, Entity
+
+parser = argparse.ArgumentParser(description='Benchmark merging entities and keywords into documents.')
+parser.add_argument('--entities', type=int, nargs='+', default=[100, 500, 1000], help='numbers of entities (and keywords) per extractor to try')
+parser.add_argument('--repeat', type=int, default=3, help='times to run each merge, the fastest is reported')
+args = parser.parse_args()
+
+
+def linear_add_entity(doc, doc_entity):
+    # the original Document.add_entity
+    for de in doc.entities:
+        if de.entity == doc_entity.entity:
+            return de.add_offsets(doc_entity.offsets())
+
+    doc.entities.append(doc_entity)
+    return True
+
+def linear_add_keyword(doc, keyword):
+    # the original Document.add_keyword
+    for k in doc.keywords:
+        if k.keyword.lower() == keyword.keyword.lower():
+            return k.add_offsets(keyword.offsets())
+
+    doc.keywords.append(keyword)
+    return True
+
+def indexed_add_entity(doc, doc_entity):
+    return doc.add_entity(doc_entity)
+
+def indexed_add_keyword(doc, keyword):
+    return doc.add_keyword(keyword)
+
+
+def extracted(n, offset, upper):
+    """ Entities and keywords from an extractor. """
+    entities = []
+    keywords = []
+
+    for i in xrange(offset, offset + n):
+        name = 'Person %d' % i
+        e = Entity()
+        e.group = 'person'
+        e.name = name.upper() if upper else name
+
+        de = DocumentEntity()
+        de.entity = e
+        de.relevance = 0.5
+        de.offset_list = '%d:%d' % (i * 20, len(name))
+        entities.append(de)
+
+        k = DocumentKeyword()
+        k.keyword = 'keyword %d' % i
+        k.keyword = k.keyword.upper() if upper else k.keyword
+        k.relevance = 0.5
+        k.offset_list = '%d:%d' % (i * 20 + 10, len(k.keyword))
+        keywords.append(k)
+
+    return entities, keywords
+
+
+def merge(n, add_entity, add_keyword):
+    doc = Document()
+    doc.text = 'Text'
+
+    for offset, upper in [(0, False), (n // 2, True)]:
+        entities, keywords = extracted(n, offset, upper)
+        for de in entities:
+            add_entity(doc, de)
+        for k in keywords:
+            add_keyword(doc, k)
+
+    return doc
+
+
+print "%8s %12s %12s %8s" % ('entities', 'linear (ms)', 'indexed (ms)', 'speed-up')
+
+for n in args.entities:
+    # sanity check
+    linear = merge(n, linear_add_entity, linear_add_keyword)
+    indexed = merge(n, indexed_add_entity, indexed_add_keyword)
+    assert len(linear.entities) == len(indexed.entities) == n + n // 2
+    assert len(linear.keywords) == len(indexed.keywords) == n + n // 2
+
+    t_linear = min(timeit.repeat(lambda: merge(n, linear_add_entity, linear_add_keyword), number=1, repeat=args.repeat))
+    t_indexed = min(timeit.repeat(lambda: merge(n, indexed_add_entity, indexed_add_keyword), number=1, repeat=args.repeat))
+
+    print "%8d %12.1f %12.1f %7.1fx" % (n, t_linear * 1000, t_indexed * 1000, t_linear / t_indexed)
@@ -1,4 +1,5 @@
 from dexter.models import *
+from dexter.models.reference import reference
 from flask.ext.admin import Admin, expose, AdminIndexView
 from flask.ext.admin.contrib.sqla import ModelView
 from flask.ext.admin.model.template import macro
@@ -18,6 +19,10 @@ class MyModelView(ModelView):
     def is_accessible(self):
         return current_user.is_authenticated() and current_user.admin
 
+    def after_model_change(self, form, model, is_created):
+        # reference tables are cached
+        reference.invalidate(self.model)
+
 class MyIndexView(AdminIndexView):
 
     @expose('/')
@@ -1,5 +1,6 @@
 import logging
 import urlparse
+from functools import wraps
 from datetime import datetime, timedelta
 from dateutil.parser import parse
 log = logging.getLogger(__name__)
@@ -11,8 +12,10 @@ from sqlalchemy.orm import joinedload, lazyload
 from sqlalchemy.sql import func
 
 from .app import app
-from .models import db, Author, Person, Entity, Document, DocumentSource, Medium, Location, Topic, Affiliation
+from .models import db, Author, Person, Entity, Document, DocumentSource, DocumentRollup, Medium, Location, Topic, Affiliation
+from .models.reference import reference
 from .processing import BiasCalculator
+from .processing.feed_cache import feed_cache
 
 @app.route('/api/authors')
 @login_required
@@ -56,30 +59,43 @@ def api_group_entities(group):
     return jsonify({'entities': [e.json() for e in entities]})
 
 
+def cached_feed(f):
+    """ Serve the results of a feed from the feed cache, and answer
+    conditional requests with a 304. The feed function is called with the
+    requested start and end dates and must return a dict.
+
+    Only If-None-Match is supported. There's no Last-Modified, because
+    deleting a document doesn't change the time anything was last
+    modified. """
+    @wraps(f)
+    def wrapper():
+        start_date, end_date = api_date_range(request)
+        start, end = parse(start_date), parse(end_date)
+        etag = feed_cache.etag(request.endpoint, start, end)
+
+        if etag in request.if_none_match:
+            response = app.response_class(status=304)
+        else:
+            results = feed_cache.get(etag)
+            if results is None:
+                results = f(start_date, end_date)
+                # the rollups may be out of date
+                if not feed_cache.pending(start, end):
+                    feed_cache.put(etag, results)
+            response = jsonify(results)
+
+        response.set_etag(etag)
+        # clients must check with us before re-using a response
+        response.cache_control.no_cache = True
+        return response
+
+    return wrapper
+
+
 @app.route('/api/feeds/sources/political-parties')
 @htauth.authenticated
-def api_feed_parties():
-    from dexter.models.views import DocumentSourcesView, DocumentsView
-
-    start_date, end_date = api_date_range(request)
-
-    query = db.session.query(
-                func.count(DocumentSourcesView.c.document_id).label("record_count"),
-                DocumentSourcesView.c.affiliation.label("affiliation"),
-                DocumentSourcesView.c.source_name.label("source_name"),
-                DocumentsView.c.medium_group.label("medium_group"),
-                DocumentsView.c.medium_type.label("medium_type"),
-            )\
-            .join(DocumentsView, DocumentSourcesView.c.document_id == DocumentsView.c.document_id)\
-            .group_by(
-                DocumentSourcesView.c.affiliation.label("affiliation"),
-                DocumentSourcesView.c.source_name.label("source_name"),
-                DocumentsView.c.medium_group.label("medium_group"),
-                DocumentsView.c.medium_type.label("medium_type"),
-            )\
-            .filter(DocumentSourcesView.c.affiliation_code.like('4.%'))\
-            .filter(DocumentsView.c.published_at >= start_date)\
-            .filter(DocumentsView.c.published_at <= end_date)
+@cached_feed
+def api_feed_parties(start_date, end_date):
 
     # {
     #   "date-start":"2014-04-03",
@@ -94,85 +110,47 @@ def api_feed_parties():
     results = {
         "date-start": start_date,
         "date-end": end_date,
-        "cells": [r._asdict() for r in query.all()]
+        "cells": rollup_cells('party_source', start_date, end_date, 'affiliation', 'source_name'),
     }
 
-    return jsonify(results)
+    return results
 
 
 @app.route('/api/feeds/topics')
 @htauth.authenticated
-def api_feed_topics():
-    from dexter.models.views import DocumentSourcesView, DocumentsView
-
-    start_date, end_date = api_date_range(request)
-
-    query = db.session.query(
-                func.count(DocumentsView.c.document_id).label("record_count"),
-                DocumentsView.c.topic.label("topic"),
-                DocumentsView.c.medium_group.label("medium_group"),
-                DocumentsView.c.medium_type.label("medium_type"),
-            )\
-            .group_by(
-                DocumentsView.c.topic.label("topic"),
-                DocumentsView.c.medium_group.label("medium_group"),
-                DocumentsView.c.medium_type.label("medium_type"),
-            )\
-            .filter(DocumentsView.c.published_at >= start_date)\
-            .filter(DocumentsView.c.published_at <= end_date)
+@cached_feed
+def api_feed_topics(start_date, end_date):
 
     results = {
         "date-start": start_date,
         "date-end": end_date,
-        "cells": [r._asdict() for r in query.all()]
+        "cells": rollup_cells('topic', start_date, end_date, 'topic'),
     }
 
-    return jsonify(results)
+    return results
 
 
 @app.route('/api/feeds/origins')
 @htauth.authenticated
-def api_feed_origins():
-    from dexter.models.views import DocumentSourcesView, DocumentsView
-
-    start_date, end_date = api_date_range(request)
-
-    query = db.session.query(
-                func.count(DocumentsView.c.document_id).label("record_count"),
-                DocumentsView.c.origin.label("origin"),
-                DocumentsView.c.medium_group.label("medium_group"),
-                DocumentsView.c.medium_type.label("medium_type"),
-            )\
-            .group_by(
-                DocumentsView.c.origin.label("origin"),
-                DocumentsView.c.medium_group.label("medium_group"),
-                DocumentsView.c.medium_type.label("medium_type"),
-            )\
-            .filter(DocumentsView.c.published_at >= start_date)\
-            .filter(DocumentsView.c.published_at <= end_date)
+@cached_feed
+def api_feed_origins(start_date, end_date):
 
     results = {
         "date-start": start_date,
         "date-end": end_date,
-        "cells": [r._asdict() for r in query.all()]
+        "cells": rollup_cells('origin', start_date, end_date, 'origin'),
     }
 
-    return jsonify(results)
+    return results
 
 
 @app.route('/api/feeds/bias')
 @htauth.authenticated
-def api_feed_bias():
-    start_date, end_date = api_date_range(request)
+@cached_feed
+def api_feed_bias(start_date, end_date):
     calc = BiasCalculator()
 
-    log.info("Loading documents for bias calculation")
-    documents = calc.get_query()\
-            .filter(Document.published_at >= start_date)\
-            .filter(Document.published_at <= end_date).all()
-    log.info("Loaded %d docs" % len(documents))
-
-    scores = calc.calculate_bias_scores(documents, key=lambda d: (d.medium.group_name(), d.medium.medium_type))
+    scores = calc.calculate_rollup_bias_scores(*rollup_date_range(start_date, end_date))
 
     cells = []
     for score in scores:
@@ -187,7 +165,26 @@ def api_feed_bias():
         "cells": cells,
     }
 
-    return jsonify(results)
+    return results
+
+
+def rollup_cells(metric, start_date, end_date, label, sublabel=None):
+    """ Feed cells for +metric+, summed from the daily document rollups.
+    The rollup label and sublabel are named +label+ and +sublabel+. """
+    cells = []
+
+    for row in DocumentRollup.summary(metric, *rollup_date_range(start_date, end_date)):
+        cell = {
+            "record_count": int(row.record_count),
+            label: row.label,
+            "medium_group": row.medium_group,
+            "medium_type": row.medium_type,
+        }
+        if sublabel:
+            cell[sublabel] = row.sublabel
+        cells.append(cell)
+
+    return cells
 
 
 @app.route('/api/feeds/metadata')
@@ -195,7 +192,7 @@ def api_feed_bias():
 def api_feed_metadata():
     data = {}
 
-    media = Medium.query.all()
+    media = reference.all(Medium)
     data['media'] = {
         "bias_feed_url": "%s" % urlparse.urljoin(request.url_root, url_for('api_feed_bias')),
         "names": [m.name for m in media],
@@ -203,21 +200,21 @@ def api_feed_metadata():
     }
 
     data['origins'] = {
-        "names": [x.name for x in Location.query.all()],
+        "names": [x.name for x in reference.all(Location)],
         "feed_url": "%s" % urlparse.urljoin(request.url_root, url_for('api_feed_origins')),
     }
 
     data['topics'] = {
-        "names": [x.name for x in Topic.query.all()],
+        "names": [x.name for x in reference.all(Topic)],
         "feed_url": "%s" % urlparse.urljoin(request.url_root, url_for('api_feed_topics')),
     }
 
     data['affiliations'] = {
-        "names": [x.name for x in Affiliation.query.all()],
+        "names": [x.name for x in reference.all(Affiliation)],
     }
 
     data['political-parties'] = {
-        "names": [x.name for x in Affiliation.query.filter(Affiliation.code.like("4.%")).all()],
+        "names": [x.name for x in reference.all(Affiliation) if x.code.startswith("4.")],
         "feed_url": "%s" % urlparse.urljoin(request.url_root, url_for('api_feed_parties')),
     }
 
@@ -241,3 +238,8 @@ def api_date_range(request):
     end_date = end_date.strftime("%Y/%m/%d") + ' 23:59:59'
 
     return (start_date, end_date)
+
+
+def rollup_date_range(start_date, end_date):
+    """ The dates covered by the +api_date_range+ strings. """
+    return (parse(start_date).date(), parse(end_date).date())
@@ -6,13 +6,17 @@ from flask.ext.mako import render_template
 from flask.ext.login import login_required, current_user
 
 from .app import app
-from .models import db, Document, Issue, Person
+from .models import db, Document, Issue, Person, Job
 from .models.document import DocumentForm, DocumentAnalysisForm
 from .models.source import DocumentSource, DocumentSourceForm
 from .models.fairness import DocumentFairness, DocumentFairnessForm
 from .models.author import AuthorForm
 
-from .processing import DocumentProcessor, ProcessingError
+from .processing import DocumentProcessor, BatchProcessor, ProcessingError
+
+from wtforms import TextAreaField
+from flask_wtf.file import FileField
+from .forms import Form
 
 @app.route('/articles/<id>')
 @login_required
@@ -63,6 +67,12 @@ def new_article():
                     # already exists
                     flash("We already have that article.")
                     return redirect(url_for('show_article', id=doc.id))
+                elif app.config.get('ASYNC_JOBS'):
+                    # fetch and process it in the background
+                    job = Job.enqueue('process_url', {'url': url},
+                            user=current_user if current_user.is_authenticated() else None)
+                    db.session.commit()
+                    return redirect(url_for('show_job', id=job.id))
                 else:
                     try:
                         doc = proc.process_url(url)
@@ -104,6 +114,55 @@ def new_article():
             author_form=author_form)
 
 
+# most URLs that can be processed within a request, when there
+# are no background jobs
+SYNC_BATCH_LIMIT = 20
+
+
+@app.route('/articles/batch', methods=['GET', 'POST'])
+@login_required
+def batch_articles():
+    form = BatchArticlesForm()
+    results = None
+    batch = None
+
+    if request.method == 'POST' and form.validate():
+        urls = form.url_list()
+
+        if not urls:
+            flash("Please provide at least one URL.", 'error')
+        elif app.config.get('ASYNC_JOBS'):
+            # fetch and process them in the background
+            job = Job.enqueue('process_batch', {'urls': urls},
+                    user=current_user if current_user.is_authenticated() else None)
+            db.session.commit()
+            return redirect(url_for('show_job', id=job.id))
+        elif len(urls) > SYNC_BATCH_LIMIT:
+            # this must finish before the request times out
+            flash("Please provide at most %d URLs at a time." % SYNC_BATCH_LIMIT, 'error')
+        else:
+            batch = BatchProcessor(user=current_user if current_user.is_authenticated() else None)
+            results = [r.as_dict() for r in batch.process_urls(urls)]
+            flash("Processed %d URLs in %.1f seconds." % (len(results), batch.elapsed))
+
+    return render_template('articles/batch.haml',
+            form=form,
+            batch=batch,
+            results=results)
+
+
+class BatchArticlesForm(Form):
+    urls     = TextAreaField('URLs, one per line')
+    url_file = FileField('Or upload a file of URLs')
+
+    def url_list(self):
+        text = self.urls.data or ''
+        if self.url_file.has_file():
+            text = text + '\n' + self.url_file.data.read().decode('utf-8')
+
+        return [u.strip() for u in text.splitlines() if u.strip()]
+
+
 @app.route('/articles/<id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_article(id):
@@ -17,3 +17,23 @@ from .processing.extractors.alchemy import AlchemyExtractor
 from .processing.extractors.calais import CalaisExtractor
 AlchemyExtractor.API_KEY = app.config.get('ALCHEMY_API_KEY')
 CalaisExtractor.API_KEY = app.config.get('CALAIS_API_KEY')
+
+from .processing.extractors.base import BaseExtractor
+from .processing.extractors.cache import SQLiteCacheStore
+BaseExtractor.cache = SQLiteCacheStore(
+        app.config.get('EXTRACTOR_CACHE_PATH', 'cache/extractors.db'),
+        max_size=app.config.get('EXTRACTOR_CACHE_MAX_SIZE'))
+
+from .processing.crawlers.base import BaseCrawler
+from .processing.crawlers.html_cache import HTMLCache
+BaseCrawler.html_cache = HTMLCache(SQLiteCacheStore(
+        app.config.get('HTML_CACHE_PATH', 'cache/crawlers.db'),
+        max_size=app.config.get('HTML_CACHE_MAX_SIZE', 500 * 1024 * 1024)))
+
+from .processing.exports import exports
+exports.root = app.config.get('EXPORT_PATH', exports.root)
+
+from .processing.feed_cache import feed_cache
+feed_cache.store = SQLiteCacheStore(
+        app.config.get('FEED_CACHE_PATH', 'cache/feeds.db'),
+        max_size=app.config.get('FEED_CACHE_MAX_SIZE', 50 * 1024 * 1024))
@@ -3,20 +3,26 @@ from datetime import datetime, timedelta
 from collections import Counter
 
 from dexter.app import app
-from flask import request, url_for, flash, redirect, make_response, jsonify
+from flask import request, url_for, flash, redirect, jsonify, send_file, abort
 from flask.ext.mako import render_template
+from werkzeug.datastructures import MultiDict
 from flask.ext.login import login_required, current_user
+from flask.ext import htauth
 from flask.ext.sqlalchemy import Pagination
-from sqlalchemy.sql import func, distinct
+from sqlalchemy.sql import func, distinct, case, and_, or_
 from sqlalchemy.orm import joinedload
 
-from dexter.models import db, Document, Entity, Medium, User, DocumentSource
+from dexter.models import db, Document, Entity, Medium, User, DocumentSource, DocumentFairness, Fairness, Job
 from dexter.models.document import DocumentAnalysisProblem
+from dexter.models.reference import reference
 
 from wtforms import validators, HiddenField, TextField
 from wtforms.fields.html5 import DateField
 from .forms import Form, SelectField, MultiCheckboxField
 from .processing.xlsx import XLSXBuilder
+from .processing.tabular import TabularBuilder, CSVBuilder, ParquetBuilder
+from .processing.exports import exports
+from .processing.jobs import JobRunner
 
 @app.route('/dashboard')
 @login_required
@@ -99,16 +105,20 @@ def activity():
 
     if form.format.data == 'chart-json':
         # chart data in json format
-        return jsonify(ActivityChartHelper(query.all()).chart_data())
+        return jsonify(ActivityChartHelper(form.filter_query(db.session.query(Document.id))).chart_data())
 
-    elif form.format.data == 'xlsx':
-        # excel spreadsheet
-        excel = XLSXBuilder(form).build()
+    elif form.format.data in EXPORT_FORMATS:
+        # excel spreadsheet, csv, etc.
+        fmt = form.format.data
+        if fmt == 'parquet' and not ParquetBuilder.available():
+            flash("Parquet exports aren't available.", 'error')
+            return redirect(url_for('activity', **dict(form.as_dict(), format='html')))
 
-        response = make_response(excel)
-        response.headers["Content-Disposition"] = "attachment; filename=%s" % form.filename()
-        response.headers["Content-Type"] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        return response
+        key, job = prepare_export(form, current_user if current_user.is_authenticated() else None)
+        if job:
+            return redirect(url_for('show_job', id=job.id))
+
+        return redirect(url_for('download_export', format=fmt, key=key, filename=form.filename()))
 
     # do manual pagination
     query = query.order_by(Document.created_at.desc())
@@ -126,7 +136,117 @@ def activity():
     return render_template('dashboard/activity.haml',
                            form=form,
                            paged_docs=paged_docs,
-                           doc_groups=doc_groups)
+                           doc_groups=doc_groups,
+                           parquet=ParquetBuilder.available())
+
+
+# builders for each export format
+EXPORT_FORMATS = {
+    'xlsx': XLSXBuilder,
+    'csv': CSVBuilder,
+    'parquet': ParquetBuilder,
+}
+
+
+@app.route('/exports/<format>/<key>')
+@login_required
+def download_export(format, key):
+    builder = EXPORT_FORMATS.get(format)
+    try:
+        if not builder or not exports.exists(key):
+            abort(404)
+    except ValueError:
+        abort(404)
+
+    # stream the file back in chunks
+    return send_file(exports.open(key),
+                     mimetype=builder.MIMETYPE,
+                     as_attachment=True,
+                     attachment_filename=request.args.get('filename', 'documents.%s' % builder.EXTENSION),
+                     add_etags=False)
+
+
+@app.route('/api/exports/<format>')
+@htauth.authenticated
+def api_export(format):
+    """ Export the documents matching the activity filters in the query string,
+    such as +published_at+, +medium_id+ and +sheet+, in +format+. If the export
+    has to be built in the background, this answers 202 and the client
+    should try again later. """
+    form = ActivityForm(request.args, csrf_enabled=False)
+    form.format.data = format
+
+    builder = EXPORT_FORMATS.get(format)
+    if not builder or (builder is ParquetBuilder and not ParquetBuilder.available()):
+        abort(404)
+    if issubclass(builder, TabularBuilder) and (form.sheet.data or 'documents') not in builder.SHEETS:
+        abort(400)
+
+    key, job = prepare_export(form)
+    if job:
+        response = jsonify({'job': job.as_dict()})
+        response.status_code = 202
+        response.headers['Retry-After'] = '30'
+        return response
+
+    return send_file(exports.open(key),
+                     mimetype=builder.MIMETYPE,
+                     as_attachment=True,
+                     attachment_filename=form.filename(),
+                     add_etags=False)
+
+
+def prepare_export(form, user=None):
+    """ Make sure the export for +form+ exists, building it now or, with
+    ASYNC_JOBS, in the background. Returns the export's key and the job
+    building it, or None if the export is ready. """
+    key = exports.key(form.as_dict(), form.format.data)
+    if exports.exists(key):
+        return key, None
+
+    if not app.config.get('ASYNC_JOBS'):
+        exports.save(key, EXPORT_FORMATS[form.format.data](form).write)
+        return key, None
+
+    # don't build the same export twice
+    jobs = Job.query.filter(Job.job_type == 'export_activity', Job.status.in_([Job.PENDING, Job.RUNNING]))
+    for job in jobs:
+        if job.get_payload()['key'] == key:
+            return key, job
+
+    job = Job.enqueue('export_activity', {
+        'filters': form.as_dict(),
+        'key': key,
+        'filename': form.filename(),
+        }, user=user)
+    db.session.commit()
+    return key, job
+
+
+@JobRunner.handler('export_activity')
+def export_activity(job):
+    """ Build an export of documents in the background. """
+    payload = job.get_payload()
+    fmt = payload['filters']['format']
+
+    if not exports.exists(payload['key']):
+        # forms need a request context
+        with app.test_request_context():
+            form = ActivityForm(activity_filters(payload['filters']), csrf_enabled=False)
+            exports.save(payload['key'], EXPORT_FORMATS[fmt](form).write)
+
+    return {'format': fmt, 'key': payload['key'], 'filename': payload['filename']}
+
+
+def activity_filters(filters):
+    """ Turn the +ActivityForm.as_dict()+ output back into form data. """
+    data = MultiDict()
+    for name, value in filters.iteritems():
+        if isinstance(value, list):
+            data.setlist(name, value)
+        elif value is not None:
+            data[name] = value
+    return data
 
 
 class ActivityForm(Form):
@@ -136,6 +256,7 @@ class ActivityForm(Form):
     published_at   = TextField('Published', [validators.Optional()])
     problems       = MultiCheckboxField('Article problems', [validators.Optional()], choices=DocumentAnalysisProblem.for_select())
     format         = HiddenField('format', default='html') 
+    sheet          = HiddenField('sheet', default='documents')
 
     def __init__(self, *args, **kwargs):
         super(ActivityForm, self).__init__(*args, **kwargs)
@@ -143,7 +264,7 @@ class ActivityForm(Form):
         self.user_id.choices = [['', '(any)']] + [
                 [str(u.id), u.short_name()] for u in sorted(User.query.all(), key=lambda u: u.short_name())]
 
-        self.medium_id.choices = [['', '(any)']] + [(str(m.id), m.name) for m in Medium.query.order_by(Medium.name).all()]
+        self.medium_id.choices = [['', '(any)']] + [(str(m.id), m.name) for m in reference.all(Medium, order_by='name')]
 
         # dynamic default
         if not self.created_at.data and not self.published_at.data and not self.user_id.data and not self.medium_id.data:
@@ -230,15 +351,32 @@ class ActivityForm(Form):
             filename.append('published')
             filename.append(self.published_at.data.replace(' ', ''))
 
-        return "%s.%s" % ('-'.join(filename), self.format.data)
+        builder = EXPORT_FORMATS.get(self.format.data)
+        if not builder:
+            return "%s.%s" % ('-'.join(filename), self.format.data)
+
+        if issubclass(builder, TabularBuilder):
+            # these have one sheet per file
+            filename.append(self.sheet.data or 'documents')
+
+        return "%s.%s" % ('-'.join(filename), builder.EXTENSION)
 
     def as_dict(self):
         return dict((f.name, f.data) for f in self if f.name != 'csrf_token')
 
 
 class ActivityChartHelper:
-    def __init__(self, docs):
-        self.docs = docs
+    """
+    Chart data for the activity page. Each chart is calculated with an
+    aggregate query over the matching documents, so the work done in
+    Python depends on the number of days, users, media, etc. in the
+    charts, not the number of documents.
+    """
+    def __init__(self, query):
+        """ +query+ is a query that matches the documents to chart, such as
+        from +ActivityForm.filter_query+. """
+        self.query = query
+        self.docs = query.with_entities(Document.id.label('id')).distinct().subquery('chart_documents')
 
 
     def chart_data(self):
@@ -252,48 +390,101 @@ class ActivityChartHelper:
                 'fairness': self.fairness_chart(),
             },
             'summary': {
-                'documents': len(self.docs)
+                'documents': self.count()
             }
         }
 
 
+    def grouped(self, *columns):
+        """ A query for +columns+ and the number of matching documents,
+        grouped by +columns+. """
+        return db.session.query(*(list(columns) + [func.count(Document.id)]))\
+            .select_from(Document)\
+            .join(self.docs, self.docs.c.id == Document.id)\
+            .group_by(*columns)
+
+    def count(self):
+        return db.session.query(func.count(self.docs.c.id)).scalar()
+
+    def daily_counts(self, column):
+        counts = Counter()
+        for day, n in self.grouped(func.date(column)):
+            # some databases give us dates, others strings
+            if isinstance(day, basestring):
+                day = datetime.strptime(day[0:10], '%Y-%m-%d')
+            counts[day.strftime('%Y/%m/%d')] += n
+        return dict(counts)
+
+
     def created_chart(self):
         return {
-            'values': dict(Counter(d.created_at.strftime('%Y/%m/%d') for d in self.docs))
+            'values': self.daily_counts(Document.created_at)
         }
 
     def published_chart(self):
         return {
-            'values': dict(Counter(d.published_at.strftime('%Y/%m/%d') for d in self.docs))
+            'values': self.daily_counts(Document.published_at)
         }
 
     def users_chart(self):
+        counts = dict(self.grouped(Document.created_by_user_id).all())
+        users = dict((u.id, u) for u in User.query.filter(User.id.in_([id for id in counts if id is not None])))
+
+        values = Counter()
+        for user_id, n in counts.iteritems():
+            values[users[user_id].short_name() if user_id in users else ''] += n
+
         return {
-            'values': dict(Counter(d.created_by.short_name() if d.created_by else '' for d in self.docs))
+            'values': dict(values)
         }
 
     def fairness_chart(self):
+        # fair documents have no fairness entries, or just one 'Fair' entry
+        fairness = db.session.query(
+                DocumentFairness.doc_id.label('doc_id'),
+                func.count(DocumentFairness.id).label('entries'),
+                func.sum(case([(Fairness.name == 'Fair', 1)], else_=0)).label('fair'))\
+            .join(Fairness, DocumentFairness.fairness_id == Fairness.id)\
+            .group_by(DocumentFairness.doc_id)\
+            .subquery('chart_fairness')
+
         counts = Counter()
-        for d in self.docs:
-            if d.is_fair():
-                counts.update(['Fair'])
-            else:
-                counts.update(f.fairness.name for f in d.fairness)
+
+        fair = self.grouped()\
+            .outerjoin(fairness, fairness.c.doc_id == Document.id)\
+            .filter(or_(fairness.c.doc_id == None, and_(fairness.c.entries == 1, fairness.c.fair == 1)))\
+            .scalar()
+        if fair:
+            counts['Fair'] += fair
+
+        # for other documents, count each fairness entry
+        unfair = db.session.query(Fairness.name, func.count(DocumentFairness.id))\
+            .select_from(DocumentFairness)\
+            .join(Fairness, DocumentFairness.fairness_id == Fairness.id)\
+            .join(self.docs, self.docs.c.id == DocumentFairness.doc_id)\
+            .join(fairness, fairness.c.doc_id == DocumentFairness.doc_id)\
+            .filter(or_(fairness.c.entries != 1, fairness.c.fair != 1))\
+            .group_by(Fairness.name)
+        for name, n in unfair:
+            counts[name] += n
+
         return {
             'values': dict(counts)
         }
 
     def media_chart(self):
+        values = Counter()
+        types = {}
+        for name, medium_type, n in self.grouped(Medium.name, Medium.medium_type).join(Medium, Document.medium_id == Medium.id):
+            values[name] += n
+            types[name] = medium_type
+
         return {
-            'values': dict(Counter(d.medium.name for d in self.docs)),
-            'types': dict([d.medium.name, d.medium.medium_type] for d in self.docs)
+            'values': dict(values),
+            'types': types,
         }
 
     def problems_chart(self):
-        counts = Counter()
-        for d in self.docs:
-            counts.update(w.short_desc for w in d.analysis_problems())
-
         return {
-            'values': dict(counts)
+            'values': DocumentAnalysisProblem.counts(self.query)
         }
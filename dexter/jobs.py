@@ -0,0 +1,34 @@
+import logging
+log = logging.getLogger(__name__)
+
+from flask import url_for, flash, redirect, jsonify
+from flask.ext.mako import render_template
+from flask.ext.login import login_required
+
+from .app import app
+from .models import Job
+
+
+@app.route('/jobs/<int:id>')
+@login_required
+def show_job(id):
+    job = Job.query.get_or_404(id)
+
+    if job.status == Job.DONE and job.job_type == 'process_url':
+        result = job.get_result()
+        if result.get('existing'):
+            flash("We already have that article.")
+            return redirect(url_for('show_article', id=result['document_id']))
+
+        flash('Article added.')
+        return redirect(url_for('edit_article_analysis', id=result['document_id']))
+
+    return render_template('jobs/show.haml',
+            job=job)
+
+
+@app.route('/api/jobs/<int:id>')
+@login_required
+def api_job(id):
+    job = Job.query.get_or_404(id)
+    return jsonify(job.as_dict())
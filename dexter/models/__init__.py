@@ -11,3 +11,12 @@ from .location import Location
 from .issue import Issue
 from .fairness import Fairness, Affiliation, DocumentFairness
 from .user import User
+from .job import Job
+from .rollup import DocumentRollup, DocumentRollupDay, PendingRollup
+
+# cache small, seeded reference tables
+from .reference import reference
+from .author import AuthorType
+from .source import SourceFunction
+for model in [Medium, Gender, Race, Fairness, Affiliation, SourceFunction, Topic, Location, Issue, DocumentType, AuthorType]:
+    reference.register(model)
@@ -12,6 +12,7 @@ from wtforms import StringField, validators, SelectField, HiddenField
 
 from . import Person, Gender, Race
 from .support import db
+from .reference import reference
 from ..forms import Form
 
 import logging
@@ -85,11 +86,11 @@ class AuthorType(db.Model):
 
     @classmethod
     def journalist(cls):
-        return AuthorType.query.filter(AuthorType.name == 'Journalist').one()
+        return reference.one(AuthorType, name='Journalist')
 
     @classmethod
     def unknown(cls):
-        return AuthorType.query.filter(AuthorType.name == 'Unknown').one()
+        return reference.one(AuthorType, name='Unknown')
 
     @classmethod
     def create_defaults(cls):
@@ -121,9 +122,9 @@ class AuthorForm(Form):
 
         from . import Gender, Race
 
-        self.author_type_id.choices = [[str(a.id), a.name] for a in AuthorType.query.order_by(AuthorType.name).all()]
-        self.person_gender_id.choices = [['', '(unknown gender)']] + [[str(g.id), g.name] for g in Gender.query.order_by(Gender.name).all()]
-        self.person_race_id.choices = [['', '(unknown race)']] + [[str(r.id), r.name] for r in Race.query.order_by(Race.name).all()]
+        self.author_type_id.choices = [[str(a.id), a.name] for a in reference.all(AuthorType, order_by='name')]
+        self.person_gender_id.choices = [['', '(unknown gender)']] + [[str(g.id), g.name] for g in reference.all(Gender, order_by='name')]
+        self.person_race_id.choices = [['', '(unknown race)']] + [[str(r.id), r.name] for r in reference.all(Race, order_by='name')]
 
     def get_or_create_author(self):
         """ Get or create an author matching this form. Returns None if the form is not valid. """
@@ -132,6 +133,6 @@ class AuthorForm(Form):
 
         return Author.get_or_create(
                 name        = self.name.data,
-                author_type = AuthorType.query.get(self.author_type_id.data),
-                gender      = Gender.query.get(self.person_gender_id.data) if self.person_gender_id.data else None,
-                race        = Race.query.get(self.person_race_id.data) if self.person_race_id.data else None)
+                author_type = reference.get(AuthorType, self.author_type_id.data),
+                gender      = reference.get(Gender, self.person_gender_id.data),
+                race        = reference.get(Race, self.person_race_id.data))
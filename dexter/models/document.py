@@ -1,5 +1,6 @@
 import re
 import datetime
+from collections import defaultdict
 
 from wtforms import StringField, TextAreaField, validators, DateTimeField, HiddenField
 from wtforms.fields.html5 import URLField
@@ -16,10 +17,14 @@ from sqlalchemy import (
     Float,
     Text,
     func,
-    Index
+    Index,
+    and_,
+    exists,
     )
 from sqlalchemy.orm import relationship, backref
+from sqlalchemy.sql import case
 from .support import db
+from .reference import reference
 
 import logging
 
@@ -88,26 +93,25 @@ class Document(db.Model):
 
     def mentioned_entity(self, entity):
         """ Get the DocumentEntity for this entity, if any. """
-        for de in self.entities:
-            if de.entity == entity:
-                return de
-        return None
+        matches = self.merge_index('entities', document_entity_key).get(entity_key(entity))
+        return matches[0] if matches else None
 
 
     def add_entity(self, doc_entity):
         """ Add a new DocumentEntity to this document, but only
         if the entity and the specific offsets don't already exist on it. """
-        for de in self.entities:
-            if de.entity == doc_entity.entity:
-                return de.add_offsets(doc_entity.offsets())
+        de = self.mentioned_entity(doc_entity.entity)
+        if de:
+            return de.add_offsets(doc_entity.offsets())
 
-        self.entities.append(doc_entity)
+        self.indexed_append('entities', document_entity_key, doc_entity)
         return True
 
     def add_utterance(self, utterance):
         """ Add a new Utterance, but only if the same one doesn't already
         exist. """
-        for u in self.utterances:
+        # only utterances from the same entity can be the same
+        for u in self.merge_index('utterances', utterance_key).get(utterance_key(utterance), []):
             if u == utterance:
                 if utterance.offset is not None and u.offset is None:
                     u.offset = utterance.offset
@@ -116,28 +120,59 @@ class Document(db.Model):
                 else:
                     return False
 
-        self.utterances.append(utterance)
+        self.indexed_append('utterances', utterance_key, utterance)
         return True
 
     def add_keyword(self, keyword):
         """ Add a new keyword, but only if it's not already there. """
-        for k in self.keywords:
-            if k.keyword.lower() == keyword.keyword.lower():
-                return k.add_offsets(keyword.offsets())
-                
-        self.keywords.append(keyword)
+        matches = self.merge_index('keywords', keyword_key).get(keyword_key(keyword))
+        if matches:
+            return matches[0].add_offsets(keyword.offsets())
+
+        self.indexed_append('keywords', keyword_key, keyword)
         return True
 
     def add_source(self, source):
         """ Add a new source, but only if it's not already there. """
-        for s in self.sources:
-            if s.person == source.person:
-                return False
-                
-        self.sources.append(source)
+        if self.merge_index('sources', source_key).get(source_key(source)):
+            return False
+
+        self.indexed_append('sources', source_key, source)
         return True
 
 
+    def merge_index(self, collection, key):
+        """ A dict from +key(item)+ to lists of the items in the +collection+
+        relationship, such as 'entities'. This lets the add_ methods find
+        existing items without scanning the collection.
+
+        Indexes are built when first needed and kept up to date by
+        +indexed_append+. An index is rebuilt if the collection changes size
+        some other way, such as when items are appended or removed directly.
+        """
+        items = getattr(self, collection)
+        indexes = getattr(self, '_merge_indexes', None)
+        if indexes is None:
+            indexes = self._merge_indexes = {}
+
+        size, index = indexes.get(collection, (None, None))
+        if size != len(items):
+            index = defaultdict(list)
+            for item in items:
+                index[key(item)].append(item)
+            indexes[collection] = (len(items), index)
+
+        return index
+
+    def indexed_append(self, collection, key, item):
+        """ Append +item+ to the +collection+ relationship and its merge index. """
+        index = self.merge_index(collection, key)
+        items = getattr(self, collection)
+        items.append(item)
+        index[key(item)].append(item)
+        self._merge_indexes[collection] = (len(items), index)
+
+
     def normalise_text(self):
         """ Run some normalisations on the document. """
         if self.text:
@@ -181,6 +216,46 @@ class Document(db.Model):
         return "<Document id=%s, url=%s>" % (self.id, self.url)
 
 
+    @classmethod
+    def change_markers(cls, *criteria):
+        """ The latest +updated_at+ and the number of rows of the documents
+        matching +criteria+ and of their sources and fairness, as a list of
+        (latest, count) pairs. These change whenever those documents, their
+        sources or their fairness are added, changed or deleted, so they're
+        useful for keys of cached results. """
+        from . import DocumentSource, DocumentFairness
+
+        markers = []
+        for model in [cls, DocumentSource, DocumentFairness]:
+            query = db.session.query(func.max(model.updated_at), func.count(model.id))
+            if model is not cls:
+                query = query.join(cls, model.doc_id == cls.id)
+            markers.append(tuple(query.filter(*criteria).one()))
+
+        return markers
+
+
+# keys for the Document merge indexes
+
+def entity_key(entity):
+    """ Entities are equal if their groups and names are the same, ignoring case. """
+    if entity is None:
+        return None
+    return ((entity.group or '').lower(), (entity.name or '').lower())
+
+def document_entity_key(doc_entity):
+    return entity_key(doc_entity.entity)
+
+def utterance_key(utterance):
+    return entity_key(utterance.entity)
+
+def keyword_key(keyword):
+    return keyword.keyword.lower()
+
+def source_key(source):
+    return source.person
+
+
 class DocumentForm(Form):
     url         = URLField('URL', [validators.Length(max=200)])
     title       = StringField('Headline', [validators.Required(), validators.Length(max=1024)])
@@ -200,8 +275,8 @@ class DocumentForm(Form):
 
         from . import Medium, DocumentType
 
-        self.medium_id.choices = [['', '(none)']] + [[str(m.id), m.name] for m in Medium.query.order_by(Medium.name).all()]
-        self.document_type_id.choices = [[str(t.id), t.name] for t in DocumentType.query.order_by(DocumentType.name).all()]
+        self.medium_id.choices = [['', '(none)']] + [[str(m.id), m.name] for m in reference.all(Medium, order_by='name')]
+        self.document_type_id.choices = [[str(t.id), t.name] for t in reference.all(DocumentType, order_by='name')]
 
 
 class DocumentType(db.Model):
@@ -257,10 +332,10 @@ class DocumentAnalysisForm(Form):
 
         from . import Topic, Location, Issue
 
-        self.topic_id.choices = [['', '(none)']] + [[str(t.id), t.name] for t in Topic.query.order_by(Topic.name).all()]
-        self.issues.choices = [(str(issue.id), issue.name) for issue in db.session.query(Issue).order_by('name')]
+        self.topic_id.choices = [['', '(none)']] + [[str(t.id), t.name] for t in reference.all(Topic, order_by='name')]
+        self.issues.choices = [(str(issue.id), issue.name) for issue in reference.all(Issue, order_by='name')]
         self.origin_location_id.choices = [['', '(none)']] + [
-                [str(loc.id), loc.name] for loc in Location.query.order_by(Location.name).all()]
+                [str(loc.id), loc.name] for loc in reference.all(Location, order_by='name')]
 
 
 class DocumentAnalysisProblem(object):
@@ -277,6 +352,11 @@ class DocumentAnalysisProblem(object):
     def filter_query(self, query):
         raise NotImplementedError()
 
+    def condition(self):
+        """ An SQL expression that is true for documents with this problem.
+        This is the SQL counterpart of +check+. """
+        raise NotImplementedError()
+
     @classmethod
     def all(cls):
         if not cls._problems:
@@ -295,6 +375,24 @@ class DocumentAnalysisProblem(object):
     def lookup(cls, key):
         return cls._problems[key]
 
+    @classmethod
+    def counts(cls, query):
+        """ Count the documents matched by +query+, a query that includes
+        documents, that have each problem. Returns a dict from problem
+        short descriptions to counts, for problems that have documents.
+
+        This is done with one aggregate query, rather than checking each
+        document in Python. """
+        problems = cls.all()
+        docs = query.with_entities(Document.id.label('id')).distinct().subquery('problem_documents')
+
+        row = db.session.query(*[func.sum(case([(p.condition(), 1)], else_=0)) for p in problems])\
+            .select_from(Document)\
+            .join(docs, docs.c.id == Document.id)\
+            .one()
+
+        return dict((p.short_desc, int(n)) for p, n in zip(problems, row) if n)
+
 
 class MissingTopic(DocumentAnalysisProblem):
     code = 'missing-topic'
@@ -307,6 +405,9 @@ class MissingTopic(DocumentAnalysisProblem):
     def filter_query(self, query):
         return query.filter(Document.topic == None)
 
+    def condition(self):
+        return Document.topic_id == None
+
 
 class MissingOrigin(DocumentAnalysisProblem):
     code = 'missing-origin'
@@ -319,6 +420,9 @@ class MissingOrigin(DocumentAnalysisProblem):
     def filter_query(self, query):
         return query.filter(Document.origin == None)
 
+    def condition(self):
+        return Document.origin_location_id == None
+
 
 class SourceWithoutFunction(DocumentAnalysisProblem):
     code = 'source-without-function'
@@ -334,6 +438,12 @@ class SourceWithoutFunction(DocumentAnalysisProblem):
                 .join(DocumentSource)\
                 .filter(DocumentSource.function == None)
 
+    def condition(self):
+        from . import DocumentSource
+        return exists().where(and_(
+            DocumentSource.doc_id == Document.id,
+            DocumentSource.source_function_id == None))
+
 
 class SourceWithoutAffiliation(DocumentAnalysisProblem):
     code = 'source-without-affiliation'
@@ -348,3 +458,9 @@ class SourceWithoutAffiliation(DocumentAnalysisProblem):
         return query\
                 .join(DocumentSource)\
                 .filter(DocumentSource.affiliation == None)
+
+    def condition(self):
+        from . import DocumentSource
+        return exists().where(and_(
+            DocumentSource.doc_id == Document.id,
+            DocumentSource.affiliation_id == None))
@@ -5,6 +5,7 @@ from sqlalchemy import (
     Integer,
     String,
     Float,
+    LargeBinary,
     func,
     Index,
     and_,
@@ -79,16 +80,99 @@ class Entity(db.Model):
         return e
 
     @classmethod
-    def bulk_get(self, pairs):
+    def bulk_get(self, pairs, lock=False):
         """ For a collection of (group, name) pairs, fetch matching entities in
         bulk, returning a map from (group, name) pairs to the entity. Both
-        group and name are lowercased in the resulting map. """
+        group and name are lowercased in the resulting map.
+
+        If +lock+ is True, this is a locking read, which also finds entities
+        committed by others since the current transaction began. """
         entities = {}
+        if not pairs:
+            return entities
+
         filters = [and_(Entity.group == p[0], Entity.name == p[1]) for p in pairs]
-        for e in Entity.query.filter(or_(*filters)).all():
+        query = Entity.query.filter(or_(*filters))
+        if lock:
+            query = query.with_for_update(read=True)
+
+        for e in query.all():
             entities[(e.group.lower(), e.name.lower())] = e
         return entities
 
+    # map from lowercased (group, name) pairs to entity ids, shared by
+    # everything in this process
+    id_cache = {}
+    ID_CACHE_SIZE = 100000
+
+    @classmethod
+    def bulk_get_or_create(cls, pairs):
+        """ Get or create entities for a collection of (group, name) pairs, in bulk.
+        Names are sanitised as for +get_or_create+. Returns a map from
+        +Entity.key(group, name)+ to the entity.
+
+        This usually needs at most three queries, no matter how many pairs
+        there are. The database may match names more loosely than +key+
+        does, for example ignoring accents, so an existing entity found for
+        a pair may have a different key. Those pairs are looked up one at
+        a time, the same way the database matched them.
+        """
+        wanted = {}
+        for group, name in pairs:
+            name = sanitise_name(name)
+            wanted.setdefault(cls.key(group, name), (group, name))
+
+        entities = {}
+
+        # load entities we've seen before by id
+        ids = {}
+        for k in wanted:
+            if k in cls.id_cache:
+                ids.setdefault(cls.id_cache[k], []).append(k)
+        if ids:
+            for e in Entity.query.filter(Entity.id.in_(ids.keys())):
+                for k in ids[e.id]:
+                    entities[k] = e
+
+        # look up the rest by name
+        missing = [wanted[k] for k in wanted if k not in entities]
+        if missing:
+            entities.update(cls.bulk_get(missing))
+
+        # create the rest at once. Another process may be creating some of
+        # them too, so skip those that already exist, and then load them all
+        # with a locking read, which sees those created by others
+        missing = [wanted[k] for k in wanted if k not in entities]
+        if missing:
+            db.session.flush()
+            insert = Entity.__table__.insert()\
+                    .prefix_with('IGNORE', dialect='mysql')\
+                    .prefix_with('OR IGNORE', dialect='sqlite')
+            db.session.execute(insert, [{'group': g, 'name': n} for g, n in missing])
+            entities.update(cls.bulk_get(missing, lock=True))
+
+        # the entities the database matched differently
+        for k in wanted:
+            if k not in entities:
+                group, name = wanted[k]
+                entities[k] = Entity.query\
+                        .filter(Entity.group == group, Entity.name == name)\
+                        .with_for_update(read=True)\
+                        .one()
+
+        entities = dict((k, entities[k]) for k in wanted)
+
+        if len(cls.id_cache) > cls.ID_CACHE_SIZE:
+            cls.id_cache.clear()
+        for k, e in entities.iteritems():
+            cls.id_cache[k] = e.id
+
+        return entities
+
+    @classmethod
+    def key(cls, group, name):
+        return (group.lower(), name.lower())
+
 Index('entity_group_name_ix', Entity.group, Entity.name, unique=True)
 
 
@@ -107,8 +191,8 @@ class DocumentEntity(db.Model, WithOffsets):
     created_at   = Column(DateTime(timezone=True), index=True, unique=False, nullable=False, server_default=func.now())
     updated_at   = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.current_timestamp())
 
-    # offsets in the document, a space-separated list of offset:length pairs.
-    offset_list  = Column(String(1024))
+    # offsets in the document, packed offset and length pairs. See WithOffsets.
+    offset_data  = Column(LargeBinary)
 
     # Associations
     entity    = relationship("Entity", lazy=False)
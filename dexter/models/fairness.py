@@ -14,6 +14,7 @@ from wtforms.fields.html5 import URLField
 
 from ..forms import Form, SelectField
 from .support import db
+from .reference import reference
 
 class Fairness(db.Model):
     """
@@ -88,10 +89,10 @@ class DocumentFairnessForm(Form):
     def __init__(self, *args, **kwargs):
         super(DocumentFairnessForm, self).__init__(*args, **kwargs)
 
-        self.fairness_id.choices = [[str(s.id), s.name] for s in Fairness.query.order_by(Fairness.name).all()]
+        self.fairness_id.choices = [[str(s.id), s.name] for s in reference.all(Fairness, order_by='name')]
 
         # sort according to code
-        affiliations = sorted(Affiliation.query.all(), key=Affiliation.sort_key)
+        affiliations = sorted(reference.all(Affiliation), key=Affiliation.sort_key)
   
         self.bias_favour_affiliation_id.choices = [['', '(none)']] + [[str(s.id), s.full_name()] for s in affiliations]
         self.bias_oppose_affiliation_id.choices = self.bias_favour_affiliation_id.choices
@@ -0,0 +1,161 @@
+import json
+import datetime
+
+from sqlalchemy import (
+    and_,
+    or_,
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+    String,
+    Text,
+    func,
+    Index,
+    )
+from sqlalchemy.orm import relationship
+
+from .support import db
+
+
+class Job(db.Model):
+    """
+    A unit of background work, such as processing a URL. Jobs are queued
+    in this table and run by worker processes (see worker.py).
+
+    A worker running a job updates its +heartbeat_at+ every so often. If a
+    worker dies, its job stops getting heartbeats and is claimed again by
+    another worker, up to +MAX_ATTEMPTS+ times in all.
+    """
+    __tablename__ = "jobs"
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE    = 'done'
+    FAILED  = 'failed'
+
+    # a running job without a heartbeat for this many seconds has been
+    # abandoned by its worker
+    STALE_AFTER = 5 * 60
+
+    # the most times a job is claimed before we give up on it
+    MAX_ATTEMPTS = 3
+
+    id          = Column(Integer, primary_key=True)
+    job_type    = Column(String(50), nullable=False)
+    status      = Column(String(10), nullable=False, default=PENDING)
+    payload     = Column(Text)
+    result      = Column(Text)
+    error       = Column(Text)
+    attempts    = Column(Integer, nullable=False, default=0)
+    worker      = Column(String(100))
+
+    created_by_user_id = Column(Integer, ForeignKey('users.id'), index=True)
+
+    created_at  = Column(DateTime(timezone=True), index=True, unique=False, nullable=False, server_default=func.now())
+    started_at  = Column(DateTime(timezone=True))
+    heartbeat_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+    # Associations
+    created_by  = relationship("User", foreign_keys=[created_by_user_id])
+
+    def get_payload(self):
+        return json.loads(self.payload) if self.payload else {}
+
+    def set_payload(self, value):
+        self.payload = json.dumps(value)
+
+    def get_result(self):
+        return json.loads(self.result) if self.result else {}
+
+    def set_result(self, value):
+        self.result = json.dumps(value)
+
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'job_type': self.job_type,
+            'status': self.status,
+            'payload': self.get_payload(),
+            'result': self.get_result(),
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return "<Job id=%s, type=%s, status=%s>" % (self.id, self.job_type, self.status)
+
+    @classmethod
+    def enqueue(cls, job_type, payload, user=None):
+        """ Create a new pending job. The caller must commit the session
+        for workers to see it. """
+        job = cls()
+        job.job_type = job_type
+        job.status = cls.PENDING
+        job.set_payload(payload)
+        job.created_by = user
+        db.session.add(job)
+        return job
+
+    @classmethod
+    def claim(cls, worker):
+        """ Atomically claim the oldest pending or abandoned job for +worker+
+        and commit, returning the job or None if there are none. This is
+        safe to call from many workers at once. """
+        now = datetime.datetime.utcnow()
+        stale = and_(cls.status == cls.RUNNING,
+                     cls.heartbeat_at < now - datetime.timedelta(seconds=cls.STALE_AFTER))
+
+        # give up on abandoned jobs that have had enough attempts
+        db.session.query(cls)\
+                .filter(stale, cls.attempts >= cls.MAX_ATTEMPTS)\
+                .update({
+                    'status': cls.FAILED,
+                    'error': 'The job was abandoned too many times.',
+                    'finished_at': now,
+                    }, synchronize_session=False)
+        db.session.commit()
+
+        claimable = or_(cls.status == cls.PENDING, stale)
+
+        while True:
+            id = db.session.query(cls.id)\
+                    .filter(claimable)\
+                    .order_by(cls.id)\
+                    .limit(1)\
+                    .scalar()
+            if id is None:
+                db.session.rollback()
+                return None
+
+            # only one worker can move the job out of pending, or take
+            # over an abandoned job
+            claimed = db.session.query(cls)\
+                    .filter(cls.id == id, claimable)\
+                    .update({
+                        'status': cls.RUNNING,
+                        'worker': worker,
+                        'started_at': now,
+                        'heartbeat_at': now,
+                        'attempts': cls.attempts + 1,
+                        }, synchronize_session=False)
+            db.session.commit()
+
+            if claimed:
+                return cls.query.get(id)
+
+    @classmethod
+    def heartbeat(cls, id):
+        """ Note that the job with +id+ is still running. This uses its own
+        connection and commits, so it can be called from any thread while
+        the job runs. """
+        db.engine.execute(cls.__table__.update()
+                .where(cls.__table__.c.id == id)
+                .values(heartbeat_at=datetime.datetime.utcnow()))
+
+Index('job_status_id_ix', Job.status, Job.id)
@@ -4,6 +4,7 @@ from sqlalchemy import (
     Integer,
     String,
     Float,
+    LargeBinary,
     Index
     )
 
@@ -21,8 +22,8 @@ class DocumentKeyword(db.Model, WithOffsets):
     keyword   = Column(String(100), index=True, nullable=False)
     relevance = Column(Float, index=True, nullable=False)
 
-    # offsets in the document, a space-separated list of offset:length pairs.
-    offset_list  = Column(String(1024))
+    # offsets in the document, packed offset and length pairs. See WithOffsets.
+    offset_data  = Column(LargeBinary)
 
     def __repr__(self):
         return "<DocumentKeyword keyword='%s', relevance=%f, doc=%s>" % (
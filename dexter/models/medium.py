@@ -3,8 +3,39 @@ from sqlalchemy import (
     Integer,
     String,
     )
+from sqlalchemy.orm.exc import NoResultFound
 
 from .support import db
+from .reference import reference
+
+
+class PrefixTrie(object):
+    """ A character trie mapping strings to values, which finds the value
+    for the longest key that is a prefix of a string. """
+    def __init__(self):
+        self.root = {}
+
+    def add(self, key, value):
+        node = self.root
+        for c in key:
+            node = node.setdefault(c, {})
+        # None can't be a character, so it marks the end of a key
+        node[None] = value
+
+    def longest_prefix(self, s):
+        """ The value for the longest key that +s+ starts with, or None. """
+        node = self.root
+        found = node.get(None)
+
+        for c in s:
+            node = node.get(c)
+            if node is None:
+                break
+            if None in node:
+                found = node[None]
+
+        return found
+
 
 class Medium(db.Model):
     """ A medium from which articles are drawn, such as a newspaper
@@ -21,6 +52,31 @@ class Medium(db.Model):
     def group_name(self):
         return self.medium_group or self.name
 
+    @classmethod
+    def for_domain(cls, domain):
+        """ The medium with the longest domain that +domain+ starts with,
+        such as 'iol.co.za/isolezwe' for 'iol.co.za/isolezwe/news/foo',
+        or the Unknown medium. This doesn't query the database. """
+        trie, unknown = reference.derived(Medium, 'domain_index', cls.build_domain_index)
+
+        medium = trie.longest_prefix(domain) or unknown
+        if medium is None:
+            raise NoResultFound("No Unknown medium")
+        return reference.merge(medium)
+
+    @classmethod
+    def build_domain_index(cls, mediums):
+        trie = PrefixTrie()
+        unknown = None
+
+        for m in mediums:
+            if m.domain:
+                trie.add(m.domain, m)
+            if m.name == 'Unknown':
+                unknown = m
+
+        return trie, unknown
+
     @classmethod
     def create_defaults(cls):
         text = """
@@ -16,6 +16,7 @@ from sqlalchemy.orm import relationship, subqueryload
 from wtforms import StringField, validators, SelectField, HiddenField
 
 from .support import db
+from .reference import reference
 from ..forms import Form, MultiCheckboxField
 
 class Person(db.Model):
@@ -180,8 +181,8 @@ class PersonForm(Form):
 
         from . import Entity
 
-        self.gender_id.choices = [['', '(unknown gender)']] + [[str(g.id), g.name] for g in Gender.query.order_by(Gender.name).all()]
-        self.race_id.choices = [['', '(unknown race)']] + [[str(r.id), r.name] for r in Race.query.order_by(Race.name).all()]
+        self.gender_id.choices = [['', '(unknown gender)']] + [[str(g.id), g.name] for g in reference.all(Gender, order_by='name')]
+        self.race_id.choices = [['', '(unknown race)']] + [[str(r.id), r.name] for r in reference.all(Race, order_by='name')]
 
         # we don't care if the entities are in the valid list or not
         self.alias_entity_ids.pre_validate = lambda form: True
@@ -201,11 +202,11 @@ class Gender(db.Model):
 
     @classmethod
     def male(cls):
-        return Gender.query.filter(Gender.name == 'Male').one()
+        return reference.one(Gender, name='Male')
 
     @classmethod
     def female(cls):
-        return Gender.query.filter(Gender.name == 'Female').one()
+        return reference.one(Gender, name='Female')
 
     @classmethod
     def create_defaults(cls):
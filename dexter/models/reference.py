@@ -0,0 +1,166 @@
+import time
+import threading
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
+
+from .support import db
+
+
+class ReferenceCache(object):
+    """
+    A process-local cache of the small, seeded reference tables, such as
+    mediums, genders and topics, which are read on almost every request
+    but rarely change.
+
+    Rows are kept as detached instances and are merged into the current
+    session, without a query, when they're handed out. They can be used
+    just like instances loaded from the database.
+
+    Rows are loaded on their own connection, so they only include committed
+    changes. The cache for a table is invalidated when one of its rows is
+    inserted, updated or deleted in this process (for example, through the
+    admin interface), and again when that transaction commits or rolls back.
+    Other processes pick up changes once +ttl+ seconds have passed.
+    """
+    log = logging.getLogger(__name__)
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.models = set()
+        self.tables = {}
+        self.lock = threading.Lock()
+
+    def register(self, model):
+        """ Cache rows of +model+, invalidating the cache when they change. """
+        self.models.add(model)
+
+        for name in ['after_insert', 'after_update', 'after_delete']:
+            event.listen(model, name, self.changed)
+
+    def changed(self, mapper, conn, target):
+        """ A row of a cached model has been changed. """
+        self.invalidate(mapper.class_)
+
+        # the cache may be reloaded before the change is committed, so
+        # invalidate it again once the transaction is over
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault('reference_changes', set()).add(mapper.class_)
+
+    def transaction_ended(self, session):
+        for model in session.info.pop('reference_changes', []):
+            self.invalidate(model)
+
+    def invalidate(self, model=None):
+        """ Invalidate the cache for +model+, or for all models. """
+        with self.lock:
+            if model:
+                self.tables.pop(model, None)
+            else:
+                self.tables.clear()
+
+    def rows(self, model):
+        """ Detached instances for all rows of +model+, loading them if necessary. """
+        return self.entry(model)['rows']
+
+    def derived(self, model, name, build):
+        """ Something derived from the rows of +model+, such as an index, which
+        is built by calling +build+ with the detached rows. It's cached and
+        invalidated along with the rows. """
+        entry = self.entry(model)
+        if name not in entry['derived']:
+            entry['derived'][name] = build(entry['rows'])
+        return entry['derived'][name]
+
+    def entry(self, model):
+        entry = self.tables.get(model)
+        if entry and entry['expires_at'] > time.time():
+            return entry
+
+        # load on a separate connection, so that we don't see uncommitted
+        # changes from the current transaction. An in-memory sqlite database,
+        # such as in tests, only has the one connection.
+        if db.engine.url.drivername == 'sqlite' and db.engine.url.database in (None, '', ':memory:'):
+            rows = self.load(model, db.session.connection())
+        else:
+            connection = db.engine.connect()
+            try:
+                rows = self.load(model, connection)
+            finally:
+                connection.close()
+
+        self.log.debug("Loaded %d %s rows" % (len(rows), model.__name__))
+
+        entry = {
+            'expires_at': time.time() + self.ttl,
+            'rows': rows,
+            'derived': {},
+        }
+        with self.lock:
+            self.tables[model] = entry
+        return entry
+
+    def load(self, model, connection):
+        # use a separate session so that the instances are detached once
+        # we're done
+        session = Session(bind=connection)
+        try:
+            return session.query(model).all()
+        finally:
+            session.close()
+
+    def all(self, model, order_by=None):
+        """ All instances of +model+, optionally ordered by the +order_by+ attribute. """
+        rows = self.rows(model)
+
+        if order_by:
+            rows = sorted(rows, key=lambda r: sort_value(getattr(r, order_by)))
+
+        return [self.merge(r) for r in rows]
+
+    def get(self, model, id):
+        """ The instance of +model+ with primary key +id+, or None. """
+        try:
+            id = int(id)
+        except (TypeError, ValueError):
+            return None
+
+        for r in self.rows(model):
+            if r.id == id:
+                return self.merge(r)
+
+        return None
+
+    def one(self, model, **attrs):
+        """ The single instance of +model+ whose attributes match +attrs+. Like
+        +Query.one()+, raises NoResultFound or MultipleResultsFound otherwise. """
+        matches = [r for r in self.rows(model) if all(getattr(r, k) == v for k, v in attrs.iteritems())]
+
+        if not matches:
+            raise NoResultFound("No %s matching %s" % (model.__name__, attrs))
+        if len(matches) > 1:
+            raise MultipleResultsFound("Multiple %s matching %s" % (model.__name__, attrs))
+
+        return self.merge(matches[0])
+
+    def merge(self, row):
+        return db.session.merge(row, load=False)
+
+
+def sort_value(v):
+    if isinstance(v, basestring):
+        return v.lower()
+    return v
+
+
+reference = ReferenceCache()
+
+# the database schema has been changed, so everything is stale
+event.listen(db.metadata, 'after_create', lambda *args, **kwargs: reference.invalidate())
+event.listen(db.metadata, 'after_drop', lambda *args, **kwargs: reference.invalidate())
+
+event.listen(Session, 'after_commit', reference.transaction_ended)
+event.listen(Session, 'after_rollback', reference.transaction_ended)
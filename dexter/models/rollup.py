@@ -0,0 +1,508 @@
+import datetime
+import logging
+
+from sqlalchemy import (
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    Integer,
+    String,
+    Index,
+    event,
+    and_,
+    or_,
+    )
+from sqlalchemy.orm import relationship, attributes, object_session, Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import func, case
+
+from .support import db
+from .document import Document
+from .medium import Medium
+from .keyword import Topic
+from .location import Location
+from .person import Person
+from .source import DocumentSource
+from .fairness import Fairness, Affiliation, DocumentFairness
+
+
+class DocumentRollup(db.Model):
+    """
+    Daily counts of documents and their analysis, for each medium. These
+    let feeds and reports sum a few rows per day, rather than scanning
+    all documents in a date range.
+
+    Each row counts one +metric+ for documents published on +date+ in a
+    medium. For example, the 'topic' metric has a row for each topic,
+    with the topic's id as the +label_id+. Rows refer to topics, people
+    and so on by id, so that renaming them doesn't leave the rollups
+    stale; +summary+ looks up their names. Metrics are:
+
+    * documents: all documents
+    * unfair: documents that aren't fair (see +Document.is_fair+)
+    * topic: documents by topic
+    * origin: documents by origin location
+    * fairness: fairness entries by fairness ('Fair' if there are none)
+    * favour: fairness entries by the affiliation favoured
+    * oppose: fairness entries by the affiliation opposed
+    * party_source: political party sources by affiliation, and by the
+      source's person or, if there isn't one, the source's name as the
+      +sublabel+
+
+    Rows are refreshed when documents, their sources or their fairness
+    change and the change is committed. +rebuild+ refreshes everything.
+
+    Each day and medium is refreshed in its own transaction, just after the
+    change is committed, while holding a lock on its +DocumentRollupDay+
+    row. This stops two processes committing changes to the same day from
+    each refreshing it from their own, incomplete, snapshot. Refreshes
+    that are still to be done are kept as +PendingRollup+ rows, which
+    are committed with the change, so that refreshes lost to a crash can
+    be done later by +refresh_pending+.
+    """
+    __tablename__ = "document_rollups"
+
+    id          = Column(Integer, primary_key=True)
+    date        = Column(Date, nullable=False)
+    medium_id   = Column(Integer, ForeignKey('mediums.id'))
+    metric      = Column(String(20), nullable=False)
+    label_id    = Column(Integer)
+    person_id   = Column(Integer, ForeignKey('people.id'))
+    sublabel    = Column(String(150))
+    count       = Column(Integer, nullable=False, default=0)
+
+    # Associations
+    medium      = relationship("Medium")
+    person      = relationship("Person")
+
+    METRICS = ['documents', 'unfair', 'topic', 'origin', 'fairness', 'favour', 'oppose', 'party_source']
+
+    # the models that label ids refer to, for each metric
+    LABELS = {
+        'topic': Topic,
+        'origin': Location,
+        'fairness': Fairness,
+        'favour': Affiliation,
+        'oppose': Affiliation,
+        'party_source': Affiliation,
+    }
+
+    # a medium's group, as in the documents_view
+    MEDIUM_GROUP = case([(or_(Medium.medium_group == None, Medium.medium_group == ''), Medium.name)],
+                        else_=Medium.medium_group)
+
+    log = logging.getLogger(__name__)
+
+    def __repr__(self):
+        return "<DocumentRollup date=%s, medium_id=%s, metric=%s, label_id=%s, count=%s>" % (
+                self.date, self.medium_id, self.metric, self.label_id, self.count)
+
+    @classmethod
+    def summary(cls, metric, start_date, end_date, groups=None):
+        """ Sum the counts for +metric+ between +start_date+ and +end_date+
+        (inclusive), grouped by label and sublabel and by the SQL
+        expressions in +groups+. By default, these are the medium group and
+        medium type. Returns a query for rows with 'record_count', 'label'
+        and 'sublabel' columns, followed by the group columns. The label is
+        the name of the topic, affiliation, etc. """
+        if groups is None:
+            groups = [cls.MEDIUM_GROUP.label('medium_group'), Medium.medium_type.label('medium_type')]
+
+        model = cls.LABELS.get(metric)
+        if model is None:
+            label = cls.label_id
+        elif model is Fairness:
+            # as in the documents_fairness_view
+            label = func.coalesce(Fairness.name, 'Fair')
+        else:
+            label = model.name
+
+        if metric == 'party_source':
+            sublabel = case([(Person.id != None, Person.name)], else_=cls.sublabel)
+        else:
+            sublabel = cls.sublabel
+
+        query = db.session.query(
+                    func.sum(cls.count).label('record_count'),
+                    label.label('label'),
+                    sublabel.label('sublabel'),
+                    *groups)\
+                .outerjoin(Medium, cls.medium_id == Medium.id)
+
+        if model is not None:
+            query = query.outerjoin(model, cls.label_id == model.id)
+        if metric == 'party_source':
+            query = query.outerjoin(Person, cls.person_id == Person.id)
+
+        return query\
+                .filter(cls.metric == metric,
+                        cls.date >= start_date,
+                        cls.date <= end_date)\
+                .group_by(label, sublabel, *groups)
+
+    @classmethod
+    def change_markers(cls, start_date, end_date):
+        """ The latest refresh and number of refreshed days, and the latest
+        and number of pending refreshes, between +start_date+ and +end_date+
+        (inclusive), as a list of (latest, count) pairs. These change whenever
+        the rollups in that range are refreshed or are about to be, so
+        they're useful for keys of cached results. """
+        markers = []
+        for model, latest in [(DocumentRollupDay, DocumentRollupDay.refreshed_at),
+                              (PendingRollup, PendingRollup.created_at)]:
+            markers.append(tuple(db.session.query(func.max(latest), func.count(model.id))
+                    .filter(model.date >= start_date, model.date <= end_date)
+                    .one()))
+        return markers
+
+    @classmethod
+    def refresh(cls, keys, pending=None):
+        """ Recalculate the rollups for +keys+, a collection of (date, medium_id)
+        pairs. Each key is refreshed and committed in its own transaction,
+        in a new session. +pending+ maps keys to the ids of +PendingRollup+
+        rows that are done once the key is refreshed. """
+        pending = pending or {}
+        session = refresh_session()
+        try:
+            for date, medium_id in keys:
+                try:
+                    cls.refresh_day(session, date, medium_id, pending.get((date, medium_id)))
+                except Exception as e:
+                    session.rollback()
+                    cls.log.error("Error refreshing rollups for %s and medium %s: %s" % (date, medium_id, e), exc_info=e)
+        finally:
+            refresh_session.remove()
+
+        cls.log.debug("Refreshed rollups for %d days" % len(keys))
+
+    @classmethod
+    def refresh_day(cls, session, date, medium_id, pending_ids=None):
+        """ Recalculate and commit the rollups for +date+ and +medium_id+,
+        using +session+. """
+        # nothing else may refresh this day until we commit. This must come
+        # before anything else in the transaction, so that we calculate from
+        # a snapshot that includes everything committed before the lock
+        # was granted.
+        day = DocumentRollupDay.lock(session, date, medium_id)
+
+        where = and_(cls.date == date, cls.medium_id == medium_id)
+        session.execute(cls.__table__.delete().where(where))
+
+        rows = []
+        for metric in cls.METRICS:
+            for label_id, person_id, sublabel, count in cls.calculate(session, metric, date, medium_id):
+                rows.append({
+                    'date': date,
+                    'medium_id': medium_id,
+                    'metric': metric,
+                    'label_id': label_id,
+                    'person_id': person_id,
+                    'sublabel': sublabel,
+                    'count': count,
+                })
+
+        if rows:
+            session.execute(cls.__table__.insert(), rows)
+
+        if pending_ids:
+            session.query(PendingRollup)\
+                .filter(PendingRollup.id.in_(pending_ids))\
+                .delete(synchronize_session=False)
+
+        day.refreshed_at = datetime.datetime.utcnow()
+        session.commit()
+
+    @classmethod
+    def refresh_pending(cls, min_age=5 * 60):
+        """ Refresh days that should have been refreshed more than +min_age+
+        seconds ago, but weren't, such as because the process crashed.
+        Returns the number of days refreshed. """
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=min_age)
+
+        pending = {}
+        for row in db.session.query(PendingRollup).filter(PendingRollup.created_at < cutoff):
+            pending.setdefault((row.date, row.medium_id), []).append(row.id)
+        db.session.commit()
+
+        cls.refresh(sorted(pending.keys()), pending)
+        return len(pending)
+
+    @classmethod
+    def calculate(cls, session, metric, date, medium_id):
+        """ Count +metric+ for documents published on +date+ in +medium_id+,
+        using +session+, returning a list of (label_id, person_id, sublabel,
+        count) tuples. """
+        start = datetime.datetime.combine(date, datetime.time())
+        docs = session.query(Document.id.label('id'))\
+            .filter(Document.medium_id == medium_id,
+                    Document.published_at >= start,
+                    Document.published_at < start + datetime.timedelta(days=1))\
+            .subquery('rollup_documents')
+        count = func.count(docs.c.id)
+
+        if metric == 'documents':
+            n = session.query(count).select_from(docs).scalar()
+            return [(None, None, None, n)] if n else []
+
+        if metric == 'unfair':
+            # documents with fairness entries, other than a single 'Fair' entry
+            fairness = session.query(
+                    DocumentFairness.doc_id.label('doc_id'),
+                    func.count(DocumentFairness.id).label('entries'),
+                    func.sum(case([(Fairness.name == 'Fair', 1)], else_=0)).label('fair'))\
+                .join(Fairness, DocumentFairness.fairness_id == Fairness.id)\
+                .group_by(DocumentFairness.doc_id)\
+                .subquery('rollup_fairness')
+
+            n = session.query(count)\
+                .select_from(docs)\
+                .join(fairness, fairness.c.doc_id == docs.c.id)\
+                .filter(or_(fairness.c.entries != 1, fairness.c.fair != 1))\
+                .scalar()
+            return [(None, None, None, n)] if n else []
+
+        if metric == 'topic':
+            labels = [Document.topic_id]
+            q = session.query(*(labels + [count]))\
+                .select_from(docs)\
+                .join(Document, Document.id == docs.c.id)
+
+        elif metric == 'origin':
+            labels = [Document.origin_location_id]
+            q = session.query(*(labels + [count]))\
+                .select_from(docs)\
+                .join(Document, Document.id == docs.c.id)
+
+        elif metric == 'fairness':
+            # documents without fairness have a null fairness id
+            labels = [DocumentFairness.fairness_id]
+            q = session.query(*(labels + [count]))\
+                .select_from(docs)\
+                .outerjoin(DocumentFairness, DocumentFairness.doc_id == docs.c.id)
+
+        elif metric in ('favour', 'oppose'):
+            if metric == 'favour':
+                column = DocumentFairness.bias_favour_affiliation_id
+            else:
+                column = DocumentFairness.bias_oppose_affiliation_id
+
+            labels = [column]
+            q = session.query(*(labels + [count]))\
+                .select_from(docs)\
+                .join(DocumentFairness, DocumentFairness.doc_id == docs.c.id)\
+                .filter(column != None)
+
+        elif metric == 'party_source':
+            # as in the document_sources_view, unnamed sources are
+            # '(unnamed)' even if they have a person
+            person_id = case([(DocumentSource.unnamed == True, None)], else_=DocumentSource.person_id)
+            source_name = case([
+                    (DocumentSource.unnamed == True, '(unnamed)'),
+                    (DocumentSource.person_id != None, None),
+                ], else_=DocumentSource.name)
+
+            labels = [DocumentSource.affiliation_id, person_id, source_name]
+            q = session.query(*(labels + [count]))\
+                .select_from(docs)\
+                .join(DocumentSource, DocumentSource.doc_id == docs.c.id)\
+                .join(Affiliation, DocumentSource.affiliation_id == Affiliation.id)\
+                .filter(Affiliation.code.startswith('4.'))
+
+        else:
+            raise ValueError("Unknown metric: %s" % metric)
+
+        rows = q.group_by(*labels).all()
+        if len(labels) == 1:
+            return [(label_id, None, None, n) for label_id, n in rows]
+        return [tuple(row) for row in rows]
+
+    @classmethod
+    def rebuild(cls, batch_size=100):
+        """ Recalculate all rollups. Each day is replaced in its own
+        transaction, so the rollups are complete while this runs. Returns
+        the number of days rebuilt. """
+        keys = set()
+        for published_at, medium_id in db.session.query(Document.published_at, Document.medium_id):
+            keys.add((published_at.date(), medium_id))
+
+        # days that no longer have any documents
+        keys.update(db.session.query(cls.date, cls.medium_id).distinct())
+        db.session.commit()
+        keys = sorted(keys)
+
+        for i in xrange(0, len(keys), batch_size):
+            cls.refresh(keys[i:i + batch_size])
+            cls.log.info("Rebuilt rollups for %d of %d days" % (min(i + batch_size, len(keys)), len(keys)))
+
+        return len(keys)
+
+
+Index('document_rollups_date_medium_ix', DocumentRollup.date, DocumentRollup.medium_id)
+Index('document_rollups_metric_date_ix', DocumentRollup.metric, DocumentRollup.date)
+
+
+class DocumentRollupDay(db.Model):
+    """
+    A day and medium that has rollups. Refreshing a day's rollups locks
+    its row, so that only one process refreshes it at a time.
+    """
+    __tablename__ = "document_rollup_days"
+
+    id          = Column(Integer, primary_key=True)
+    date        = Column(Date, nullable=False)
+    medium_id   = Column(Integer, ForeignKey('mediums.id'))
+    refreshed_at = Column(DateTime(timezone=True))
+
+    def __repr__(self):
+        return "<DocumentRollupDay date=%s, medium_id=%s>" % (self.date, self.medium_id)
+
+    @classmethod
+    def lock(cls, session, date, medium_id):
+        """ Lock and return the row for +date+ and +medium_id+, creating it if
+        necessary. The lock is held until +session+ commits or rolls back. """
+        query = session.query(cls).filter(cls.date == date, cls.medium_id == medium_id).with_for_update()
+
+        day = query.first()
+        if day is None:
+            # create it in its own transaction, in case another process
+            # is doing the same
+            session.rollback()
+            day = cls()
+            day.date = date
+            day.medium_id = medium_id
+            session.add(day)
+            try:
+                session.commit()
+            except IntegrityError:
+                session.rollback()
+
+            day = query.one()
+
+        return day
+
+Index('document_rollup_days_date_medium_ix', DocumentRollupDay.date, DocumentRollupDay.medium_id, unique=True)
+
+
+class PendingRollup(db.Model):
+    """
+    A day and medium whose rollups must be refreshed because of a committed
+    change. It's committed along with the change, and deleted once the
+    rollups are refreshed.
+    """
+    __tablename__ = "pending_rollups"
+
+    id          = Column(Integer, primary_key=True)
+    date        = Column(Date, nullable=False)
+    medium_id   = Column(Integer)
+    created_at  = Column(DateTime(timezone=True), index=True, nullable=False)
+
+    def __repr__(self):
+        return "<PendingRollup date=%s, medium_id=%s>" % (self.date, self.medium_id)
+
+
+# rollups are refreshed outside of the app's session, in these
+refresh_session = db.create_scoped_session()
+
+
+# Keep rollups up to date. We note the documents touched by each flush, and
+# queue refreshes for their days and mediums just before the transaction
+# commits. Once it has committed, we do the refreshes.
+
+
+def rollup_key(published_at, medium_id):
+    if published_at is None:
+        return None
+    return (published_at.date(), medium_id)
+
+
+def track_changes(session, flush_context):
+    keys = session.info.setdefault('rollup_keys', set())
+    doc_ids = session.info.setdefault('rollup_doc_ids', set())
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Document):
+            keys.add(rollup_key(obj.published_at, obj.medium_id))
+
+        elif isinstance(obj, (DocumentSource, DocumentFairness)):
+            doc_ids.add(obj.doc_id)
+
+    keys.discard(None)
+    doc_ids.discard(None)
+
+
+def track_move(target, value, oldvalue, initiator):
+    # the document is moving from another day or medium, so refresh that
+    # too; the old values are only loaded because of active_history
+    session = object_session(target)
+    if session is None or not (db.session.registry.has() and db.session() is session):
+        return
+    if oldvalue in (None, attributes.NO_VALUE, attributes.NEVER_SET):
+        return
+
+    published_at, medium_id = target.published_at, target.medium_id
+    if initiator.key == 'published_at':
+        published_at = oldvalue
+    elif initiator.key == 'medium_id':
+        medium_id = oldvalue
+    else:
+        medium_id = oldvalue.id
+
+    session.info.setdefault('rollup_keys', set()).add(rollup_key(published_at, medium_id))
+
+
+def queue_refreshes(session):
+    # savepoints are part of a larger transaction, which queues everything
+    if session.transaction.nested:
+        return
+
+    session.flush()
+
+    keys = session.info.pop('rollup_keys', set())
+    doc_ids = session.info.pop('rollup_doc_ids', set())
+
+    if doc_ids:
+        for published_at, medium_id in session.query(Document.published_at, Document.medium_id)\
+                .filter(Document.id.in_(doc_ids)):
+            keys.add(rollup_key(published_at, medium_id))
+
+    rows = {}
+    for date, medium_id in keys:
+        row = PendingRollup()
+        row.date = date
+        row.medium_id = medium_id
+        row.created_at = datetime.datetime.utcnow()
+        session.add(row)
+        rows[(date, medium_id)] = row
+
+    if rows:
+        session.flush()
+        session.info['rollup_pending'] = dict((key, [row.id]) for key, row in rows.iteritems())
+
+
+def refresh_rollups(session):
+    pending = session.info.pop('rollup_pending', None)
+    if pending:
+        DocumentRollup.refresh(sorted(pending.keys()), pending)
+
+
+def forget_changes(session, *args):
+    session.info.pop('rollup_keys', None)
+    session.info.pop('rollup_doc_ids', None)
+    session.info.pop('rollup_pending', None)
+
+
+def app_session_only(f):
+    """ Only call +f+ for events on the app's session, +db.session+. """
+    def listener(session, *args):
+        if db.session.registry.has() and db.session() is session:
+            return f(session, *args)
+    return listener
+
+event.listen(Session, 'after_flush', app_session_only(track_changes))
+event.listen(Session, 'before_commit', app_session_only(queue_refreshes))
+event.listen(Session, 'after_commit', app_session_only(refresh_rollups))
+event.listen(Session, 'after_rollback', app_session_only(forget_changes))
+
+for attr in [Document.published_at, Document.medium_id, Document.medium]:
+    event.listen(attr, 'set', track_move, active_history=True)
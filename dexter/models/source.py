@@ -11,6 +11,7 @@ from sqlalchemy.orm import relationship
 from wtforms import StringField, validators, HiddenField, BooleanField, RadioField
 
 from .support import db
+from .reference import reference
 from .with_offsets import WithOffsets
 from ..forms import Form, SelectField
 
@@ -124,16 +125,20 @@ class DocumentSource(db.Model, WithOffsets):
             self.unnamed_race_id = None
 
 
+    def offsets(self):
+        """ Ordered list of +(offset, length)+ tuples of places in this document
+        the entity is mentioned or quoted, may be empty. """
+        offsets = set((u.offset, u.length) for u in self.utterances() if u.offset)
+        for de in self.document_entities():
+            offsets.update(de.offsets())
+
+        return sorted(offsets)
+
     @property
     def offset_list(self):
         """ String of offset:length pairs of places in this document the entity
         is mentioned or quoted, may be empty. """
-        offsets = ['%d:%d' % (u.offset, u.length) for u in self.utterances() if u.offset]
-        for de in self.document_entities():
-            if de.offset_list:
-                offsets.append(de.offset_list)
-
-        return ' '.join(offsets)
+        return ' '.join('%d:%d' % p for p in self.offsets())
 
 
     def __repr__(self):
@@ -201,16 +206,16 @@ class DocumentSourceForm(Form):
     def __init__(self, *args, **kwargs):
         super(DocumentSourceForm, self).__init__(*args, **kwargs)
 
-        self.source_function_id.choices = [['', '(none)']] + [[str(s.id), s.name] for s in SourceFunction.query.order_by(SourceFunction.name).all()]
+        self.source_function_id.choices = [['', '(none)']] + [[str(s.id), s.name] for s in reference.all(SourceFunction, order_by='name')]
 
         from . import Gender, Race
-        self.unnamed_gender_id.choices = [['', '(unknown gender)']] + [[str(g.id), g.name] for g in Gender.query.order_by(Gender.name).all()]
-        self.unnamed_race_id.choices = [['', '(unknown race)']] + [[str(r.id), r.name] for r in Race.query.order_by(Race.name).all()]
+        self.unnamed_gender_id.choices = [['', '(unknown gender)']] + [[str(g.id), g.name] for g in reference.all(Gender, order_by='name')]
+        self.unnamed_race_id.choices = [['', '(unknown race)']] + [[str(r.id), r.name] for r in reference.all(Race, order_by='name')]
 
         # because this list is heirarchical, we class 'organisations' as
         # this with only 0 or two dots
         from . import Affiliation
-        orgs = [i for i in Affiliation.query.all() if i.code.count('.') <= 1]
+        orgs = [i for i in reference.all(Affiliation) if i.code.count('.') <= 1]
         orgs.sort(key=Affiliation.sort_key)
         self.affiliation_id.choices = [['', '(none)']] + [[str(s.id), s.full_name()] for s in orgs]
 
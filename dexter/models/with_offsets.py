@@ -1,32 +1,84 @@
 import re
+import sys
+from array import array
 
 class WithOffsets():
     """ Helper mixin for models that use offsets. Assumes the existence
-    of a +offset_list+ attribute which contains a space-separated list of offset:length pairs.
+    of a +offset_data+ binary column, which holds the sorted +(offset, length)+
+    pairs packed as little-endian unsigned 32-bit integers.
+
+    The parsed pairs are cached on the instance until +offset_data+ changes.
+    +offset_list+ is a space-separated string of offset:length pairs, for
+    templates and for compatibility with the old string column.
     """
     SPACE_RE = re.compile(r' +')
 
+    # type code for unsigned 32-bit integers
+    TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+
     def offsets(self):
         """ Get an ordered list of +(offset, length)+ tuples of occurrences
         of this entity in the original document text. May be empty. """
-        offsets = (e.split(':') for e in self.SPACE_RE.split((self.offset_list or '').strip()))
-        return sorted((int(pair[0]), int(pair[1])) for pair in offsets if pair and pair[0])
+        data = self.offset_data
+        cached = getattr(self, '_offsets_cache', None)
+        if cached is not None and cached[0] is data:
+            return list(cached[1])
+
+        offsets = self.unpack_offsets(data)
+        self._offsets_cache = (data, offsets)
+        return list(offsets)
+
+    def set_offsets(self, pairs):
+        """ Replace the offsets with +pairs+, an iterable of +(offset, length)+ tuples. """
+        offsets = sorted(set((int(o), int(l)) for o, l in pairs))
+        self.offset_data = self.pack_offsets(offsets) if offsets else None
+        self._offsets_cache = (self.offset_data, offsets)
 
 
     def add_offset(self, pair):
         """ Add an (offset, length) pair to the offset list. Returns true if
         it was added, false if it was already there. """
-        if pair in self.offsets():
+        return self.add_offsets([pair])
+
+    def add_offsets(self, pairs):
+        """ Add many occurrences, returning True if any where added. """
+        offsets = self.offsets()
+        existing = set(offsets)
+        new = set(tuple(p) for p in pairs) - existing
+        if not new:
             return False
 
-        self.offset_list = ((self.offset_list or '') + " %d:%d" % pair).strip()
+        self.set_offsets(offsets + list(new))
         return True
 
-    def add_offsets(self, pairs):
-        """ Add many occurrences, returning True if any where added. """
-        added = False
-        for p in pairs:
-            added |= self.add_offset(p)
-        return added
 
+    @property
+    def offset_list(self):
+        """ String of offset:length pairs, may be empty. """
+        return ' '.join('%d:%d' % p for p in self.offsets())
+
+    @offset_list.setter
+    def offset_list(self, value):
+        offsets = (e.split(':') for e in self.SPACE_RE.split((value or '').strip()))
+        self.set_offsets((pair[0], pair[1]) for pair in offsets if pair and pair[0])
+
+
+    @classmethod
+    def pack_offsets(cls, offsets):
+        """ Pack a sorted list of +(offset, length)+ pairs into a string of bytes. """
+        a = array(cls.TYPECODE, (n for pair in offsets for n in pair))
+        if sys.byteorder == 'big':
+            a.byteswap()
+        return a.tostring()
+
+    @classmethod
+    def unpack_offsets(cls, data):
+        """ Unpack a string of bytes from +pack_offsets+ into a list of +(offset, length)+ pairs. """
+        if not data:
+            return []
 
+        a = array(cls.TYPECODE)
+        a.fromstring(str(data))
+        if sys.byteorder == 'big':
+            a.byteswap()
+        return zip(a[0::2], a[1::2])
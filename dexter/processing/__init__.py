@@ -1,5 +1,12 @@
 class ProcessingError(StandardError):
     pass
 
+class NotCachedError(ProcessingError):
+    """ An offline extractor has no cached response to use. """
+    pass
+
 from document_processor import DocumentProcessor
 from bias import BiasCalculator
+from batch import BatchProcessor
+from jobs import JobRunner
+from reextract import Reextractor
@@ -0,0 +1,229 @@
+from __future__ import division
+from multiprocessing.pool import ThreadPool
+from collections import Counter
+import time
+import logging
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..models import db, Document
+from .document_processor import DocumentProcessor
+
+
+class BatchResult(object):
+    """ The outcome of processing a single URL in a batch. """
+    ADDED   = 'added'
+    EXISTS  = 'exists'
+    INVALID = 'invalid'
+    FAILED  = 'failed'
+
+    def __init__(self, url):
+        self.url = url
+        self.status = None
+        self.message = None
+        self.document_id = None
+
+    def as_dict(self):
+        return {
+            'url': self.url,
+            'status': self.status,
+            'message': self.message,
+            'document_id': self.document_id,
+        }
+
+    def __repr__(self):
+        return "<BatchResult url=%s, status=%s>" % (self.url, self.status)
+
+
+class BatchProcessor(object):
+    """
+    Process a batch of URLs in two stages. Articles are downloaded
+    concurrently by a bounded pool of threads, and are then extracted
+    and saved one at a time on the calling thread, which is the only
+    one that talks to the database. Documents are committed in bulk.
+    """
+    log = logging.getLogger(__name__)
+
+    def __init__(self, threads=8, commit_every=25, user=None):
+        self.processor = DocumentProcessor()
+        self.threads = threads
+        self.commit_every = commit_every
+        self.user = user
+
+        self.results = []
+        self.uncommitted = []
+        self.elapsed = 0
+
+
+    def process_urls(self, urls):
+        """ Process all of +urls+ and return a list of BatchResult
+        instances, in the same order as the urls. """
+        start = time.time()
+        self.results = []
+
+        pending = self.prepare(urls)
+        self.log.info("Downloading %d of %d urls with %d threads" % (len(pending), len(self.results), self.threads))
+
+        saved = 0
+        pool = ThreadPool(self.threads)
+        try:
+            # extract documents as soon as they're downloaded, so that
+            # the two stages overlap
+            for result, crawler, doc, raw in pool.imap_unordered(self.download, pending):
+                if result.status is None and self.save(result, crawler, doc, raw):
+                    saved += 1
+                    if saved % self.commit_every == 0:
+                        self.commit()
+        finally:
+            pool.close()
+            pool.join()
+
+        self.commit()
+
+        self.elapsed = time.time() - start
+        self.log.info("Processed %d urls in %.1f seconds (%.2f urls/sec): %s" % (
+            len(self.results), self.elapsed, self.throughput(), self.summary()))
+
+        return self.results
+
+
+    def prepare(self, urls):
+        """ Validate and canonicalise +urls+, skipping those we already
+        have. Returns a list of (result, crawler, doc) tuples that must
+        still be downloaded. """
+        pending = []
+        seen = {}
+
+        for url in urls:
+            url = url.strip()
+            if not url:
+                continue
+
+            result = BatchResult(url)
+            self.results.append(result)
+
+            crawler = self.processor.crawler_for(url)
+            if not crawler:
+                result.status = BatchResult.INVALID
+                result.message = "The URL isn't valid or we don't know how to process it."
+                continue
+
+            canonical = self.processor.canonicalise_url(url)
+            if canonical in seen:
+                result.status = BatchResult.EXISTS
+                result.message = "Duplicate of %s" % seen[canonical]
+                continue
+            seen[canonical] = url
+
+            doc = Document()
+            doc.url = canonical
+            pending.append((result, crawler, doc))
+
+        # find documents we already have, in bulk
+        existing = self.existing_documents([doc.url for _, _, doc in pending])
+        todo = []
+        for result, crawler, doc in pending:
+            if doc.url in existing:
+                result.status = BatchResult.EXISTS
+                result.message = "We already have that article."
+                result.document_id = existing[doc.url]
+            else:
+                todo.append((result, crawler, doc))
+
+        return todo
+
+
+    def existing_documents(self, urls, chunk_size=500):
+        """ Map from url to document id for documents we already have. """
+        existing = {}
+        for i in xrange(0, len(urls), chunk_size):
+            chunk = urls[i:i + chunk_size]
+            for id, url in db.session.query(Document.id, Document.url).filter(Document.url.in_(chunk)):
+                existing[url] = id
+        return existing
+
+
+    def download(self, item):
+        """ Download the raw content for a document. This is run
+        in a worker thread and must not touch the database. """
+        result, crawler, doc = item
+        raw = None
+
+        try:
+            raw = crawler.download(doc)
+        except Exception as e:
+            self.log.warn("Error downloading %s: %s" % (doc.url, e), exc_info=e)
+            result.status = BatchResult.FAILED
+            result.message = "Error fetching document: %s" % (e,)
+
+        return result, crawler, doc, raw
+
+
+    def save(self, result, crawler, doc, raw):
+        """ Extract and save a downloaded document. Returns True on success.
+
+        Each document is saved in a savepoint, so a document that can't be
+        processed is discarded, along with anything its extractors added to
+        the session, without affecting the rest of the batch. If the
+        savepoint itself can't be rolled back, such as after a deadlock,
+        everything since the last commit is rolled back.
+        """
+        savepoint = db.session.begin_nested()
+        try:
+            crawler.extract(doc, raw)
+            self.processor.process_document(doc)
+
+            if self.user:
+                doc.created_by = self.user
+
+            db.session.add(doc)
+            db.session.flush()
+            savepoint.commit()
+        except Exception as e:
+            self.log.error("Error processing %s: %s" % (doc.url, e), exc_info=e)
+            self.fail(result, e)
+            self.discard(savepoint)
+            return False
+
+        self.log.info("Document added by %s: %s" % (self.user, doc))
+        result.status = BatchResult.ADDED
+        result.document_id = doc.id
+        self.uncommitted.append(result)
+        return True
+
+
+    def discard(self, savepoint):
+        """ Roll back +savepoint+. This also removes everything added to the
+        session since it began, flushed or not. """
+        try:
+            savepoint.rollback()
+        except SQLAlchemyError as e:
+            self.log.error("Error rolling back savepoint, rolling back everything uncommitted: %s" % e, exc_info=e)
+            db.session.rollback()
+
+            for r in self.uncommitted:
+                r.status = BatchResult.FAILED
+                r.message = "Rolled back after an error"
+                r.document_id = None
+            self.uncommitted = []
+
+
+    def commit(self):
+        db.session.commit()
+        self.uncommitted = []
+
+
+    def fail(self, result, e):
+        result.status = BatchResult.FAILED
+        result.message = "Something went wrong processing the document: %s" % (e,)
+
+
+    def summary(self):
+        """ Map from status to number of urls with that status. """
+        return dict(Counter(r.status for r in self.results))
+
+    def throughput(self):
+        """ URLs processed per second. """
+        if not self.elapsed:
+            return 0
+        return len(self.results) / self.elapsed
@@ -4,9 +4,12 @@ from itertools import groupby
 import math
 import logging
 
+import numpy
+
 from sqlalchemy.orm import joinedload, lazyload
+from sqlalchemy.sql import func, case, or_
 
-from ..models import Document
+from ..models import db, Document, DocumentSource, DocumentFairness, Fairness, Affiliation, Medium, DocumentRollup
 
 class BiasCalculator:
     """
@@ -15,6 +18,9 @@ class BiasCalculator:
     """
     log = logging.getLogger(__name__)
 
+    # a medium's group, for use with calculate_grouped_bias_scores
+    MEDIUM_GROUP = DocumentRollup.MEDIUM_GROUP
+
     def get_query(self):
         return Document.query\
             .options(
@@ -37,6 +43,132 @@ class BiasCalculator:
         return [self.calculate_bias(k, list(group), entropy) for k, group in groupby(docs, key)]
 
 
+    def calculate_grouped_bias_scores(self, query, groups):
+        """
+        Return a list of BiasScore instances for the documents matched by
+        +query+, a query for documents, grouped by the SQL expressions in
+        +groups+. These can use columns of the document's medium, such as
+        +MEDIUM_GROUP+.
+
+        Unlike +calculate_bias_scores+, the counting is done in the database
+        and only small tables of counts per group are fetched, so this is
+        fast for large numbers of documents. A score's group is the value of
+        the group expression, or a tuple of values if there are many.
+        """
+        # the id and group of each document
+        docs = query\
+            .join(Medium, Document.medium_id == Medium.id)\
+            .with_entities(Document.id.label('id'), *[g.label('group_%d' % i) for i, g in enumerate(groups)])\
+            .subquery('bias_documents')
+        group_cols = [docs.c['group_%d' % i] for i in xrange(len(groups))]
+        n = len(group_cols)
+
+        def grouped(*counts):
+            return db.session.query(*(group_cols + list(counts)))\
+                .select_from(docs)\
+                .group_by(*group_cols)
+
+        def key(row):
+            return row[0] if n == 1 else tuple(row[:n])
+
+        # documents per group
+        scores = {}
+        for row in grouped(func.count(docs.c.id)):
+            score = BiasScore()
+            score.group = key(row)
+            score.count = row[n]
+            score.fair = 1
+            scores[score.group] = score
+
+        # documents are fair unless they have fairness entries, other than
+        # a single 'Fair' entry
+        fairness = db.session.query(
+                DocumentFairness.doc_id.label('doc_id'),
+                func.count(DocumentFairness.id).label('entries'),
+                func.sum(case([(Fairness.name == 'Fair', 1)], else_=0)).label('fair'))\
+            .join(Fairness, DocumentFairness.fairness_id == Fairness.id)\
+            .group_by(DocumentFairness.doc_id)\
+            .subquery('bias_fairness')
+
+        unfair = grouped(func.count(docs.c.id))\
+            .join(fairness, fairness.c.doc_id == docs.c.id)\
+            .filter(or_(fairness.c.entries != 1, fairness.c.fair != 1))
+        for row in unfair:
+            score = scores[key(row)]
+            score.fair = (score.count - row[n]) / score.count
+
+        # how many items (dis)favoured?
+        favour = grouped(
+                func.count(DocumentFairness.bias_favour_affiliation_id),
+                func.count(DocumentFairness.bias_oppose_affiliation_id))\
+            .join(DocumentFairness, DocumentFairness.doc_id == docs.c.id)
+        for row in favour:
+            score = scores[key(row)]
+            score.favour = row[n]
+            score.oppose = row[n + 1]
+
+        # political party sources for the entropy calculation
+        counts = defaultdict(lambda: defaultdict(int))
+        sources = grouped(Affiliation.name, func.count(DocumentSource.id))\
+            .join(DocumentSource, DocumentSource.doc_id == docs.c.id)\
+            .join(Affiliation, DocumentSource.affiliation_id == Affiliation.id)\
+            .filter(Affiliation.code.startswith('4.'))\
+            .group_by(Affiliation.name)
+        for row in sources:
+            counts[key(row)][row[n]] += row[n + 1]
+
+        entropy = self.calculate_entropy(counts)
+        for group, score in scores.iteritems():
+            score.parties = entropy.get(group, 0)
+
+        return sorted(scores.values(), key=lambda s: s.group)
+
+
+    def calculate_rollup_bias_scores(self, start_date, end_date):
+        """
+        Return a list of BiasScore instances for documents published between
+        +start_date+ and +end_date+ (inclusive dates), grouped by medium
+        group and medium type.
+
+        The counts are summed from the daily +DocumentRollup+ rows, so this
+        doesn't touch the documents themselves. A score's group is a
+        (medium_group, medium_type) tuple.
+        """
+        def summary(metric):
+            return DocumentRollup.summary(metric, start_date, end_date)
+
+        def key(row):
+            return (row.medium_group, row.medium_type)
+
+        scores = {}
+        for row in summary('documents'):
+            score = BiasScore()
+            score.group = key(row)
+            score.count = int(row.record_count)
+            score.fair = 1
+            scores[score.group] = score
+
+        for row in summary('unfair'):
+            score = scores[key(row)]
+            score.fair = (score.count - int(row.record_count)) / score.count
+
+        for row in summary('favour'):
+            scores[key(row)].favour += int(row.record_count)
+
+        for row in summary('oppose'):
+            scores[key(row)].oppose += int(row.record_count)
+
+        counts = defaultdict(lambda: defaultdict(int))
+        for row in summary('party_source'):
+            counts[key(row)][row.label] += int(row.record_count)
+
+        entropy = self.calculate_entropy(counts)
+        for group, score in scores.iteritems():
+            score.parties = entropy.get(group, 0)
+
+        return sorted(scores.values(), key=lambda s: s.group)
+
+
     def calculate_bias(self, group, docs, entropy):
         """
         Calculate the bias for +docs+.
@@ -90,6 +222,74 @@ class BiasCalculator:
         is to the other columns in the table.
 
         Returns a map from column labels to entropy values.
+
+        The table is converted into a matrix and the calculation is done
+        on whole arrays. The results are identical to +calculate_entropy_loops+.
+        """
+        self.log.debug("Calculating entropy")
+
+        col_labels = table.keys()
+        row_labels = set()
+        for d in table.itervalues():
+            row_labels.update(d.keys())
+        row_labels = list(row_labels)
+
+        # one row per column label, one column per row label
+        counts = numpy.zeros((len(col_labels), len(row_labels)))
+        row_index = dict((row, i) for i, row in enumerate(row_labels))
+        for i, col in enumerate(col_labels):
+            for row, n in table[col].iteritems():
+                counts[i, row_index[row]] = n
+
+        col_sums = counts.sum(axis=1)
+        total = col_sums.sum()
+        filled = col_sums != 0
+
+        entropy = dict((col, 0) for col in col_labels)
+        if not filled.any():
+            return entropy
+
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            # how much does each row contribute to the total
+            row_fractions = counts.sum(axis=0) / total
+
+            # the fraction each row contributes to each column,
+            # as a fraction of the total row
+            coverage = counts[filled] / col_sums[filled][:, numpy.newaxis] / row_fractions
+            coverage[:, row_fractions <= 0] = 0
+
+            # cumsum adds in order, as the loops do, so that results match exactly
+            k = 1 / numpy.cumsum(coverage, axis=1)[:, -1]
+            p = k[:, numpy.newaxis] * coverage
+            p = numpy.where(p > 0, p * numpy.log(p), p)
+            total_p = numpy.cumsum(p, axis=1)[:, -1]
+
+        if len(row_labels) == 1:
+            # avoid 1/0
+            log = 1
+        else:
+            log = 1 / math.log(len(row_labels))
+
+        for col, e in zip((c for c, f in zip(col_labels, filled) if f), (-log * total_p).tolist()):
+            entropy[col] = e
+
+        self.log.debug("Done")
+
+        return entropy
+
+
+    def calculate_entropy_loops(self, table):
+        """ Calculate entropy across +table+, which is a map
+        representing a table: the keys are the columns and the
+        values are dicts whose keys in turn are the rows.
+
+        The entropy is a measure of how different each column
+        is to the other columns in the table.
+
+        Returns a map from column labels to entropy values.
+
+        This is the original, pure-Python version of +calculate_entropy+,
+        kept as a reference for tests and benchmarks.
         """
         self.log.debug("Calculating entropy")
 
@@ -5,3 +5,8 @@ from .dailysun import DailysunCrawler
 from .news24 import News24Crawler
 from .iol import IOLCrawler
 from .generic import GenericCrawler
+
+from .registry import registry, register
+
+# everything else
+registry.fallback = GenericCrawler()
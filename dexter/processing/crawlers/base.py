@@ -2,18 +2,35 @@ from urlparse import urlparse, urlunparse
 from dateutil.parser import parse
 
 import logging
-import requests
 
 from tld import get_tld
 
+from .http_client import HTTPClient
+from .html_cache import HTMLCache
 from ...models import Medium
+from ...processing import ProcessingError
 
 class BaseCrawler(object):
     log = logging.getLogger(__name__)
 
+    # HTTP client shared by all crawlers
+    http = HTTPClient()
+
+    # raw HTML cache shared by all crawlers
+    html_cache = HTMLCache()
+
+    # when True, only use the raw HTML cache and never fetch from the network
+    offline = False
+
+    # domains this crawler handles, see registry.py
+    DOMAINS = []
+
     def offer(self, url):
         """ Can this crawler process this URL? """
-        raise NotImplemented()
+        host = urlparse(url).hostname or ''
+        if host.startswith('www.'):
+            host = host[4:]
+        return host in self.DOMAINS
 
     def canonicalise_url(self, url):
         """ Strip anchors, etc."""
@@ -24,10 +41,18 @@ class BaseCrawler(object):
 
     def crawl(self, doc):
         """ Crawl this document. """
-        doc.url = self.canonicalise_url(doc.url)
-        raw_html = self.fetch(doc.url)
+        raw_html = self.download(doc)
         self.extract(doc, raw_html)
 
+    def download(self, doc):
+        """
+        Canonicalise the document's URL and download its raw content,
+        which is later passed to +extract+. This doesn't touch the
+        database, so it's safe to call from a worker thread.
+        """
+        doc.url = self.canonicalise_url(doc.url)
+        return self.fetch(doc.url)
+
     def fetch(self, url):
         """
         Fetch and return the raw HTML for this url.
@@ -35,13 +60,38 @@ class BaseCrawler(object):
         """
         self.log.info("Fetching URL: " + url)
 
-        r = requests.get(url)
-        # raise an HTTPError on badness
-        r.raise_for_status()
+        r = self.get(url)
 
         # this decodes r.content using a guessed encoding
         return r.text
 
+    def get(self, url):
+        """
+        GET +url+ and return the response, using the raw HTML cache. A cached
+        response is revalidated with a conditional GET, unless we're offline.
+        """
+        cached = self.html_cache.get(url)
+
+        if self.offline:
+            if cached is None:
+                raise ProcessingError("We're offline and %s isn't in the cache" % url)
+            return cached
+
+        headers = {}
+        if cached is not None:
+            if cached.headers.get('ETag'):
+                headers['If-None-Match'] = cached.headers['ETag']
+            if cached.headers.get('Last-Modified'):
+                headers['If-Modified-Since'] = cached.headers['Last-Modified']
+
+        r = self.http.get(url, headers=headers)
+        if r.status_code == 304 and cached is not None:
+            self.log.info("Not modified: %s" % url)
+            return cached
+
+        self.html_cache.put(url, r)
+        return r
+
     def extract(self, doc, raw_html):
         """ Run extractions on the HTML. Subclasses should override this
         method and call super() in their implementations. """
@@ -57,6 +107,7 @@ class BaseCrawler(object):
         return parse(ts, dayfirst=True)
 
     def identify_medium(self, doc):
+        domain = ''
         if doc.url:
             domain = get_tld(doc.url)
             parts = urlparse(doc.url)
@@ -64,9 +115,5 @@ class BaseCrawler(object):
             # iol.co.za/isolezwe
             domain = domain + parts.path
 
-            # find the medium with the longest matching domain
-            for medium in sorted(Medium.query.all(), key=lambda m: len(m.domain or ''), reverse=True):
-                if medium.domain and domain.startswith(medium.domain):
-                    return medium
-
-        return Medium.query.filter(Medium.name == "Unknown").one()
+        # find the medium with the longest matching domain
+        return Medium.for_domain(domain)
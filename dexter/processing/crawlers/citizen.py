@@ -1,19 +1,15 @@
 from urlparse import urlparse, urlunparse
-import re
 
 from bs4 import BeautifulSoup
 import requests
 
 from .base import BaseCrawler
+from .registry import register
 from ...models import Entity, Author, AuthorType
 
+@register
 class CitizenCrawler(BaseCrawler):
-    TL_RE = re.compile('(www\.)?citizen.co.za')
-
-    def offer(self, url):
-        """ Can this crawler process this URL? """
-        parts = urlparse(url)
-        return bool(self.TL_RE.match(parts.netloc))
+    DOMAINS = ['citizen.co.za']
 
     def canonicalise_url(self, url):
         """ Strip anchors, etc. """
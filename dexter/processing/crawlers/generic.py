@@ -1,4 +1,5 @@
 from newspaper import Article
+from newspaper.network import get_html
 from sqlalchemy.orm.exc import NoResultFound
 
 from .base import BaseCrawler
@@ -11,15 +12,16 @@ class GenericCrawler(BaseCrawler):
 
         return True
 
-    def crawl(self, doc):
-        """ Crawl this document. """
-
-        # instantiate and download article
+    def download(self, doc):
+        """ Download this document, returning a newspaper Article. """
         article = Article(url=doc.url, language='en', fetch_images=False, request_timeout=10)
-        article.download()
 
-        # extract content
-        self.extract(doc, article)
+        # use our HTTP client rather than newspaper's, but let newspaper
+        # decide how to decode the response
+        self.log.info("Fetching URL: " + doc.url)
+        article.set_html(get_html(doc.url, response=self.get(doc.url)))
+
+        return article
 
 
     def extract(self, doc, article):
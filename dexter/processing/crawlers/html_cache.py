@@ -0,0 +1,57 @@
+import md5
+import time
+import base64
+import logging
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from ..extractors.cache import SQLiteCacheStore
+
+
+class HTMLCache(object):
+    """
+    A cache of raw HTML responses, keyed on the URL that was fetched. We store
+    the ETag and Last-Modified headers along with the body so that
+    crawlers can revalidate their copy with a conditional GET.
+
+    Entries are kept in a +CacheStore+, by default a +SQLiteCacheStore+ in
+    +cache/crawlers.db+, which evicts the least recently used entries once
+    it grows past its maximum size.
+    """
+    log = logging.getLogger(__name__)
+
+    def __init__(self, store=None):
+        self.store = store or SQLiteCacheStore('cache/crawlers.db', max_size=500 * 1024 * 1024)
+
+    def get(self, url):
+        """ Return a cached Response for +url+, or None. """
+        entry = self.store.get(self.key(url))
+        if entry is None:
+            return None
+
+        r = Response()
+        r.status_code = 200
+        r.url = entry['url']
+        r.encoding = entry.get('encoding')
+        r.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        r._content = base64.b64decode(entry['content'])
+        return r
+
+    def put(self, url, response):
+        """ Cache +response+ for +url+. """
+        self.store.put(self.key(url), {
+            'url': url,
+            'encoding': response.encoding,
+            'fetched_at': time.time(),
+            'headers': dict((k, response.headers[k]) for k in ['ETag', 'Last-Modified', 'Content-Type']
+                            if response.headers.get(k)),
+            # the raw body may not be valid in any encoding
+            'content': base64.b64encode(response.content),
+        })
+
+    def stats(self):
+        return self.store.stats()
+
+    def key(self, url):
+        return md5.md5(url.encode('utf-8')).hexdigest()
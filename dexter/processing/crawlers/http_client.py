@@ -0,0 +1,82 @@
+from urlparse import urlparse
+import threading
+import time
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
+
+
+class HTTPClient(object):
+    """
+    HTTP client shared by all crawlers.
+
+    Connections are pooled and kept alive, so that repeated fetches from
+    the same publisher re-use TCP and TLS connections. The number of
+    concurrent requests to a single host is capped, every request has
+    a timeout and failed requests are retried with exponential backoff.
+
+    This is safe to use from multiple threads.
+    """
+    log = logging.getLogger(__name__)
+
+    # retry requests that fail with these status codes
+    RETRY_STATUSES = set([429, 500, 502, 503, 504])
+
+    def __init__(self, timeout=30, max_per_host=4, retries=3, backoff=0.5, pool_hosts=20):
+        self.timeout = timeout
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff = backoff
+
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'Dexter (Media Monitoring Africa)'
+
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=max_per_host)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.host_semaphores = {}
+        self.lock = threading.Lock()
+
+
+    def get(self, url, headers=None):
+        """ GET +url+ and return the response, raising an HTTPError
+        for error responses. """
+        attempt = 0
+
+        while True:
+            try:
+                with self.host_semaphore(url):
+                    r = self.session.get(url, headers=headers, timeout=self.timeout)
+
+                if r.status_code not in self.RETRY_STATUSES:
+                    # raise an HTTPError on badness
+                    r.raise_for_status()
+                    return r
+
+                if attempt >= self.retries:
+                    r.raise_for_status()
+
+                self.log.warn("Error fetching %s: HTTP %s" % (url, r.status_code))
+
+            except (ConnectionError, Timeout) as e:
+                if attempt >= self.retries:
+                    raise
+                self.log.warn("Error fetching %s: %s" % (url, e))
+
+            delay = self.backoff * (2 ** attempt)
+            attempt += 1
+            self.log.info("Retrying %s in %.1f seconds (attempt %d of %d)" % (url, delay, attempt, self.retries))
+            time.sleep(delay)
+
+
+    def host_semaphore(self, url):
+        """ The semaphore that limits concurrent requests to this url's host. """
+        host = urlparse(url).netloc.lower()
+
+        with self.lock:
+            if host not in self.host_semaphores:
+                self.host_semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self.host_semaphores[host]
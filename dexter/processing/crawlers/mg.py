@@ -1,19 +1,15 @@
 from urlparse import urlparse, urlunparse
-import re
 
 from bs4 import BeautifulSoup
 import requests
 
 from .base import BaseCrawler
+from .registry import register
 from ...models import Entity, Author, AuthorType
 
+@register
 class MGCrawler(BaseCrawler):
-    MG_RE = re.compile('(www\.)?mg.co.za')
-
-    def offer(self, url):
-        """ Can this crawler process this URL? """
-        parts = urlparse(url)
-        return bool(self.MG_RE.match(parts.netloc))
+    DOMAINS = ['mg.co.za']
 
     def canonicalise_url(self, url):
         """ Strip anchors, etc. """
@@ -27,9 +23,7 @@ class MGCrawler(BaseCrawler):
 
         self.log.info("Fetching URL: " + url)
 
-        r = requests.get(url)
-        # raise an HTTPError on badness
-        r.raise_for_status()
+        r = self.get(url)
 
         return r.text.encode('utf8')
 
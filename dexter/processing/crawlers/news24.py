@@ -1,20 +1,16 @@
 from urlparse import urlparse, urlunparse
-import re
 
 from bs4 import BeautifulSoup
 import requests
 
 from .base import BaseCrawler
+from .registry import register
 from .generic import GenericCrawler
 from ...models import Entity, Author, AuthorType
 
+@register
 class News24Crawler(BaseCrawler):
-    TL_RE = re.compile('(www\.)?news24.com')
-
-    def offer(self, url):
-        """ Can this crawler process this URL? """
-        parts = urlparse(url)
-        return bool(self.TL_RE.match(parts.netloc))
+    DOMAINS = ['news24.com']
 
     def canonicalise_url(self, url):
         """ Strip anchors, etc. """
@@ -0,0 +1,61 @@
+from urlparse import urlparse
+
+
+class CrawlerRegistry(object):
+    """
+    Finds the crawler for a URL by looking up its hostname, so the cost
+    doesn't grow with the number of crawlers.
+
+    Site crawlers list the domains they handle in +DOMAINS+ and are added
+    with the +register+ class decorator. URLs for sites without a crawler
+    of their own go to the +fallback+ crawler, if there is one.
+    """
+    SCHEMES = set(['http', 'https'])
+
+    def __init__(self):
+        self.hosts = {}
+        self.fallback = None
+
+    def register(self, crawler, domains=None):
+        """ Use +crawler+ for URLs on +domains+ (by default, crawler.DOMAINS),
+        with or without a leading 'www.'. """
+        for domain in (domains or crawler.DOMAINS):
+            domain = domain.lower()
+            if domain.startswith('www.'):
+                domain = domain[4:]
+
+            self.hosts[domain] = crawler
+            self.hosts['www.' + domain] = crawler
+
+    def crawler_for(self, url):
+        """ The crawler for +url+, or None if we can't process it. """
+        host = self.hostname(url)
+        if not host:
+            return None
+
+        return self.hosts.get(host, self.fallback)
+
+    def valid_url(self, url):
+        """ Is this a URL we can process? """
+        return self.crawler_for(url) is not None
+
+    def hostname(self, url):
+        """ The lowercased hostname of an http(s) URL, or None. """
+        try:
+            parts = urlparse(url.strip())
+        except (AttributeError, ValueError):
+            return None
+
+        if parts.scheme.lower() not in self.SCHEMES:
+            return None
+
+        return parts.hostname
+
+
+# the registry of all crawlers
+registry = CrawlerRegistry()
+
+def register(cls):
+    """ Class decorator that adds a crawler to the registry. """
+    registry.register(cls())
+    return cls
@@ -1,43 +1,49 @@
 from itertools import chain
+from multiprocessing.pool import ThreadPool
+import threading
 
 from ..models import Document, Entity, db, Gender, Person, DocumentType, DocumentFairness, Fairness
+from ..models.reference import reference
 from ..processing import ProcessingError
 
-from .crawlers import MGCrawler, TimesLiveCrawler, IOLCrawler, CitizenCrawler, DailysunCrawler, News24Crawler, GenericCrawler
+from .crawlers import registry
 from .extractors import AlchemyExtractor, CalaisExtractor, SourcesExtractor
 
 from requests.exceptions import HTTPError
 import logging
 
-class DocumentProcessor:
+class DocumentProcessor(object):
     log = logging.getLogger(__name__)
 
+    # number of threads used to run extractor fetch tasks concurrently
+    FETCH_THREADS = 8
+    _fetch_pool = None
+    fetch_pool_lock = threading.Lock()
+
     def __init__(self):
-        self.crawlers = [
-                MGCrawler(),
-                TimesLiveCrawler(),
-                CitizenCrawler(),
-                DailysunCrawler(),
-                News24Crawler(),
-                IOLCrawler(),
-                GenericCrawler()]
+        self.crawlers = registry
         self.extractors = [AlchemyExtractor(), CalaisExtractor(), SourcesExtractor()]
 
 
     def valid_url(self, url):
         """ Is this a URL we can process? """
-        return any(c.offer(url) for c in self.crawlers)
+        return self.crawlers.valid_url(url)
 
 
     def canonicalise_url(self, url):
         """ Try to canonicalise this url. Strip anchors, etc. """
-        for crawler in self.crawlers:
-            if crawler.offer(url):
-                return crawler.canonicalise_url(url)
+        crawler = self.crawler_for(url)
+        if crawler:
+            return crawler.canonicalise_url(url)
 
         return url
 
 
+    def crawler_for(self, url):
+        """ The crawler that can process +url+, or None. """
+        return self.crawlers.crawler_for(url)
+
+
     def process_url(self, url):
         """ Download and process an article at +url+ and return
         a Document instance. """
@@ -64,27 +70,68 @@ class DocumentProcessor:
         doc.normalise_text()
 
         if not doc.document_type:
-            doc.document_type = DocumentType.query.filter(DocumentType.name == 'News story').one()
+            doc.document_type = reference.one(DocumentType, name='News story')
 
         if not doc.fairness:
             df = DocumentFairness()
-            df.fairness = Fairness.query.filter(Fairness.name == 'Fair').one()
+            df.fairness = reference.one(Fairness, name='Fair')
             doc.fairness.append(df)
 
 
     def crawl(self, doc):
         """ Run crawlers against a document's URL to fetch its
         content, updating any existing content. """
-        for crawler in self.crawlers:
-            if crawler.offer(doc.url):
-                crawler.crawl(doc)
-                return
+        crawler = self.crawler_for(doc.url)
+        if crawler:
+            crawler.crawl(doc)
 
 
     def extract(self, doc):
-        """ Run extraction routines on a document. """
+        """ Run extraction routines on a document.
+
+        The fetch tasks of all the extractors are run concurrently, and
+        the results are then merged into the document one extractor at
+        a time, in order, on this thread.
+        """
+        self.merge(doc, self.fetch(doc))
+
+
+    def fetch(self, doc):
+        """ Run the fetch tasks of all extractors concurrently, returning
+        a list of (extractor, task name, result) tuples. This doesn't
+        change the document. """
+        # load these now, so that fetch tasks don't lazy-load them from another thread
+        doc.url, doc.text
+
+        tasks = [(extractor, name, task) for extractor in self.extractors
+                                         for name, task in extractor.fetch_tasks(doc)]
+
+        if len(tasks) > 1:
+            pool = self.fetch_pool()
+            pending = [(extractor, name, pool.apply_async(task)) for extractor, name, task in tasks]
+            # wait for everything to finish before raising any errors
+            for _, _, result in pending:
+                result.wait()
+            return [(extractor, name, result.get()) for extractor, name, result in pending]
+
+        return [(extractor, name, task()) for extractor, name, task in tasks]
+
+
+    def merge(self, doc, fetched):
+        """ Merge the results of +fetch+ into the document. """
         for extractor in self.extractors:
-            extractor.extract(doc)
+            results = dict((name, value) for ex, name, value in fetched if ex is extractor)
+            extractor.merge(doc, results)
+
+
+    @classmethod
+    def fetch_pool(cls):
+        """ The pool of threads shared by all processors for running fetch tasks.
+        It's created on first use, so that it's not shared across forked processes. """
+        with cls.fetch_pool_lock:
+            if cls._fetch_pool is None:
+                cls._fetch_pool = ThreadPool(cls.FETCH_THREADS)
+            return cls._fetch_pool
 
 
     def get_or_set_entity(self, entities, entity):
@@ -0,0 +1,118 @@
+import tempfile
+
+from ..models import Document, db
+
+
+class ExportBuilder(object):
+    """
+    Base class for exports of the documents matching an +ActivityForm+,
+    such as spreadsheets.
+
+    Sheets of rows are taken from the reporting views and filtered by
+    joining against the documents matching the form. Rows are read from
+    the database for a page of documents at a time, so that builders can
+    write them out as they go.
+    """
+    # rows to write at a time
+    BATCH_SIZE = 500
+
+    # documents to read rows for at a time
+    PAGE_SIZE = 200
+
+    # the sheets of rows that can be exported
+    SHEETS = ['documents', 'sources', 'fairness', 'everything']
+
+    # mimetype and file extension of the export
+    MIMETYPE = 'application/octet-stream'
+    EXTENSION = None
+
+    def __init__(self, form):
+        self.form = form
+
+        # we join against the ids of the matching documents to filter our
+        # queries, rather than trying to pull complex filter logic into
+        # our view queries
+        self.docs = form.filter_query(db.session.query(Document.id))\
+                .distinct()\
+                .subquery('filtered_documents')
+
+    def build(self):
+        """
+        Generate the export and return it as a temporary file, positioned
+        at the start. The file is deleted when it's closed.
+        """
+        output = tempfile.TemporaryFile()
+        self.write(output)
+        output.seek(0)
+        return output
+
+    def write(self, output):
+        """
+        Write the export to +output+, a file object.
+        """
+        raise NotImplementedError()
+
+    def sheet_query(self, sheet):
+        """ The query for the rows of +sheet+, limited to the matching documents. """
+        from dexter.models.views import DocumentsView, DocumentSourcesView, DocumentFairnessView
+
+        if sheet == 'documents':
+            query = db.session.query(DocumentsView)\
+                    .join(Document)
+
+        elif sheet == 'sources':
+            query = db.session.query(DocumentSourcesView)\
+                    .join(Document)
+
+        elif sheet == 'fairness':
+            query = db.session.query(DocumentsView, DocumentFairnessView)\
+                    .join(Document)\
+                    .join(DocumentFairnessView)
+
+        elif sheet == 'everything':
+            query = db.session.query(DocumentsView, DocumentFairnessView, DocumentSourcesView)\
+                    .join(Document)\
+                    .join(DocumentFairnessView)\
+                    .join(DocumentSourcesView)
+
+        else:
+            raise ValueError("Unknown sheet: %s" % sheet)
+
+        return self.filter(query)
+
+    def columns(self, query, dedup=False):
+        """ A list of (name, type) pairs for the columns of rows from +query+.
+        Joining views can result in columns with the same name; if +dedup+
+        is True, these are de-duplicated and the columns are sorted by name. """
+        columns = [(c['name'], c['type']) for c in query.column_descriptions]
+
+        if dedup:
+            columns = sorted(dict(reversed(columns)).items())
+
+        return columns
+
+    def filter(self, query):
+        """ Limit +query+, which must include documents, to the documents
+        matching the form. """
+        return query.join(self.docs, self.docs.c.id == Document.id)
+
+    def stream(self, query):
+        """ Iterate over the results of +query+, which must include documents,
+        ordered by document and reading the rows for +PAGE_SIZE+ documents at
+        a time. MySQLdb reads a query's whole result set into memory, even
+        with +yield_per+, so this keeps each result set small. """
+        ids = self.docs.c.id
+        last_id = None
+
+        while True:
+            page = db.session.query(ids)
+            if last_id is not None:
+                page = page.filter(ids > last_id)
+            page = [id for id, in page.order_by(ids).limit(self.PAGE_SIZE)]
+            if not page:
+                break
+
+            for row in query.filter(Document.id >= page[0], Document.id <= page[-1]).order_by(Document.id):
+                yield row
+
+            last_id = page[-1]
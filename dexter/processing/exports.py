@@ -0,0 +1,95 @@
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import logging
+
+from ..models import Document
+
+
+class ExportStore(object):
+    """
+    A store of finished exports, such as spreadsheets of documents, saved
+    as files under +root+.
+
+    Exports are named by a key derived from the export's filters and the
+    state of the documents, so an identical export is served from the
+    store until a document, or its sources or fairness, is added, changed
+    or deleted. Exports older than
+    +max_age+ seconds are removed from time to time.
+    """
+    log = logging.getLogger(__name__)
+
+    # bump this to ignore exports built by older code
+    VERSION = 1
+
+    key_re = re.compile('^[0-9a-f]{40}$')
+
+    def __init__(self, root='cache/exports', max_age=7 * 24 * 60 * 60):
+        self.root = root
+        self.max_age = max_age
+
+    def key(self, filters, extension):
+        """ The key for an export with these +filters+ (a dict, such as from
+        +ActivityForm.as_dict()+) and file +extension+. """
+        parts = [
+            json.dumps(filters, sort_keys=True),
+            extension,
+            str(self.VERSION),
+        ]
+
+        for latest, count in Document.change_markers():
+            parts.append(latest.isoformat() if latest else '')
+            parts.append(str(count))
+
+        return hashlib.sha1('|'.join(parts)).hexdigest()
+
+    def path(self, key):
+        if not self.key_re.match(key):
+            raise ValueError("Invalid export key: %s" % key)
+        return os.path.join(self.root, key)
+
+    def exists(self, key):
+        return os.path.isfile(self.path(key))
+
+    def open(self, key):
+        """ Open the export for +key+ for reading. """
+        return open(self.path(key), 'rb')
+
+    def save(self, key, write):
+        """ Build the export for +key+ by calling +write+ with a file to write
+        it to. The export only appears in the store once it's complete. """
+        if not os.path.exists(self.root):
+            os.makedirs(self.root)
+
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.rename(tmp, self.path(key))
+        except:
+            os.unlink(tmp)
+            raise
+
+        self.log.info("Saved export %s" % key)
+        self.prune()
+
+    def prune(self):
+        """ Remove exports that are older than +max_age+. """
+        cutoff = time.time() - self.max_age
+
+        for fname in os.listdir(self.root):
+            path = os.path.join(self.root, fname)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+                    self.log.info("Removed old export %s" % fname)
+            except OSError:
+                # removed by someone else
+                pass
+
+
+# the export store, configured in core.py
+exports = ExportStore()
@@ -2,8 +2,10 @@ import re
 
 from .base import BaseExtractor
 from .alchemy_api import AlchemyAPI
+from .matcher import OffsetMatcher
 from ...processing import ProcessingError
 from ...models import DocumentKeyword, DocumentEntity, Entity, Utterance
+from ...models.entity import sanitise_name
 
 import logging
 log = logging.getLogger(__name__)
@@ -13,6 +15,7 @@ class AlchemyExtractor(BaseExtractor):
     useful goodies from a document.
     """
     API_KEY = None
+    CACHE_KEYS = ['alchemy-entities', 'alchemy-keywords']
 
     def __init__(self):
         # NOTE: set the ENV variable ALCHEMY_API_KEY before running the process
@@ -20,24 +23,39 @@ class AlchemyExtractor(BaseExtractor):
             raise ValueError('%s.%s.API_KEY must be defined.' % (self.__module__, self.__class__.__name__))
         self.alchemy = AlchemyAPI(self.API_KEY)
 
-    def extract(self, doc):
+    def fetch_tasks(self, doc):
+        if not doc.text:
+            return []
+
+        return [
+            ('entities', lambda: self.fetch_entities(doc)),
+            ('keywords', lambda: self.fetch_keywords(doc)),
+        ]
+
+    def merge(self, doc, results):
         if doc.text:
-            self.fetch_extract_entities(doc)
-            self.fetch_extract_keywords(doc)
+            # share offsets between entities, quotes and keywords
+            matcher = OffsetMatcher(doc.text)
+
+            log.info("Extracting entities for %s" % doc)
+            self.extract_entities(doc, results['entities'] or [], matcher)
 
-    def fetch_extract_entities(self, doc):
-        log.info("Extracting entities for %s" % doc)
-        self.extract_entities(doc, self.fetch_entities(doc) or [])
+            log.info("Extracting keywords for %s" % doc)
+            self.extract_keywords(doc, results['keywords'] or [], matcher)
 
-    def extract_entities(self, doc, entities):
+    def extract_entities(self, doc, entities, matcher=None):
+        matcher = matcher or OffsetMatcher(doc.text)
         log.debug("Raw extracted entities: %s" % entities)
 
         entities_added = 0
         utterances_added = 0
 
+        resolved = Entity.bulk_get_or_create(
+                (self.normalise_name(entity['type']), entity['text']) for entity in entities)
+
         for entity in entities:
             # entity
-            e = Entity.get_or_create(self.normalise_name(entity['type']), entity['text'])
+            e = resolved[Entity.key(self.normalise_name(entity['type']), sanitise_name(entity['text']))]
 
             de = DocumentEntity()
             de.entity = e
@@ -45,7 +63,7 @@ class AlchemyExtractor(BaseExtractor):
             de.count = int(entity['count'])
 
             # do our best to guess occurrences
-            de.offset_list = self.all_offsets(doc.text, e.name)
+            de.set_offsets(matcher.offsets(e.name))
 
             if doc.add_entity(de):
                 entities_added += 1
@@ -57,11 +75,9 @@ class AlchemyExtractor(BaseExtractor):
                 u.entity = e
                 
                 # lame effort to find quote offset - alchemy often puts ... at the end
-                needle = u.quote.strip(' .')
-                offset = doc.text.find(needle)
-                if offset > -1:
-                    u.offset = offset
-                    u.length = len(needle)
+                found = matcher.first(u.quote.strip(' .'))
+                if found:
+                    u.offset, u.length = found
 
                 if doc.add_utterance(u):
                     utterances_added += 1
@@ -69,12 +85,8 @@ class AlchemyExtractor(BaseExtractor):
         log.info("Added %d entities and %d utterances for %s" % (entities_added, utterances_added, doc))
 
 
-    def fetch_extract_keywords(self, doc):
-        log.info("Extracting keywords for %s" % doc)
-        self.extract_keywords(doc, self.fetch_keywords(doc) or [])
-
-
-    def extract_keywords(self, doc, keywords):
+    def extract_keywords(self, doc, keywords, matcher=None):
+        matcher = matcher or OffsetMatcher(doc.text)
         entity_names = set(de.entity.name for de in doc.entities)
         keywords_added = 0
 
@@ -88,7 +100,7 @@ class AlchemyExtractor(BaseExtractor):
             k = DocumentKeyword()
             k.keyword = kw['text']
             k.relevance = float(kw['relevance'])
-            k.offset_list = self.all_offsets(doc.text, k.keyword)
+            k.set_offsets(matcher.offsets(k.keyword))
 
             if doc.add_keyword(k):
                 keywords_added += 1
@@ -97,9 +109,10 @@ class AlchemyExtractor(BaseExtractor):
 
 
     def fetch_entities(self, doc):
-        res = self.check_cache(doc.url, 'alchemy-entities')
+        res = self.check_cache(doc, 'alchemy-entities')
 
         if not res:
+            self.check_online(doc, 'alchemy-entities')
             res = self.alchemy.entities('text', doc.text.encode('utf-8'), {
                 'quotations': 1,
                 'linkedData': 0,
@@ -107,33 +120,23 @@ class AlchemyExtractor(BaseExtractor):
                 })
             if res['status'] == 'ERROR':
                 raise ProcessingError(res['statusInfo'])
-            self.update_cache(doc.url, 'alchemy-entities', res)
+            self.update_cache(doc, 'alchemy-entities', res)
 
         return res['entities']
 
 
     def fetch_keywords(self, doc):
-        res = self.check_cache(doc.url, 'alchemy-keywords')
+        res = self.check_cache(doc, 'alchemy-keywords')
 
         if not res:
+            self.check_online(doc, 'alchemy-keywords')
             res = self.alchemy.keywords('text', doc.text.encode('utf-8'))
             if res['status'] == 'ERROR':
                 raise ProcessingError(res['statusInfo'])
-            self.update_cache(doc.url, 'alchemy-keywords', res)
+            self.update_cache(doc, 'alchemy-keywords', res)
 
         return res['keywords']
 
     def all_offsets(self, text, needle):
-        needle_len = len(needle)
-        start = 0
-        offsets = []
-
-        while True:
-            start = text.find(needle, start)
-            if start == -1:
-                break
-            offsets.append((start, needle_len))
-            start += needle_len
-
-        return ' '.join('%d:%d' % p for p in offsets)
+        return OffsetMatcher(text).offset_list(needle)
 
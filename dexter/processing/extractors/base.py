@@ -1,53 +1,99 @@
 import re
 import md5
-import os
-import json
-import gzip
+import hashlib
+
+from .cache import SQLiteCacheStore
+from ...processing import NotCachedError
 
 import logging
 log = logging.getLogger(__name__)
 
 class BaseExtractor:
+    """ Extraction happens in two phases. The fetch phase calls out to
+    remote APIs and must not touch the database, so that the fetch tasks
+    of all extractors can be run concurrently. The merge phase then adds
+    the results to the document.
+    """
+
+    def extract(self, doc):
+        """ Fetch and merge extractions for a document. """
+        results = dict((name, task()) for name, task in self.fetch_tasks(doc))
+        self.merge(doc, results)
+
+    def fetch_tasks(self, doc):
+        """ A list of (name, callable) pairs that fetch the data
+        needed to extract things from +doc+. These may be called
+        from other threads. """
+        return []
+
+    def merge(self, doc, results):
+        """ Update +doc+ using +results+, a dict from task name to
+        the return value of that fetch task. """
+        pass
+
     def normalise_name(self, name):
         return re.sub('(?!^)([A-Z]+)', r'_\1', name).lower()
 
-    def check_cache(self, url, key):
-        """ See if we have a cached response for this URL and this key."""
-        if not url:
-            return None
+    # where cached responses are stored, see core.py
+    cache = SQLiteCacheStore('cache/extractors.db')
 
-        fname = self.cache_filename(url, key)
-        if not os.path.isfile(fname):
-            log.info("Cache miss: %s" % fname)
-            return None
+    # when offline, only cached responses are used and remote APIs are never called
+    offline = False
 
-        try:
-            log.info('Cache hit: %s' % fname)
-            with gzip.open(fname) as f:
-                return json.load(f)
-        except ValueError as e:
-            log.warn("Error reading from cache file %s: %s" % (fname, e.message), exc_info=e)
+    def check_online(self, doc, key):
+        """ Raise a NotCachedError if we're offline, because there's no cached
+        +key+ response for this document. """
+        if self.offline:
+            raise NotCachedError("No cached %s response for %s" % (key, doc))
+
+    # bump this when a change to the extractor means that
+    # previously cached responses are no longer any good
+    VERSION = 1
+
+    # the keys this extractor caches responses under
+    CACHE_KEYS = []
+
+    def check_cache(self, doc, key):
+        """ See if we have a cached response for this document's text and this key."""
+        if not doc.text:
             return None
 
+        return self.cache.get(self.cache_key(doc.text, key))
+
 
-    def update_cache(self, url, key, value):
-        """ Cache a response for this URL and this key. """
-        if not url:
+    def update_cache(self, doc, key, value):
+        """ Cache a response for this document's text and this key. """
+        if not doc.text:
             return None
 
-        fname = self.cache_filename(url, key)
+        self.cache.put(self.cache_key(doc.text, key), value)
+
+    def cache_key(self, text, key):
+        return '%s.%s.v%d' % (self.hash_text(text), key, self.VERSION)
+
+    def hash_text(self, text):
+        return hashlib.sha1(self.normalise_text(text)).hexdigest()
+
+    def normalise_text(self, text):
+        # Cached responses include offsets into the text, so we can only
+        # ignore changes that don't move anything, like trailing whitespace.
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        return text.rstrip()
 
-        dirname = os.path.dirname(fname)
-        if not os.path.exists(dirname):
-            os.makedirs(dirname)
+    def rekey_cache(self, doc):
+        """ Copy responses cached under this document's URL, as we
+        used to do, to its text. Returns the number of responses copied. """
+        count = 0
 
-        with gzip.open(fname, 'wb') as f:
-            json.dump(value, f)
-    
-    def cache_filename(self, url, key):
-        hashed = '%s.%s.json.gz' % (self.hash_url(url), key)
-        return 'cache/extractors/%s/%s' % (hashed[0:2], hashed)
+        if doc.url and doc.text:
+            for key in self.CACHE_KEYS:
+                value = self.cache.get(self.url_cache_key(doc.url, key))
+                if value is not None and self.check_cache(doc, key) is None:
+                    self.update_cache(doc, key, value)
+                    count += 1
 
-    def hash_url(self, url):
-        return md5.md5(url).hexdigest()
+        return count
 
+    def url_cache_key(self, url, key):
+        return '%s.%s' % (md5.md5(url).hexdigest(), key)
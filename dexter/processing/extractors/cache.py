@@ -0,0 +1,225 @@
+import os
+import errno
+import json
+import gzip
+import zlib
+import time
+import sqlite3
+import threading
+import logging
+
+
+class CacheStore(object):
+    """
+    A store for cached extractor responses. Keys are strings and values
+    are anything that can be serialised as JSON.
+    """
+    log = logging.getLogger(__name__)
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """ Return the value for +key+, or None. """
+        raise NotImplementedError()
+
+    def put(self, key, value):
+        """ Store +value+ under +key+. """
+        raise NotImplementedError()
+
+    def keys(self):
+        """ Iterate over all the keys in this store. """
+        raise NotImplementedError()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+    def hit(self, key):
+        self.hits += 1
+        self.log.info("Cache hit: %s" % key)
+
+    def miss(self, key):
+        self.misses += 1
+        self.log.info("Cache miss: %s" % key)
+
+
+class FileCacheStore(CacheStore):
+    """
+    The original cache layout: one gzipped JSON file per key, under
+    +root/xx/+ where +xx+ is the first two characters of the key.
+    """
+    def __init__(self, root='cache/extractors'):
+        super(FileCacheStore, self).__init__()
+        self.root = root
+
+    def get(self, key):
+        fname = self.filename(key)
+        if not os.path.isfile(fname):
+            self.miss(key)
+            return None
+
+        try:
+            with gzip.open(fname) as f:
+                value = json.load(f)
+        except ValueError as e:
+            self.log.warn("Error reading from cache file %s: %s" % (fname, e.message), exc_info=e)
+            return None
+
+        self.hit(key)
+        return value
+
+    def put(self, key, value):
+        fname = self.filename(key)
+
+        makedirs(os.path.dirname(fname))
+
+        with gzip.open(fname, 'wb') as f:
+            json.dump(value, f)
+
+    def keys(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for fname in filenames:
+                if fname.endswith('.json.gz'):
+                    yield fname[:-len('.json.gz')]
+
+    def filename(self, key):
+        fname = '%s.json.gz' % key
+        return '%s/%s/%s' % (self.root, fname[0:2], fname)
+
+
+class SQLiteCacheStore(CacheStore):
+    """
+    A cache in a single SQLite file, indexed by key. Values are stored as
+    compressed JSON.
+
+    If +max_size+ is given, the least recently used entries are evicted once
+    the total size of the stored values exceeds +max_size+ bytes.
+
+    This is safe to use from multiple threads and processes.
+    """
+    def __init__(self, path='cache/extractors.db', max_size=None):
+        super(SQLiteCacheStore, self).__init__()
+        self.path = path
+        self.max_size = max_size
+        self.local = threading.local()
+
+    def connection(self):
+        # sqlite connections can't be shared between threads, or across a fork
+        if getattr(self.local, 'pid', None) != os.getpid():
+            self.local.conn = self.connect()
+            self.local.pid = os.getpid()
+        return self.local.conn
+
+    def connect(self):
+        dirname = os.path.dirname(self.path)
+        if dirname:
+            makedirs(dirname)
+
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed_at REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed_at_ix ON entries (accessed_at)')
+        conn.execute('CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY, size INTEGER NOT NULL)')
+        conn.execute('INSERT OR IGNORE INTO totals (id, size) VALUES (1, 0)')
+        conn.commit()
+        return conn
+
+    def get(self, key):
+        conn = self.connection()
+        row = conn.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.miss(key)
+            return None
+
+        with conn:
+            conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (time.time(), key))
+
+        try:
+            value = json.loads(zlib.decompress(row[0]))
+        except (zlib.error, ValueError) as e:
+            self.log.warn("Error reading cache entry %s: %s" % (key, e), exc_info=e)
+            return None
+
+        self.hit(key)
+        return value
+
+    def put(self, key, value):
+        data = buffer(zlib.compress(json.dumps(value)))
+        conn = self.connection()
+
+        with conn:
+            row = conn.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            old_size = row[0] if row else 0
+
+            conn.execute('INSERT OR REPLACE INTO entries (key, value, size, accessed_at) VALUES (?, ?, ?, ?)',
+                    (key, data, len(data), time.time()))
+            conn.execute('UPDATE totals SET size = size + ? WHERE id = 1', (len(data) - old_size,))
+
+        if self.max_size:
+            self.evict(self.max_size)
+
+    def keys(self):
+        for row in self.connection().execute('SELECT key FROM entries'):
+            yield row[0]
+
+    def size(self):
+        """ Total size of all stored values, in bytes. """
+        return self.connection().execute('SELECT size FROM totals WHERE id = 1').fetchone()[0]
+
+    def evict(self, max_size):
+        """ Evict least recently used entries until the cache is no
+        larger than +max_size+ bytes. """
+        excess = self.size() - max_size
+        if excess <= 0:
+            return
+
+        conn = self.connection()
+        keys = []
+        freed = 0
+
+        for key, size in conn.execute('SELECT key, size FROM entries ORDER BY accessed_at'):
+            keys.append((key, size))
+            freed += size
+            if freed >= excess:
+                break
+
+        with conn:
+            # another process may have evicted some of these already
+            freed = 0
+            for key, size in keys:
+                if conn.execute('DELETE FROM entries WHERE key = ?', (key,)).rowcount:
+                    freed += size
+            conn.execute('UPDATE totals SET size = size - ? WHERE id = 1', (freed,))
+        self.log.info("Evicted %d entries from %s" % (len(keys), self.path))
+
+    def stats(self):
+        stats = super(SQLiteCacheStore, self).stats()
+        stats['entries'] = self.connection().execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+        stats['size'] = self.size()
+        return stats
+
+
+def makedirs(dirname):
+    """ Create +dirname+ and its parents, if they don't exist. Another thread
+    or process may be creating it at the same time. """
+    try:
+        os.makedirs(dirname)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def copy_cache(src, dst):
+    """ Copy all entries from the +src+ store into the +dst+ store,
+    returning the number of entries copied. """
+    count = 0
+    for key in src.keys():
+        value = src.get(key)
+        if value is not None:
+            dst.put(key, value)
+            count += 1
+    return count
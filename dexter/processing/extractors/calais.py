@@ -4,6 +4,7 @@ import requests
 from .base import BaseExtractor
 from ...processing import ProcessingError
 from ...models import DocumentKeyword, DocumentEntity, Entity, Utterance
+from ...models.entity import sanitise_name
 
 import logging
 log = logging.getLogger(__name__)
@@ -13,15 +14,22 @@ class CalaisExtractor(BaseExtractor):
     useful goodies from a document.
     """
     API_KEY = None
+    CACHE_KEYS = ['calais-normalised', 'calais']
 
     def __init__(self):
         pass
 
-    def extract(self, doc):
+    def fetch_tasks(self, doc):
+        if not doc.text:
+            return []
+
+        return [('calais', lambda: self.fetch_data(doc))]
+
+    def merge(self, doc, results):
         if doc.text:
             log.info("Extracting things for %s" % doc)
 
-            calais = self.fetch_data(doc).get('extractions', {})
+            calais = results['calais'].get('extractions', {})
 
             log.debug("Raw calais extractions: %s" % calais)
 
@@ -32,6 +40,12 @@ class CalaisExtractor(BaseExtractor):
     def extract_entities(self, doc, calais):
         entities_added = 0
 
+        resolved = Entity.bulk_get_or_create(
+                (self.normalise_name(group), ent['name'])
+                for group, group_ents in calais.get('entities', {}).iteritems()
+                for ent in group_ents.itervalues()
+                if 'name' in ent)
+
         for group, group_ents in calais.get('entities', {}).iteritems():
             group = self.normalise_name(group)
 
@@ -39,7 +53,7 @@ class CalaisExtractor(BaseExtractor):
                 if not 'name' in ent:
                     continue
 
-                e = Entity.get_or_create(group, ent['name'])
+                e = resolved[Entity.key(group, sanitise_name(ent['name']))]
 
                 de = DocumentEntity()
                 de.entity = e
@@ -56,8 +70,13 @@ class CalaisExtractor(BaseExtractor):
 
     def extract_utterances(self, doc, calais):
         utterances_added = 0
+        quotes = calais.get('relations', {}).get('Quotation', {}).values()
 
-        for quote in calais.get('relations', {}).get('Quotation', {}).itervalues():
+        resolved = Entity.bulk_get_or_create(
+                (self.normalise_name(quote['person']['_type']), quote['person']['name'])
+                for quote in quotes)
+
+        for quote in quotes:
             u = Utterance()
             u.quote = quote['quote'].strip()
 
@@ -66,9 +85,9 @@ class CalaisExtractor(BaseExtractor):
                 u.length = quote['instances'][0]['length']
 
             # uttering entity
-            u.entity = Entity.get_or_create(
+            u.entity = resolved[Entity.key(
                     self.normalise_name(quote['person']['_type']),
-                    quote['person']['name'])
+                    sanitise_name(quote['person']['name']))]
 
             if doc.add_utterance(u):
                 utterances_added += 1
@@ -79,11 +98,13 @@ class CalaisExtractor(BaseExtractor):
     def fetch_data(self, doc):
         # First check for the (legacy) nicely formatted OpenCalais JSON.
         # We now prefer to cache the original result.
-        res = self.check_cache(doc.url, 'calais-normalised')
+        res = self.check_cache(doc, 'calais-normalised')
         if not res:
             # check for regular json
-            res = self.check_cache(doc.url, 'calais')
+            res = self.check_cache(doc, 'calais')
             if not res:
+                self.check_online(doc, 'calais')
+
                 # fetch it
                 # NOTE: set the ENV variable CALAIS_API_KEY before running the process
                 if not self.API_KEY:
@@ -100,7 +121,7 @@ class CalaisExtractor(BaseExtractor):
                     res.raise_for_status()
 
                 res = res.json()
-                self.update_cache(doc.url, 'calais', res)
+                self.update_cache(doc, 'calais', res)
 
             # make the JSON decent and usable
             res = self.normalise(res)
@@ -0,0 +1,58 @@
+class OffsetMatcher(object):
+    """
+    Finds where strings occur in a document's text, such as the entities,
+    keywords and quotations reported by an extractor.
+
+    Each distinct string is only searched for once, and the results are
+    remembered, so an extractor can use one matcher for everything it
+    reports for a document.
+
+        >>> matcher = OffsetMatcher('she said his name, he said hers')
+        >>> matcher.offsets('he')
+        [(1, 2), (19, 2), (27, 2)]
+        >>> matcher.first('said')
+        (4, 4)
+
+    Matching is case-sensitive. Occurrences of the same string don't
+    overlap, but occurrences of different strings may.
+    """
+    def __init__(self, text):
+        self.text = text or ''
+        self.found = {}
+
+    def offsets(self, needle):
+        """ A list of +(offset, length)+ pairs of the occurrences of +needle+
+        in the text, which may be empty. """
+        if needle not in self.found:
+            self.found[needle] = self.find_all(needle)
+        return self.found[needle]
+
+    def offset_list(self, needle):
+        """ The occurrences of +needle+ as a string of offset:length pairs,
+        as stored by +WithOffsets+. """
+        return ' '.join('%d:%d' % p for p in self.offsets(needle))
+
+    def first(self, needle):
+        """ The +(offset, length)+ of the first occurrence of +needle+, or None. """
+        offsets = self.offsets(needle)
+        return offsets[0] if offsets else None
+
+    def find_all(self, needle):
+        # a str.find per needle is much faster than matching many needles
+        # at once in Python, such as with an Aho-Corasick automaton
+        if not needle:
+            return []
+
+        text = self.text
+        needle_len = len(needle)
+        start = 0
+        offsets = []
+
+        while True:
+            start = text.find(needle, start)
+            if start == -1:
+                break
+            offsets.append((start, needle_len))
+            start += needle_len
+
+        return offsets
@@ -12,7 +12,7 @@ class SourcesExtractor(BaseExtractor):
 
     log = logging.getLogger(__name__)
 
-    def extract(self, doc):
+    def merge(self, doc, results):
         self.extract_sources(doc)
         self.guess_genders(doc)
 
@@ -0,0 +1,81 @@
+import hashlib
+import logging
+
+from sqlalchemy.sql import func
+
+from ..models import db, Document, DocumentRollup, Medium, Person
+from ..models.reference import reference
+from .extractors.cache import SQLiteCacheStore
+
+
+class FeedCache(object):
+    """
+    A cache of feed responses, shared by all app processes through a
+    +SQLiteCacheStore+.
+
+    Responses are cached under their ETag, which is derived from the feed,
+    its date range, the state of the documents published in that range and
+    of their rollups, and the names of the media, topics, people and so on
+    that the rollups refer to. Changing a document, its sources or its
+    fairness in the range, refreshing its rollups or renaming something
+    changes the ETag, so stale responses are never served; they're simply
+    evicted once the store grows past its maximum size.
+
+    Feeds are answered from the rollups, which are refreshed just after a
+    change is committed. Responses aren't cached while refreshes for their
+    range are still pending.
+    """
+    log = logging.getLogger(__name__)
+
+    # bump this to ignore responses cached by older code
+    VERSION = 1
+
+    def __init__(self, store=None):
+        self.store = store or SQLiteCacheStore('cache/feeds.db', max_size=50 * 1024 * 1024)
+
+    def etag(self, feed, start_date, end_date):
+        """ The ETag for +feed+ (such as an endpoint name) between the
+        datetimes +start_date+ and +end_date+. """
+        parts = [feed, start_date.isoformat(), end_date.isoformat(), str(self.VERSION)]
+
+        markers = Document.change_markers(
+                Document.published_at >= start_date,
+                Document.published_at <= end_date)
+
+        markers += DocumentRollup.change_markers(start_date.date(), end_date.date())
+        markers.append(db.session.query(func.max(Person.updated_at), func.count(Person.id)).one())
+
+        for latest, count in markers:
+            parts.append(latest.isoformat() if latest else '')
+            parts.append(str(count))
+
+        parts.append(self.names_marker())
+
+        return hashlib.sha1('|'.join(parts)).hexdigest()
+
+    def names_marker(self):
+        """ A digest of the names of the reference rows that rollups refer to.
+        These come from the reference cache, so other processes' changes
+        are noticed once it expires. """
+        names = set((m.id, m.name, m.medium_group, m.medium_type) for m in reference.rows(Medium))
+        for model in set(DocumentRollup.LABELS.itervalues()):
+            names.update((model.__name__, r.id, r.name) for r in reference.rows(model))
+
+        return hashlib.sha1(repr(sorted(names))).hexdigest()
+
+    def pending(self, start_date, end_date):
+        """ Are there rollup refreshes pending between the datetimes
+        +start_date+ and +end_date+? """
+        markers = DocumentRollup.change_markers(start_date.date(), end_date.date())
+        return markers[-1][1] > 0
+
+    def get(self, etag):
+        """ The cached response for +etag+, or None. """
+        return self.store.get(etag)
+
+    def put(self, etag, results):
+        """ Cache +results+, a dict that can be serialised as JSON, under +etag+. """
+        self.store.put(etag, results)
+
+
+feed_cache = FeedCache()
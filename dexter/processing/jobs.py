@@ -0,0 +1,136 @@
+import os
+import socket
+import datetime
+import threading
+import time
+import logging
+
+from ..models import db, Document
+from ..models.job import Job
+from .document_processor import DocumentProcessor
+from .batch import BatchProcessor
+
+
+class JobRunner(object):
+    """
+    Runs background jobs from the job queue. Each job type has a handler,
+    which is called with the job and returns a dict describing the result.
+
+    Workers (see worker.py) call +run_forever+. Jobs can also be run
+    inline, in the current process, with +run+.
+    """
+    log = logging.getLogger(__name__)
+
+    # map from job type to handler function
+    handlers = {}
+
+    # seconds between heartbeats for a running job, see +Job.STALE_AFTER+
+    HEARTBEAT_INTERVAL = 30
+
+    def __init__(self, name=None):
+        self.name = name or '%s:%d' % (socket.gethostname(), os.getpid())
+
+    @classmethod
+    def handler(cls, job_type):
+        """ Decorator to register a handler function for +job_type+. """
+        def register(f):
+            cls.handlers[job_type] = f
+            return f
+        return register
+
+
+    def run_forever(self, poll_interval=1):
+        self.log.info("Worker %s waiting for jobs" % self.name)
+
+        while True:
+            if not self.run_next():
+                time.sleep(poll_interval)
+
+
+    def run_next(self):
+        """ Claim and run the next pending job. Returns the job,
+        or None if there was nothing to do. """
+        job = Job.claim(self.name)
+        if job:
+            self.run(job)
+        return job
+
+
+    def run(self, job):
+        """ Run +job+ and commit its outcome. """
+        self.log.info("Running %s" % job)
+        start = time.time()
+        id = job.id
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(id, stop))
+        heartbeat.daemon = True
+        heartbeat.start()
+
+        try:
+            handler = self.handlers.get(job.job_type)
+            if not handler:
+                raise ValueError("No handler for job type: %s" % job.job_type)
+
+            result = handler(job)
+
+            job.status = Job.DONE
+            job.set_result(result or {})
+        except Exception as e:
+            self.log.error("Error running %s: %s" % (job, e), exc_info=e)
+            db.session.rollback()
+
+            job = Job.query.get(id)
+            job.status = Job.FAILED
+            job.error = unicode(e)
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        job.finished_at = datetime.datetime.utcnow()
+        db.session.commit()
+
+        self.log.info("Finished %s in %.1f seconds" % (job, time.time() - start))
+        return job
+
+
+    def heartbeat(self, id, stop):
+        """ Keep the job with +id+ alive until +stop+ is set. """
+        while not stop.wait(self.HEARTBEAT_INTERVAL):
+            try:
+                Job.heartbeat(id)
+            except Exception as e:
+                self.log.warn("Error updating heartbeat for job %s: %s" % (id, e), exc_info=e)
+
+
+@JobRunner.handler('process_url')
+def process_url(job):
+    """ Fetch and process a document. The URL in the payload must already
+    have been canonicalised. """
+    url = job.get_payload()['url']
+
+    doc = Document.query.filter(Document.url == url).first()
+    if doc:
+        return {'document_id': doc.id, 'existing': True}
+
+    doc = DocumentProcessor().process_url(url)
+    doc.created_by = job.created_by
+
+    db.session.add(doc)
+    db.session.flush()
+    JobRunner.log.info("Document added by %s: %s" % (job.created_by, doc))
+
+    return {'document_id': doc.id}
+
+
+@JobRunner.handler('process_batch')
+def process_batch(job):
+    """ Fetch and process a batch of URLs, see +BatchProcessor+. """
+    batch = BatchProcessor(user=job.created_by)
+    results = batch.process_urls(job.get_payload()['urls'])
+
+    return {
+        'summary': batch.summary(),
+        'throughput': batch.throughput(),
+        'results': [r.as_dict() for r in results],
+    }
@@ -0,0 +1,223 @@
+from __future__ import division
+from multiprocessing import Pool
+from collections import deque
+import os
+import json
+import time
+import logging
+
+from ..models import db, Document
+from .extractors.base import BaseExtractor
+from .document_processor import DocumentProcessor
+from . import ProcessingError, NotCachedError
+
+
+class Reextractor(object):
+    """
+    Re-run extraction over existing documents, for example after changing
+    the SourcesExtractor. By default extractors are offline and only
+    replay cached responses. Documents without cached responses are
+    skipped.
+
+    Document ids are streamed in ascending chunks and each chunk is
+    processed and committed by one of a pool of worker processes.
+    Progress is saved to a checkpoint file after each chunk, so an
+    interrupted run can be resumed.
+    """
+    log = logging.getLogger(__name__)
+
+    def __init__(self, processes=4, chunk_size=100, checkpoint=None, reset=False, offline=True):
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.checkpoint = checkpoint
+        self.reset = reset
+        self.offline = offline
+
+        self.counts = {'processed': 0, 'skipped': 0, 'failed': 0}
+        self.last_id = 0
+        self.elapsed = 0
+
+
+    def run(self, query=None):
+        """ Re-extract all documents matched by +query+ (a query for document
+        ids), resuming from the checkpoint if there is one. """
+        self.query = query if query is not None else db.session.query(Document.id)
+        self.load_checkpoint()
+
+        start = time.time()
+        done = sum(self.counts.values())
+
+        if self.processes:
+            # don't share database connections with the worker processes
+            db.session.remove()
+            db.engine.dispose()
+
+            pool = Pool(self.processes, init_worker, (self.reset, self.offline, True))
+            try:
+                # keep a few chunks queued per process, and finish them in order
+                # so that the checkpoint only moves past completed chunks
+                pending = deque()
+                for ids in self.chunks():
+                    pending.append(pool.apply_async(reextract_chunk, (ids,)))
+                    if len(pending) >= self.processes * 2:
+                        self.finished(pending.popleft().get(), start, done)
+
+                while pending:
+                    self.finished(pending.popleft().get(), start, done)
+            finally:
+                pool.terminate()
+                pool.join()
+        else:
+            offline = BaseExtractor.offline
+            init_worker(self.reset, self.offline)
+            try:
+                for ids in self.chunks():
+                    self.finished(reextract_chunk(ids), start, done)
+            finally:
+                BaseExtractor.offline = offline
+
+        self.elapsed = time.time() - start
+        self.log.info("Re-extracted documents in %.1f seconds (%.2f docs/sec): %s" % (
+            self.elapsed, self.throughput(sum(self.counts.values()) - done, self.elapsed), self.counts))
+
+        return self.counts
+
+
+    def chunks(self):
+        """ Generate chunks of document ids after the checkpoint, in order. """
+        last_id = self.last_id
+
+        while True:
+            ids = [id for id, in self.query
+                    .filter(Document.id > last_id)
+                    .order_by(Document.id)
+                    .limit(self.chunk_size)]
+            db.session.rollback()
+
+            if not ids:
+                break
+
+            yield ids
+            last_id = ids[-1]
+
+
+    def finished(self, result, start, done):
+        """ Record the outcome of a chunk and save a checkpoint. """
+        last_id, counts = result
+
+        self.last_id = last_id
+        for k, v in counts.iteritems():
+            self.counts[k] += v
+        self.save_checkpoint()
+
+        total = sum(self.counts.values())
+        self.log.info("Re-extracted up to document %d, %d documents so far (%.2f docs/sec): %s" % (
+            last_id, total, self.throughput(total - done, time.time() - start), self.counts))
+
+
+    def load_checkpoint(self):
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as f:
+                state = json.load(f)
+
+            self.last_id = state['last_id']
+            self.counts = state['counts']
+            self.log.info("Resuming after document %d" % self.last_id)
+
+
+    def save_checkpoint(self):
+        if self.checkpoint:
+            tmp = self.checkpoint + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump({'last_id': self.last_id, 'counts': self.counts}, f)
+            os.rename(tmp, self.checkpoint)
+
+
+    def throughput(self, count, elapsed):
+        if not elapsed:
+            return 0
+        return count / elapsed
+
+
+# State for worker processes. These are module-level so that they
+# can be used with multiprocessing.
+worker = {}
+
+def init_worker(reset, offline, dispose=False):
+    if dispose:
+        # connections inherited from the parent process can't be used
+        db.engine.dispose()
+
+    BaseExtractor.offline = offline
+    worker['processor'] = DocumentProcessor()
+    worker['reset'] = reset
+
+
+def reextract_chunk(ids):
+    """ Re-extract the documents in +ids+ and commit. Returns the last
+    id and a dict of counts. """
+    counts = {'processed': 0, 'skipped': 0, 'failed': 0}
+
+    try:
+        for id in ids:
+            counts[reextract_document(id)] += 1
+        db.session.commit()
+    except Exception as e:
+        Reextractor.log.warn("Error re-extracting chunk %d-%d, retrying one at a time: %s" % (ids[0], ids[-1], e), exc_info=e)
+        db.session.rollback()
+
+        # try again, one document at a time
+        counts = {'processed': 0, 'skipped': 0, 'failed': 0}
+        for id in ids:
+            try:
+                counts[reextract_document(id)] += 1
+                db.session.commit()
+            except Exception as e:
+                Reextractor.log.error("Error re-extracting document %d: %s" % (id, e), exc_info=e)
+                db.session.rollback()
+                counts['failed'] += 1
+
+    db.session.remove()
+    return ids[-1], counts
+
+
+def reextract_document(id):
+    """ Re-extract a single document, returning 'processed', 'skipped' or
+    'failed'. Documents that are skipped or fail are left unchanged. """
+    processor = worker['processor']
+    doc = Document.query.get(id)
+
+    savepoint = db.session.begin_nested()
+    try:
+        # extractor responses are cached by normalised text
+        processor.normalise(doc)
+
+        # fetch (from the cache) first, so that we don't change
+        # documents we can't re-extract
+        fetched = processor.fetch(doc)
+
+        if worker['reset']:
+            # forget previous extractions, but not sources, since
+            # they're checked and edited by people
+            for item in doc.entities + doc.keywords + doc.utterances:
+                db.session.delete(item)
+            doc.entities = []
+            doc.keywords = []
+            doc.utterances = []
+            db.session.flush()
+
+        processor.merge(doc, fetched)
+        savepoint.commit()
+    except NotCachedError as e:
+        savepoint.rollback()
+        Reextractor.log.info("Skipping %s: %s" % (doc, e))
+        return 'skipped'
+    except ProcessingError as e:
+        savepoint.rollback()
+        Reextractor.log.error("Error re-extracting %s: %s" % (doc, e), exc_info=e)
+        return 'failed'
+    except:
+        savepoint.rollback()
+        raise
+
+    return 'processed'
@@ -0,0 +1,135 @@
+import csv
+import gzip
+import decimal
+
+from sqlalchemy import types
+
+from .export_builder import ExportBuilder
+
+
+class TabularBuilder(ExportBuilder):
+    """
+    Base class for exports of a single sheet of rows, for loading into
+    tools like pandas and R. The sheet is chosen by the form's +sheet+
+    field.
+    """
+    def __init__(self, form):
+        super(TabularBuilder, self).__init__(form)
+
+        self.sheet = form.sheet.data or 'documents'
+        if self.sheet not in self.SHEETS:
+            raise ValueError("Unknown sheet: %s" % self.sheet)
+
+    def rows(self):
+        """ The sheet's columns, as (name, type) pairs, and an iterator over
+        its rows, as lists of values in column order. """
+        query = self.sheet_query(self.sheet)
+        # joining views can result in columns with the same name
+        columns = self.columns(query, dedup=self.sheet in ('fairness', 'everything'))
+        names = [name for name, _ in columns]
+
+        def rows():
+            for row in self.stream(query):
+                info = row._asdict()
+                yield [info[k] for k in names]
+
+        return columns, rows()
+
+
+class CSVBuilder(TabularBuilder):
+    """
+    Builds a gzipped CSV file of one sheet of rows. Rows are written as
+    they're read from the database.
+    """
+    MIMETYPE = 'application/x-gzip'
+    EXTENSION = 'csv.gz'
+
+    def write(self, output):
+        columns, rows = self.rows()
+
+        gz = gzip.GzipFile(filename='%s.csv' % self.sheet, mode='wb', fileobj=output)
+        try:
+            writer = csv.writer(gz)
+            writer.writerow([name for name, _ in columns])
+
+            for row in rows:
+                writer.writerow([self.csv_value(v) for v in row])
+        finally:
+            gz.close()
+
+    def csv_value(self, value):
+        if value is None:
+            return ''
+        if isinstance(value, unicode):
+            return value.encode('utf-8')
+        return value
+
+
+class ParquetBuilder(TabularBuilder):
+    """
+    Builds a Parquet file of one sheet of rows, with a column type for
+    each column in the view. Rows are read and written in batches.
+
+    This needs pyarrow, which is optional.
+    """
+    MIMETYPE = 'application/octet-stream'
+    EXTENSION = 'parquet'
+
+    @classmethod
+    def available(cls):
+        """ Is pyarrow installed? """
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            return False
+        return True
+
+    def write(self, output):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns, rows = self.rows()
+        schema = pa.schema([pa.field(name, self.arrow_type(pa, t)) for name, t in columns])
+
+        writer = pq.ParquetWriter(output, schema)
+        try:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= self.BATCH_SIZE:
+                    writer.write_table(self.arrow_table(pa, schema, batch))
+                    batch = []
+
+            if batch:
+                writer.write_table(self.arrow_table(pa, schema, batch))
+        finally:
+            writer.close()
+
+    def arrow_table(self, pa, schema, rows):
+        arrays = []
+        for i, field in enumerate(schema):
+            values = [self.arrow_value(row[i]) for row in rows]
+            arrays.append(pa.array(values, type=field.type))
+
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def arrow_type(self, pa, t):
+        """ The arrow type for SQLAlchemy column type +t+. """
+        if isinstance(t, types.Boolean):
+            return pa.bool_()
+        if isinstance(t, types.Integer):
+            return pa.int64()
+        if isinstance(t, (types.Float, types.Numeric)):
+            return pa.float64()
+        if isinstance(t, types.DateTime):
+            return pa.timestamp('us')
+        if isinstance(t, types.Date):
+            return pa.date32()
+        return pa.string()
+
+    def arrow_value(self, value):
+        if isinstance(value, decimal.Decimal):
+            return float(value)
+        if isinstance(value, str):
+            return value.decode('utf-8')
+        return value
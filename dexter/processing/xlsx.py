@@ -1,26 +1,33 @@
 import xlsxwriter
-import StringIO
 from datetime import datetime
 from dateutil.parser import parse
 
 from .bias import BiasCalculator
+from .export_builder import ExportBuilder
 from ..models import Document, db
 
-class XLSXBuilder:
+class XLSXBuilder(ExportBuilder):
+    """
+    Builds an Excel spreadsheet of the documents matching an +ActivityForm+.
+
+    The workbook is written in xlsxwriter's constant_memory mode and rows
+    are read from the database in batches as they're written, so memory
+    use doesn't depend on how many documents are exported.
+    """
+    MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    EXTENSION = 'xlsx'
+
     def __init__(self, form):
-        self.form = form
+        super(XLSXBuilder, self).__init__(form)
         self.formats = {}
 
-        # we use these to filter our queries, rather than trying to pull
-        # complex filter logic into our view queries
-        self.doc_ids = [d.id for d in form.filter_query(Document.query).all()]
-
-    def build(self):
+    def write(self, output):
         """
-        Generate an Excel spreadsheet and return it as a string.
+        Write the Excel spreadsheet to +output+, a filename or file object.
         """
-        output = StringIO.StringIO()
-        workbook = xlsxwriter.Workbook(output)
+        # in constant_memory mode, rows must be written in order and
+        # each row is flushed to disk once we move past it
+        workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
 
         self.formats['date'] = workbook.add_format({'num_format': 'yyyy/mm/dd'})
         self.formats['bold'] = workbook.add_format({'bold': True})
@@ -32,11 +39,7 @@ class XLSXBuilder:
         self.fairness_worksheet(workbook)
         self.everything_worksheet(workbook)
 
-
         workbook.close()
-        output.seek(0)
-
-        return output.read()
 
     def summary_worksheet(self, wb):
         ws = wb.add_worksheet('summary')
@@ -80,87 +83,63 @@ class XLSXBuilder:
         ws.write('B12', self.filter(Document.query).count())
 
     def documents_worksheet(self, wb):
-        from dexter.models.views import DocumentsView
-
         ws = wb.add_worksheet('documents')
-        docs = self.filter(db.session.query(DocumentsView).join(Document)).all()
-        self.write_table(ws, 'Documents', docs)
+        self.write_table(ws, self.stream(self.sheet_query('documents')))
 
     def sources_worksheet(self, wb):
-        from dexter.models.views import DocumentSourcesView
-
         ws = wb.add_worksheet('sources')
-        rows = self.filter(db.session.query(DocumentSourcesView).join(Document)).all()
-        self.write_table(ws, 'Sources', rows)
+        self.write_table(ws, self.stream(self.sheet_query('sources')))
 
     def fairness_worksheet(self, wb):
-        from dexter.models.views import DocumentsView, DocumentFairnessView
-
         ws = wb.add_worksheet('fairness')
-        rows = self.filter(db.session.query(DocumentsView, DocumentFairnessView)\
-                    .join(Document)\
-                    .join(DocumentFairnessView)).all()
-        if rows:
-            # joining the two views can result in columns with the same name,
-            # we simply de-dup them here
-            keys = sorted(list(set(rows[0].keys())))
-            self.write_table(ws, 'Fairness', rows, keys)
+        # joining the two views can result in columns with the same name,
+        # so we de-dup them
+        self.write_table(ws, self.stream(self.sheet_query('fairness')), dedup=True)
 
     def everything_worksheet(self, wb):
-        from dexter.models.views import DocumentsView, DocumentSourcesView, DocumentFairnessView
-
         ws = wb.add_worksheet('everything')
-        rows = self.filter(db.session.query(DocumentsView, DocumentFairnessView, DocumentSourcesView)\
-                    .join(Document)\
-                    .join(DocumentFairnessView)\
-                    .join(DocumentSourcesView)).all()
-        if rows:
-            # joining the two views can result in columns with the same name,
-            # we simply de-dup them here
-            keys = sorted(list(set(rows[0].keys())))
-            self.write_table(ws, 'Everything', rows, keys)
+        self.write_table(ws, self.stream(self.sheet_query('everything')), dedup=True)
 
     def bias_worksheet(self, wb):
         ws = wb.add_worksheet('bias')
 
         calc = BiasCalculator()
-        docs = self.filter(calc.get_query()).all()
-        scores = calc.calculate_bias_scores(docs, key=lambda d: d.medium.group_name())
-
-        ws.write(1, 0, 'oppose')
-        ws.write(2, 0, 'favour')
-        ws.write(3, 0, 'discrepancy')
-        ws.write(4, 0, 'parties')
-        ws.write(5, 0, 'fair')
-        ws.write(6, 0, 'bias')
-
-        for i, score in enumerate(scores):
-            col = i + 1
-
-            ws.write(0, col, score.group)
-            ws.write(1, col, score.oppose)
-            ws.write(2, col, score.favour)
-            ws.write(3, col, score.discrepancy)
-            ws.write(4, col, score.parties)
-            ws.write(5, col, score.fair)
-            ws.write(6, col, score.score)
-
-    def write_table(self, ws, name, rows, keys=None):
-        if rows:
-            if not keys:
-                keys = rows[0].keys()
-                data = [list(doc) for doc in rows]
-            else:
-                data = []
-                for row in rows:
-                    info = row._asdict()
-                    data.append([info[k] for k in keys])
-
-            ws.add_table(0, 0, len(rows), len(keys)-1, {
-                'name': name,
-                'columns': [{'header': k} for k in keys],
-                'data': data,
-                })
-
-    def filter(self, query):
-        return query.filter(Document.id.in_(self.doc_ids))
+        scores = calc.calculate_grouped_bias_scores(self.filter(Document.query), [BiasCalculator.MEDIUM_GROUP])
+
+        # rows must be written in order, so write a row for each measure
+        ws.write_row(0, 1, [score.group for score in scores])
+
+        measures = [
+            ('oppose', 'oppose'),
+            ('favour', 'favour'),
+            ('discrepancy', 'discrepancy'),
+            ('parties', 'parties'),
+            ('fair', 'fair'),
+            ('bias', 'score'),
+        ]
+        for row, (label, attr) in enumerate(measures, 1):
+            ws.write(row, 0, label)
+            ws.write_row(row, 1, [getattr(score, attr) for score in scores])
+
+    def write_table(self, ws, rows, keys=None, dedup=False):
+        """
+        Write +rows+, an iterable of query result rows, to +ws+ with a header
+        row and an autofilter. The columns are +keys+ if given, otherwise the
+        keys of the first row, sorted and de-duplicated if +dedup+ is True.
+
+        Rows are written as they're read, so they don't need to be in memory
+        at once.
+        """
+        count = 0
+
+        for count, row in enumerate(rows, 1):
+            if count == 1:
+                if not keys:
+                    keys = sorted(set(row.keys())) if dedup else row.keys()
+                ws.write_row(0, 0, keys, self.formats['bold'])
+
+            info = row._asdict()
+            ws.write_row(count, 0, [info[k] for k in keys])
+
+        if count:
+            ws.autofilter(0, 0, count, len(keys) - 1)
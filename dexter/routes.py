@@ -11,6 +11,7 @@ import dexter.entities
 import dexter.api
 import dexter.users
 import dexter.dashboard
+import dexter.jobs
 
 @app.route('/')
 @login_required
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+#
+# Add a batch of articles from a list of URLs, one per line.
+#
+#   python ingest_urls.py urls.txt
+#   cat urls.txt | python ingest_urls.py -
+#
+import argparse
+import sys
+
+from dexter.core import app
+from dexter.models import User
+from dexter.processing import BatchProcessor
+
+parser = argparse.ArgumentParser(description='Add a batch of articles from a list of URLs.')
+parser.add_argument('file', type=argparse.FileType('r'), help='file of URLs, one per line, or - for stdin')
+parser.add_argument('--threads', type=int, default=8, help='number of concurrent downloads')
+parser.add_argument('--commit-every', type=int, default=25, help='number of documents to commit at once')
+parser.add_argument('--user', help='email address of the user adding the articles')
+args = parser.parse_args()
+
+user = None
+if args.user:
+    user = User.query.filter(User.email == args.user).one()
+
+urls = [line.decode('utf-8') for line in args.file]
+
+batch = BatchProcessor(threads=args.threads, commit_every=args.commit_every, user=user)
+for result in batch.process_urls(urls):
+    print "%s\t%s\t%s" % (result.status, result.url, result.message or '')
+
+print >> sys.stderr, "Processed %d urls in %.1f seconds (%.2f urls/sec): %s" % (
+        len(batch.results), batch.elapsed, batch.throughput(), batch.summary())
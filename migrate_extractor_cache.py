@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+#
+# Move extractor responses from the old one-file-per-response cache
+# directory into the configured cache store.
+#
+#   python migrate_extractor_cache.py cache/extractors
+#
+# Responses used to be cached by URL; they're now cached by a hash of
+# the document text. With --rekey, responses cached under a document's URL
+# are copied to its text, so that they're used when it's reprocessed. This
+# assumes the document's text hasn't been edited since it was extracted.
+#
+import argparse
+import os
+import shutil
+import sys
+
+from dexter.core import app
+from dexter.models import db, Document
+from dexter.processing.extractors import AlchemyExtractor, CalaisExtractor
+from dexter.processing.extractors.base import BaseExtractor
+from dexter.processing.extractors.cache import FileCacheStore, copy_cache
+
+parser = argparse.ArgumentParser(description='Migrate the old extractor cache directory into the cache store.')
+parser.add_argument('root', nargs='?', default='cache/extractors', help='old cache directory')
+parser.add_argument('--delete', action='store_true', help='delete the old cache directory once migrated')
+parser.add_argument('--rekey', action='store_true', help='copy responses cached by document URL to the document text')
+args = parser.parse_args()
+
+if os.path.isdir(args.root):
+    count = copy_cache(FileCacheStore(args.root), BaseExtractor.cache)
+    print >> sys.stderr, "Migrated %d entries into %s" % (count, BaseExtractor.cache.path)
+
+    if args.delete:
+        shutil.rmtree(args.root)
+
+if args.rekey:
+    extractors = [AlchemyExtractor(), CalaisExtractor()]
+    count = 0
+
+    ids = [id for id, in db.session.query(Document.id).filter(Document.url != None).order_by(Document.id)]
+    for id in ids:
+        doc = Document.query.get(id)
+        for ex in extractors:
+            count += ex.rekey_cache(doc)
+        db.session.expunge(doc)
+
+    print >> sys.stderr, "Rekeyed %d entries for %d documents" % (count, len(ids))
+
+print >> sys.stderr, "Cache stats: %s" % BaseExtractor.cache.stats()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+#
+# Move entity and keyword offsets from the old offset_list string columns
+# into the packed offset_data columns.
+#
+#   python migrate_offsets.py --drop
+#
+# The offset_data columns are added if they don't exist. Rows that already
+# have offset_data are left alone, so this can be re-run safely. With
+# --drop, the old offset_list columns are dropped once everything has been
+# migrated.
+#
+import argparse
+import logging
+
+from sqlalchemy import inspect, text, bindparam, LargeBinary
+
+from dexter.core import app
+from dexter.models import db, DocumentEntity, DocumentKeyword
+
+log = logging.getLogger('migrate_offsets')
+
+parser = argparse.ArgumentParser(description='Migrate offsets into the packed offset_data columns.')
+parser.add_argument('--batch-size', type=int, default=1000, help='number of rows to migrate and commit at once')
+parser.add_argument('--drop', action='store_true', help='drop the old offset_list columns once migrated')
+args = parser.parse_args()
+
+for model in [DocumentEntity, DocumentKeyword]:
+    table = model.__tablename__
+    columns = [c['name'] for c in inspect(db.engine).get_columns(table)]
+
+    if 'offset_data' not in columns:
+        db.session.execute('ALTER TABLE %s ADD COLUMN offset_data BLOB' % table)
+        db.session.commit()
+        log.info("Added %s.offset_data" % table)
+
+    if 'offset_list' not in columns:
+        continue
+
+    count = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(text(
+            'SELECT id, offset_list FROM %s WHERE id > :last_id AND offset_data IS NULL AND offset_list IS NOT NULL ORDER BY id LIMIT :limit' % table),
+            {'last_id': last_id, 'limit': args.batch_size}).fetchall()
+        if not rows:
+            break
+
+        for id, offset_list in rows:
+            # parse the string the same way the old column was read
+            obj = model()
+            obj.offset_list = offset_list
+            update = text('UPDATE %s SET offset_data = :data WHERE id = :id' % table,
+                          bindparams=[bindparam('data', type_=LargeBinary)])
+            db.session.execute(update, {'data': obj.offset_data, 'id': id})
+            last_id = id
+
+        db.session.commit()
+        count += len(rows)
+
+    log.info("Migrated %d rows of %s" % (count, table))
+
+    if args.drop:
+        db.session.execute('ALTER TABLE %s DROP COLUMN offset_list' % table)
+        db.session.commit()
+        log.info("Dropped %s.offset_list" % table)
@@ -0,0 +1,11 @@
+#!/usr/bin/env bash
+
+set -e
+
+source env/bin/activate
+source production-settings.sh
+
+export FLASK_ENV=production
+
+exec python worker.py \
+    2>&1
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+#
+# Rebuild the daily document rollups used by the feeds, for example after
+# creating the document_rollups table or importing documents directly into
+# the database.
+#
+#   python rebuild_rollups.py --batch-size 100
+#
+# Rollups are kept up to date as documents change, so this is only needed
+# to fill them in from scratch. With --pending, only the days whose refresh
+# was interrupted, such as by a crash, are refreshed; run this from cron.
+#
+import argparse
+import logging
+
+from dexter.core import app
+from dexter.models import DocumentRollup
+
+log = logging.getLogger('rebuild_rollups')
+
+parser = argparse.ArgumentParser(description='Rebuild the daily document rollups.')
+parser.add_argument('--batch-size', type=int, default=100, help='number of days to rebuild between progress reports')
+parser.add_argument('--pending', action='store_true', help='only refresh days with interrupted refreshes')
+args = parser.parse_args()
+
+if args.pending:
+    days = DocumentRollup.refresh_pending()
+    log.info("Done: refreshed %d pending days" % days)
+else:
+    days = DocumentRollup.rebuild(batch_size=args.batch_size)
+    log.info("Done: rebuilt %d days" % days)
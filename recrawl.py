@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+#
+# Re-run crawler extraction (title, text, author, etc.) over existing
+# documents, for example after fixing a crawler's selectors.
+#
+#   python recrawl.py --offline --url-like news24.com
+#
+# With --offline, only the raw HTML cache is used and publishers are never
+# contacted; documents that aren't in the cache are skipped.
+#
+import argparse
+import logging
+
+from requests.exceptions import RequestException
+
+from dexter.core import app
+from dexter.models import db, Document
+from dexter.processing import DocumentProcessor, ProcessingError
+from dexter.processing.crawlers.base import BaseCrawler
+
+log = logging.getLogger('recrawl')
+
+parser = argparse.ArgumentParser(description='Re-run crawler extraction over existing documents.')
+parser.add_argument('--offline', action='store_true', help="only use cached HTML, don't fetch from the network")
+parser.add_argument('--url-like', help='only recrawl documents whose URL contains this string')
+parser.add_argument('--commit-every', type=int, default=50, help='number of documents to commit at once')
+args = parser.parse_args()
+
+BaseCrawler.offline = args.offline
+proc = DocumentProcessor()
+
+query = db.session.query(Document.id).filter(Document.url != None).order_by(Document.id)
+if args.url_like:
+    query = query.filter(Document.url.like('%' + args.url_like + '%'))
+ids = [id for id, in query]
+
+log.info("Recrawling %d documents" % len(ids))
+
+for i, id in enumerate(ids):
+    doc = Document.query.get(id)
+    try:
+        proc.crawl(doc)
+    except (ProcessingError, RequestException) as e:
+        log.warn("Skipping %s: %s" % (doc, e))
+        db.session.expire(doc)
+
+    if (i + 1) % args.commit_every == 0:
+        db.session.commit()
+        log.info("Recrawled %d of %d documents" % (i + 1, len(ids)))
+
+db.session.commit()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+#
+# Re-run extraction over existing documents, for example after changing
+# the sources extractor or entity normalisation.
+#
+#   python reextract.py --processes 4 --checkpoint reextract.json
+#
+# Only cached extractor responses are used, unless --online is given.
+# Progress is saved to the checkpoint file, so an interrupted run can be
+# restarted with the same command and will carry on where it left off.
+#
+import argparse
+import logging
+
+from dexter.core import app
+from dexter.models import db, Document
+from dexter.processing import Reextractor
+
+log = logging.getLogger('reextract')
+
+parser = argparse.ArgumentParser(description='Re-run extraction over existing documents.')
+parser.add_argument('--processes', type=int, default=4, help='number of worker processes, or 0 to run in this process')
+parser.add_argument('--chunk-size', type=int, default=100, help='number of documents to process and commit at once')
+parser.add_argument('--checkpoint', help='file to save progress to, and resume from')
+parser.add_argument('--reset', action='store_true', help='remove existing entities, keywords and utterances first')
+parser.add_argument('--online', action='store_true', help='call extraction APIs for documents that have no cached responses')
+parser.add_argument('--since', help='only re-extract documents published on or after this date (YYYY-MM-DD)')
+args = parser.parse_args()
+
+query = db.session.query(Document.id)
+if args.since:
+    query = query.filter(Document.published_at >= args.since)
+
+reextractor = Reextractor(processes=args.processes, chunk_size=args.chunk_size, checkpoint=args.checkpoint,
+                          reset=args.reset, offline=not args.online)
+counts = reextractor.run(query)
+
+log.info("Done: %s" % counts)
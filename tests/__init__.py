@@ -1,3 +1,26 @@
 # setup testing environment
 import os
 os.environ['FLASK_ENV'] = 'test'
+
+import sqlite3
+
+from sqlalchemy import event
+
+from dexter.models.support import db
+
+
+# The tests use an in-memory sqlite database. pysqlite's own transaction
+# handling breaks savepoints, so let SQLAlchemy begin transactions itself.
+# Connections to an in-memory database all share one sqlite connection, so
+# the transaction may already have begun.
+@event.listens_for(db.engine, 'connect')
+def sqlite_connect(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(db.engine, 'begin')
+def sqlite_begin(conn):
+    try:
+        conn.connection.connection.execute('BEGIN')
+    except sqlite3.OperationalError:
+        # already in a transaction
+        pass
@@ -0,0 +1,108 @@
+import datetime
+from collections import Counter
+
+from flask.ext.testing import TestCase
+
+from dexter.core import app
+from dexter.models.support import db
+from dexter.models import Document, DocumentSource, DocumentFairness, Fairness, Medium, User
+from dexter.models.seeds import seed_db
+
+
+class TestActivityCharts(TestCase):
+    def create_app(self):
+        app.config['TESTING'] = True
+        return app
+
+    def setUp(self):
+        self.db = db
+        self.db.session.remove()
+        self.db.drop_all()
+        self.db.create_all()
+        seed_db(db)
+
+        users = []
+        for first, last in [('Joe', 'Smith'), ('Sue', 'Jones')]:
+            u = User()
+            u.first_name = first
+            u.last_name = last
+            u.email = '%s@example.com' % first.lower()
+            db.session.add(u)
+            users.append(u)
+
+        fairness = dict((f.name, f) for f in Fairness.query)
+        self.media = [Medium.query.filter(Medium.name == name).one() for name in ['Beeld', 'Mail and Guardian']]
+
+        for i in xrange(24):
+            doc = Document()
+            doc.url = 'http://example.com/%d' % i
+            doc.title = 'Title %d' % i
+            doc.text = 'Text'
+            doc.published_at = datetime.datetime(2014, 1, 1 + i % 5, 12)
+            doc.medium = self.media[i % 2]
+            doc.created_by = users[i % 3] if i % 3 < 2 else None
+            doc.document_type_id = 1
+
+            for j in xrange(i % 3):
+                ds = DocumentSource()
+                ds.name = 'Source %d' % j
+                doc.sources.append(ds)
+
+            names = [[], ['Fair'], ['Unclear'], ['Fair', 'Omission'], ['Omission', 'Presentation'], []][i % 6]
+            for name in names:
+                df = DocumentFairness()
+                df.fairness = fairness[name]
+                doc.fairness.append(df)
+
+            db.session.add(doc)
+        db.session.commit()
+
+    def tearDown(self):
+        self.db.session.remove()
+        self.db.drop_all()
+
+    def expected(self, docs):
+        """ The charts, calculated from the documents in Python. """
+        fairness = Counter()
+        problems = Counter()
+        for d in docs:
+            if d.is_fair():
+                fairness.update(['Fair'])
+            else:
+                fairness.update(f.fairness.name for f in d.fairness)
+            problems.update(p.short_desc for p in d.analysis_problems())
+
+        return {
+            'charts': {
+                'created': {'values': dict(Counter(d.created_at.strftime('%Y/%m/%d') for d in docs))},
+                'published': {'values': dict(Counter(d.published_at.strftime('%Y/%m/%d') for d in docs))},
+                'users': {'values': dict(Counter(d.created_by.short_name() if d.created_by else '' for d in docs))},
+                'media': {
+                    'values': dict(Counter(d.medium.name for d in docs)),
+                    'types': dict([d.medium.name, d.medium.medium_type] for d in docs),
+                },
+                'problems': {'values': dict(problems)},
+                'fairness': {'values': dict(fairness)},
+            },
+            'summary': {
+                'documents': len(docs),
+            },
+        }
+
+    def test_chart_json(self):
+        for medium in self.media:
+            res = self.client.get('/activity', query_string={'format': 'chart-json', 'medium_id': str(medium.id)})
+            self.assert200(res)
+
+            docs = Document.query.filter(Document.medium == medium).all()
+            self.assertEqual(12, len(docs))
+            self.assertEqual(self.expected(docs), res.json)
+
+    def test_chart_json_empty(self):
+        user = User.query.first()
+        Document.query.filter(Document.created_by_user_id == user.id).delete()
+        db.session.commit()
+
+        res = self.client.get('/activity', query_string={'format': 'chart-json', 'user_id': str(user.id)})
+        self.assert200(res)
+        self.assertEqual(self.expected([]), res.json)
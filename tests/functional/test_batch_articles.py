@@ -0,0 +1,107 @@
+from flask.ext.testing import TestCase
+from flask.ext.fillin import FormWrapper
+
+from mock import patch
+
+from dexter.core import app
+from dexter.models.support import db
+from dexter.models import Document, Job
+from dexter.models.seeds import seed_db
+from dexter.processing import JobRunner
+from dexter.processing.crawlers import MGCrawler
+from dexter.processing.extractors import AlchemyExtractor, CalaisExtractor
+
+class TestBatchArticles(TestCase):
+    def create_app(self):
+        app.config['TESTING'] = True
+        return app
+
+    def setUp(self):
+        self.db = db
+        self.db.session.remove()
+        self.db.drop_all()
+        self.db.create_all()
+        seed_db(db)
+
+        self.client.response_wrapper = FormWrapper
+
+    def tearDown(self):
+        self.db.session.rollback()
+        self.db.session.remove()
+        self.db.drop_all()
+
+    def patches(self):
+        html = """
+<div class="headline_printable">title</div>
+<div class="body_printable"><p>body</p></div>
+<div class="content_place_line">2013/12/22</div>
+        """
+
+        return [
+            patch.object(MGCrawler, 'fetch', return_value=html),
+            patch.object(AlchemyExtractor, 'fetch_entities', return_value=[]),
+            patch.object(AlchemyExtractor, 'fetch_keywords', return_value=[]),
+            patch.object(CalaisExtractor, 'fetch_data', return_value={}),
+        ]
+
+    def submit(self, urls):
+        res = self.client.get('/articles/batch')
+        self.assert200(res)
+
+        f = res.forms[0]
+        f.fields['urls'] = '\n'.join(urls)
+        return f.submit(self.client)
+
+    def test_batch_articles(self):
+        patches = self.patches()
+        for p in patches:
+            p.start()
+        try:
+            res = self.submit(['http://mg.co.za/article/2013-12-22-foo', 'http://mg.co.za/article/2013-12-22-bar'])
+        finally:
+            for p in patches:
+                p.stop()
+
+        self.assert200(res)
+        self.assertEqual(2, Document.query.count())
+
+    def test_batch_articles_too_many(self):
+        res = self.submit(['http://mg.co.za/article/2013-12-22-foo-%d' % i for i in xrange(100)])
+
+        self.assert200(res)
+        self.assertIn('at most', res.data)
+        self.assertEqual(0, Document.query.count())
+
+    def test_batch_articles_async(self):
+        urls = ['http://mg.co.za/article/2013-12-22-foo-%d' % i for i in xrange(100)]
+
+        app.config['ASYNC_JOBS'] = True
+        try:
+            res = self.submit(urls)
+        finally:
+            app.config['ASYNC_JOBS'] = False
+
+        self.assertRedirects(res, '/jobs/1')
+        self.assertEqual(0, Document.query.count())
+        self.assertEqual(urls, Job.query.get(1).get_payload()['urls'])
+
+        res = self.client.get('/jobs/1')
+        self.assert200(res)
+
+        patches = self.patches()
+        for p in patches:
+            p.start()
+        try:
+            JobRunner().run_next()
+        finally:
+            for p in patches:
+                p.stop()
+
+        self.assertEqual(100, Document.query.count())
+        job = Job.query.get(1)
+        self.assertEqual('done', job.status)
+        self.assertEqual({'added': 100}, job.get_result()['summary'])
+
+        res = self.client.get('/jobs/1')
+        self.assert200(res)
+        self.assertIn('2013-12-22-foo-99', res.data)
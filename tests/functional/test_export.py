@@ -0,0 +1,183 @@
+import base64
+import shutil
+import tempfile
+from urlparse import urlparse
+
+from flask.ext.testing import TestCase
+from mock import patch
+
+from dexter.core import app
+from dexter.models.support import db
+from dexter.models import Document, DocumentFairness, Fairness, Job
+from dexter.models.seeds import seed_db
+from dexter.processing import JobRunner
+from dexter.processing.xlsx import XLSXBuilder
+from dexter.processing.tabular import CSVBuilder
+from dexter.processing.exports import exports
+
+from tests.fixtures import dbfixture, DocumentData
+
+
+def fake_write(self, output):
+    output.write('spreadsheet')
+
+
+class TestExport(TestCase):
+    def create_app(self):
+        app.config['TESTING'] = True
+        return app
+
+    def setUp(self):
+        self.db = db
+        self.db.session.remove()
+        self.db.drop_all()
+        self.db.create_all()
+        seed_db(db)
+
+        self.fx = dbfixture.data(DocumentData)
+        self.fx.setup()
+
+        self.root = exports.root
+        exports.root = tempfile.mkdtemp()
+
+        self.patch = patch.object(XLSXBuilder, 'write', side_effect=fake_write, autospec=True)
+        self.write = self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        shutil.rmtree(exports.root)
+        exports.root = self.root
+
+        self.fx.teardown()
+        self.db.session.remove()
+        self.db.drop_all()
+
+    def test_export(self):
+        res = self.client.get('/activity?format=xlsx&created_at=2013/01/01 - 2013/12/31')
+        self.assertStatus(res, 302)
+        self.assertIn('/exports/', res.location)
+
+        url = urlparse(res.location)
+        res = self.client.get(url.path, query_string=url.query)
+        self.assert200(res)
+        self.assertEqual('spreadsheet', res.data)
+        self.assertIn('documents-added-2013/01/01-2013/12/31.xlsx', res.headers['Content-Disposition'])
+
+        # served from the store the second time
+        res = self.client.get('/activity?format=xlsx&created_at=2013/01/01 - 2013/12/31')
+        self.assertStatus(res, 302)
+        self.assertEqual(1, self.write.call_count)
+
+        # different filters
+        self.client.get('/activity?format=xlsx&created_at=2013/01/01 - 2013/06/30')
+        self.assertEqual(2, self.write.call_count)
+
+    def test_export_csv(self):
+        with patch.object(CSVBuilder, 'write', side_effect=fake_write, autospec=True) as write:
+            res = self.client.get('/activity?format=csv&sheet=sources&created_at=2013/01/01 - 2013/12/31')
+            self.assertStatus(res, 302)
+            self.assertIn('/exports/csv/', res.location)
+            self.assertEqual(1, write.call_count)
+            self.assertEqual('sources', write.call_args[0][0].sheet)
+
+        url = urlparse(res.location)
+        res = self.client.get(url.path, query_string=url.query)
+        self.assert200(res)
+        self.assertEqual('application/x-gzip', res.headers['Content-Type'])
+        self.assertIn('documents-added-2013/01/01-2013/12/31-sources.csv.gz', res.headers['Content-Disposition'])
+
+    def test_export_stale(self):
+        self.client.get('/activity?format=xlsx&created_at=2013/01/01 - 2013/12/31')
+
+        doc = Document.query.first()
+        doc.updated_at = doc.updated_at.replace(year=doc.updated_at.year + 1)
+        db.session.commit()
+
+        self.client.get('/activity?format=xlsx&created_at=2013/01/01 - 2013/12/31')
+        self.assertEqual(2, self.write.call_count)
+
+    def test_export_stale_fairness(self):
+        url = '/activity?format=xlsx&sheet=fairness&created_at=2013/01/01 - 2013/12/31'
+        first = self.client.get(url).location
+
+        # adding fairness doesn't change the document
+        df = DocumentFairness()
+        df.fairness = Fairness.query.first()
+        df.doc_id = Document.query.first().id
+        db.session.add(df)
+        db.session.commit()
+
+        second = self.client.get(url).location
+        self.assertEqual(2, self.write.call_count)
+        self.assertNotEqual(first, second)
+
+        # deleting it goes back to the original export
+        db.session.delete(df)
+        db.session.commit()
+
+        self.assertEqual(first, self.client.get(url).location)
+
+    def test_export_async(self):
+        app.config['ASYNC_JOBS'] = True
+        try:
+            res = self.client.get('/activity?format=xlsx&created_at=2013/01/01 - 2013/12/31')
+        finally:
+            app.config['ASYNC_JOBS'] = False
+
+        self.assertRedirects(res, '/jobs/1')
+        self.assertEqual(0, self.write.call_count)
+
+        res = self.client.get('/jobs/1')
+        self.assert200(res)
+        self.assertIn('Preparing your export', res.data)
+
+        JobRunner().run_next()
+        self.assertEqual(1, self.write.call_count)
+
+        res = self.client.get('/jobs/1')
+        self.assert200(res)
+        self.assertIn('Your export is ready', res.data)
+        self.assertIn('/exports/', res.data)
+
+    def api_get(self, url):
+        with patch('flask_htauth.extension.check_password', return_value=True):
+            return self.client.get(url, headers={'Authorization': 'Basic ' + base64.b64encode('feeds:secret')})
+
+    def test_api_export(self):
+        with patch.object(CSVBuilder, 'write', side_effect=fake_write, autospec=True) as write:
+            res = self.api_get('/api/exports/csv?sheet=sources&published_at=2012/01/01 - 2012/12/31')
+            self.assert200(res)
+            self.assertEqual('spreadsheet', res.data)
+            self.assertEqual('application/x-gzip', res.headers['Content-Type'])
+            self.assertIn('documents-published-2012/01/01-2012/12/31-sources.csv.gz', res.headers['Content-Disposition'])
+            self.assertEqual('sources', write.call_args[0][0].sheet)
+
+            # served from the store the second time
+            self.assert200(self.api_get('/api/exports/csv?sheet=sources&published_at=2012/01/01 - 2012/12/31'))
+            self.assertEqual(1, write.call_count)
+
+        self.assert404(self.api_get('/api/exports/pdf'))
+        self.assert400(self.api_get('/api/exports/csv?sheet=secrets'))
+        self.assert401(self.client.get('/api/exports/csv'))
+
+    def test_api_export_async(self):
+        url = '/api/exports/xlsx?published_at=2012/01/01 - 2012/12/31'
+
+        app.config['ASYNC_JOBS'] = True
+        try:
+            res = self.api_get(url)
+            self.assertStatus(res, 202)
+            self.assertEqual('pending', res.json['job']['status'])
+
+            # the same job
+            res = self.api_get(url)
+            self.assertStatus(res, 202)
+            self.assertEqual(1, Job.query.count())
+
+            JobRunner().run_next()
+
+            res = self.api_get(url)
+            self.assert200(res)
+            self.assertEqual('spreadsheet', res.data)
+        finally:
+            app.config['ASYNC_JOBS'] = False
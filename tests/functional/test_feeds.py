@@ -0,0 +1,156 @@
+import base64
+import datetime
+import tempfile
+import shutil
+
+from flask.ext.testing import TestCase
+from mock import patch
+
+from dexter.core import app
+from dexter.models.support import db
+from dexter.models import Document, DocumentRollup, PendingRollup, Topic
+from dexter.models.seeds import seed_db
+from dexter.processing.extractors.cache import SQLiteCacheStore
+from dexter.processing.feed_cache import feed_cache
+
+from tests.fixtures import dbfixture, DocumentData
+
+
+class TestFeeds(TestCase):
+    def create_app(self):
+        app.config['TESTING'] = True
+        return app
+
+    def setUp(self):
+        self.db = db
+        self.db.session.remove()
+        self.db.drop_all()
+        self.db.create_all()
+        seed_db(db)
+
+        self.fx = dbfixture.data(DocumentData)
+        self.fx.setup()
+        DocumentRollup.rebuild()
+
+        self.root = tempfile.mkdtemp()
+        self.store = feed_cache.store
+        feed_cache.store = SQLiteCacheStore(self.root + '/feeds.db')
+
+        self.patch = patch('flask_htauth.extension.check_password', return_value=True)
+        self.patch.start()
+        self.headers = {'Authorization': 'Basic ' + base64.b64encode('feeds:secret')}
+
+    def tearDown(self):
+        self.patch.stop()
+        feed_cache.store = self.store
+        shutil.rmtree(self.root)
+
+        self.fx.teardown()
+        self.db.session.remove()
+        self.db.drop_all()
+
+    def get(self, url, **headers):
+        headers.update(self.headers)
+        return self.client.get(url, headers=headers)
+
+    def test_topics_feed(self):
+        res = self.get('/api/feeds/topics?start-date=2012-01-01&end-date=2012-01-31')
+        self.assert200(res)
+        self.assertEqual('2012/01/01 00:00:00', res.json['date-start'])
+        self.assertEqual(1, len(res.json['cells']))
+        self.assertEqual(1, res.json['cells'][0]['record_count'])
+        self.assertIsNotNone(res.headers.get('ETag'))
+        self.assertIsNone(res.headers.get('Last-Modified'))
+
+    def test_cached(self):
+        url = '/api/feeds/origins?start-date=2012-01-01&end-date=2012-12-31'
+        res = self.get(url)
+        self.assert200(res)
+
+        with patch.object(DocumentRollup, 'summary') as summary:
+            again = self.get(url)
+            self.assertEqual(0, summary.call_count)
+
+        self.assertEqual(res.json, again.json)
+        self.assertEqual(res.headers['ETag'], again.headers['ETag'])
+
+    def test_conditional(self):
+        url = '/api/feeds/bias?start-date=2012-01-01&end-date=2012-12-31'
+        res = self.get(url)
+        etag = res.headers['ETag']
+
+        res = self.get(url, **{'If-None-Match': etag})
+        self.assertStatus(res, 304)
+        self.assertEqual('', res.data)
+        self.assertEqual(etag, res.headers['ETag'])
+
+        # only etags are used
+        res = self.get(url, **{'If-Modified-Since': 'Sun, 18 Oct 2026 00:00:00 GMT'})
+        self.assert200(res)
+
+        # a different date range has a different etag
+        res = self.get('/api/feeds/bias?start-date=2012-01-01&end-date=2012-01-31', **{'If-None-Match': etag})
+        self.assert200(res)
+
+    def test_changes_invalidate(self):
+        url = '/api/feeds/topics?start-date=2012-01-01&end-date=2012-12-31'
+        etag = self.get(url).headers['ETag']
+
+        doc = Document.query.filter(Document.published_at < '2012-02-01').one()
+        db.session.delete(doc)
+        db.session.commit()
+
+        res = self.get(url, **{'If-None-Match': etag})
+        self.assert200(res)
+        self.assertNotEqual(etag, res.headers['ETag'])
+        self.assertEqual(1, sum(c['record_count'] for c in res.json['cells']))
+
+    def test_rollups_invalidate(self):
+        url = '/api/feeds/topics?start-date=2012-01-01&end-date=2012-12-31'
+        DocumentRollup.query.delete()
+        db.session.commit()
+
+        res = self.get(url)
+        self.assertEqual([], res.json['cells'])
+
+        DocumentRollup.rebuild()
+
+        again = self.get(url)
+        self.assertNotEqual(res.headers['ETag'], again.headers['ETag'])
+        self.assertEqual(2, sum(c['record_count'] for c in again.json['cells']))
+
+    def test_pending_not_cached(self):
+        url = '/api/feeds/topics?start-date=2012-01-01&end-date=2012-12-31'
+
+        pending = PendingRollup()
+        pending.date = datetime.date(2012, 1, 1)
+        pending.created_at = datetime.datetime.utcnow()
+        db.session.add(pending)
+        db.session.commit()
+
+        res = self.get(url)
+        with patch.object(DocumentRollup, 'summary', return_value=[]) as summary:
+            again = self.get(url)
+            self.assertEqual(1, summary.call_count)
+        self.assertEqual(res.headers['ETag'], again.headers['ETag'])
+
+        # the refresh changes the etag
+        DocumentRollup.refresh_pending(min_age=0)
+        self.assertNotEqual(res.headers['ETag'], self.get(url).headers['ETag'])
+
+    def test_renames_invalidate(self):
+        url = '/api/feeds/topics?start-date=2012-01-01&end-date=2012-12-31'
+        topic = Topic.query.first()
+        doc = Document.query.filter(Document.published_at < '2012-02-01').one()
+        doc.topic = topic
+        db.session.commit()
+
+        res = self.get(url)
+        self.assertIn(topic.name, [c['topic'] for c in res.json['cells']])
+
+        topic.name = 'Renamed'
+        db.session.commit()
+
+        res = self.get(url, **{'If-None-Match': res.headers['ETag']})
+        self.assert200(res)
+        self.assertIn('Renamed', [c['topic'] for c in res.json['cells']])
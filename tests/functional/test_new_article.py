@@ -1,3 +1,5 @@
+import json
+
 from flask.ext.testing import TestCase
 from flask.ext.fillin import FormWrapper
 
@@ -5,8 +7,9 @@ from mock import patch, MagicMock
 
 from dexter.core import app
 from dexter.models.support import db
-from dexter.models import Author
+from dexter.models import Author, Document
 from dexter.models.seeds import seed_db
+from dexter.processing import JobRunner
 from dexter.processing.crawlers import MGCrawler
 from dexter.processing.extractors import AlchemyExtractor, CalaisExtractor
 
@@ -29,11 +32,17 @@ class TestNewArticle(TestCase):
 
         self.client.response_wrapper = FormWrapper
 
-        AlchemyExtractor.fetch_entities = MagicMock(return_value=[])
-        AlchemyExtractor.fetch_keywords = MagicMock(return_value=[])
-        CalaisExtractor.fetch_data = MagicMock(return_value={})
+        self.patches = [
+            patch.object(AlchemyExtractor, 'fetch_entities', return_value=[]),
+            patch.object(AlchemyExtractor, 'fetch_keywords', return_value=[]),
+            patch.object(CalaisExtractor, 'fetch_data', return_value={}),
+        ]
+        for p in self.patches:
+            p.start()
 
     def tearDown(self):
+        for p in self.patches:
+            p.stop()
         self.fx.teardown()
         self.db.session.rollback()
         self.db.session.remove()
@@ -62,6 +71,36 @@ class TestNewArticle(TestCase):
 
         self.assertRedirects(res, '/articles/1/analysis')
 
+    def test_new_article_by_url_async(self):
+        res = self.client.get('/articles/new')
+        MGCrawler.fetch = MagicMock(return_value="""
+<div class="headline_printable">title</div>
+<div class="body_printable"><p>body</p></div>
+<div class="content_place_line">2013/12/22</div>
+        """)
+
+        app.config['ASYNC_JOBS'] = True
+        try:
+            f = res.forms[0]
+            f.fields['url'] = 'http://mg.co.za/article/2013-12-22-foo'
+            res = f.submit(self.client)
+        finally:
+            app.config['ASYNC_JOBS'] = False
+
+        self.assertRedirects(res, '/jobs/1')
+        self.assertEqual(0, Document.query.count())
+
+        res = self.client.get('/api/jobs/1')
+        self.assertEqual('pending', json.loads(res.data)['status'])
+
+        res = self.client.get('/jobs/1')
+        self.assert200(res)
+
+        JobRunner().run_next()
+
+        res = self.client.get('/jobs/1')
+        self.assertRedirects(res, '/articles/1/analysis')
+
     def test_new_article_existing_author(self):
         res = self.client.get('/articles/new')
         self.assert200(res)
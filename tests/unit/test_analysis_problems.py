@@ -0,0 +1,77 @@
+import unittest
+import datetime
+from collections import Counter
+
+from dexter.models import Document, DocumentSource, SourceFunction, Affiliation, Topic, Location
+from dexter.models.document import DocumentAnalysisProblem
+from dexter.models.support import db
+from dexter.models.seeds import seed_db
+
+
+class TestDocumentAnalysisProblem(unittest.TestCase):
+    def setUp(self):
+        self.db = db
+        self.db.drop_all()
+        self.db.create_all()
+        seed_db(db)
+
+        topic = Topic.query.first()
+        origin = Location.query.first()
+        function = SourceFunction.query.first()
+        affiliation = Affiliation.query.first()
+
+        # documents with every combination of problems
+        for i in xrange(16):
+            doc = Document()
+            doc.url = 'http://example.com/%d' % i
+            doc.title = 'Title %d' % i
+            doc.text = 'Text'
+            doc.published_at = datetime.datetime(2014, 1, 1 + i)
+            doc.medium_id = 1
+            doc.document_type_id = 1
+
+            if i & 1:
+                doc.topic = topic
+            if i & 2:
+                doc.origin = origin
+
+            for j in xrange(i % 3):
+                ds = DocumentSource()
+                ds.name = 'Source %d' % j
+                if not (i & 4) or j:
+                    ds.function = function
+                if not (i & 8) or j:
+                    ds.affiliation = affiliation
+                doc.sources.append(ds)
+
+            db.session.add(doc)
+        db.session.commit()
+
+    def tearDown(self):
+        self.db.session.remove()
+        self.db.drop_all()
+
+    def expected(self, docs):
+        counts = Counter()
+        for d in docs:
+            counts.update(p.short_desc for p in d.analysis_problems())
+        return dict(counts)
+
+    def test_counts(self):
+        counts = DocumentAnalysisProblem.counts(db.session.query(Document.id))
+
+        self.assertEqual(self.expected(Document.query.all()), counts)
+        self.assertEqual(8, counts['missing a topic'])
+
+    def test_counts_filtered(self):
+        query = Document.query.filter(Document.published_at >= datetime.datetime(2014, 1, 6))
+        counts = DocumentAnalysisProblem.counts(query)
+
+        self.assertEqual(self.expected(query.all()), counts)
+
+    def test_counts_filtered_by_problem(self):
+        problem = DocumentAnalysisProblem.lookup('source-without-function')
+        query = problem.filter_query(db.session.query(Document.id))
+        counts = DocumentAnalysisProblem.counts(query)
+
+        self.assertEqual(self.expected(problem.filter_query(Document.query).all()), counts)
@@ -1,8 +1,11 @@
 import unittest
 
+from sqlalchemy import event
+
 from dexter.models import Document
 from dexter.models.support import db
 from dexter.models.seeds import seed_db
+from dexter.models.medium import PrefixTrie
 from dexter.processing.crawlers.base import BaseCrawler
 
 class TestBaseCrawler(unittest.TestCase):
@@ -29,3 +32,36 @@ class TestBaseCrawler(unittest.TestCase):
 
         doc.url = 'http://www.iol.co.za/news/politics/nkandla-job-not-finished-madonsela-1.1669787#.UzvP7K2SxWs'
         self.assertEquals(self.crawler.identify_medium(doc).name, 'IOL')
+
+        doc.url = 'http://www.example.com/foo'
+        self.assertEquals(self.crawler.identify_medium(doc).name, 'Unknown')
+
+        doc.url = None
+        self.assertEquals(self.crawler.identify_medium(doc).name, 'Unknown')
+
+    def test_mediums_cached(self):
+        doc = Document()
+        doc.url = 'http://mg.co.za/article/2013-12-22-foo'
+        self.assertEquals(self.crawler.identify_medium(doc).name, 'Mail and Guardian')
+
+        queries = []
+        listener = lambda *args: queries.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            doc.url = 'http://www.iol.co.za/isolezwe/foo'
+            self.assertEquals(self.crawler.identify_medium(doc).name, 'Isolezwe')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        self.assertEqual([], queries)
+
+    def test_prefix_trie(self):
+        trie = PrefixTrie()
+        trie.add('iol.co.za', 'IOL')
+        trie.add('iol.co.za/isolezwe', 'Isolezwe')
+
+        self.assertEqual('Isolezwe', trie.longest_prefix('iol.co.za/isolezwe/foo'))
+        self.assertEqual('IOL', trie.longest_prefix('iol.co.za/isolezw'))
+        self.assertEqual('IOL', trie.longest_prefix('iol.co.za'))
+        self.assertIsNone(trie.longest_prefix('iol.co.z'))
+        self.assertIsNone(trie.longest_prefix(''))
@@ -0,0 +1,114 @@
+import unittest
+
+from mock import patch
+from requests.exceptions import HTTPError
+
+from dexter.models import Document, DocumentEntity, Entity
+from dexter.models.support import db
+from dexter.models.seeds import seed_db
+from dexter.processing import BatchProcessor, DocumentProcessor
+from dexter.processing.crawlers import MGCrawler
+from dexter.processing.extractors import AlchemyExtractor, CalaisExtractor
+
+HTML = """
+<div class="headline_printable">title</div>
+<div class="blurb_printable">blurb</div>
+<div class="body_printable"><p>body</p></div>
+<div class="content_place_line">2013/12/22</div>
+<div class="content_place_line_author">Joe Bloggs</div>
+"""
+
+def fake_fetch(self, url):
+    if 'broken' in url:
+        raise HTTPError('404 Not Found')
+    return HTML
+
+
+class TestBatchProcessor(unittest.TestCase):
+    def setUp(self):
+        self.db = db
+        self.db.drop_all()
+        self.db.create_all()
+        seed_db(db)
+
+        AlchemyExtractor.API_KEY = 'fake'
+
+        self.patches = [
+            patch.object(MGCrawler, 'fetch', fake_fetch),
+            patch.object(AlchemyExtractor, 'fetch_entities', return_value=[]),
+            patch.object(AlchemyExtractor, 'fetch_keywords', return_value=[]),
+            patch.object(CalaisExtractor, 'fetch_data', return_value={}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+        self.db.session.remove()
+        self.db.drop_all()
+
+    def test_process_urls(self):
+        batch = BatchProcessor(threads=2, commit_every=1)
+        results = batch.process_urls([
+            'http://mg.co.za/article/2013-12-22-foo',
+            'http://mg.co.za/article/2013-12-22-broken',
+            'http://www.mg.co.za/article/2013-12-22-foo/#anchor',
+            'http://mg.co.za/article/2013-12-22-bar',
+            ])
+
+        self.assertEqual(['added', 'failed', 'exists', 'added'], [r.status for r in results])
+        self.assertEqual({'added': 2, 'failed': 1, 'exists': 1}, batch.summary())
+
+        self.assertEqual(2, Document.query.count())
+        doc = Document.query.get(results[0].document_id)
+        self.assertEqual('http://mg.co.za/article/2013-12-22-foo', doc.url)
+        self.assertEqual('title', doc.title)
+
+    def test_skip_existing(self):
+        BatchProcessor().process_urls(['http://mg.co.za/article/2013-12-22-foo'])
+
+        results = BatchProcessor().process_urls(['http://mg.co.za/article/2013-12-22-foo'])
+        self.assertEqual('exists', results[0].status)
+        self.assertEqual(1, Document.query.count())
+
+    def test_failed_document_discards_extracted(self):
+        process_document = DocumentProcessor.process_document
+
+        def failing(self, doc):
+            process_document(self, doc)
+            if 'bar' in doc.url:
+                # an extractor has already saved an entity
+                e = Entity()
+                e.group = 'person'
+                e.name = 'Flushed Entity'
+                db.session.add(e)
+                db.session.flush()
+
+                de = DocumentEntity()
+                de.entity = Entity()
+                de.entity.group = 'person'
+                de.entity.name = 'Attached Entity'
+                de.relevance = 0.5
+                doc.entities.append(de)
+                db.session.add(doc)
+
+                e = Entity()
+                e.group = 'person'
+                e.name = 'Pending Entity'
+                db.session.add(e)
+                raise ValueError('extraction failed')
+
+        with patch.object(DocumentProcessor, 'process_document', failing):
+            batch = BatchProcessor(threads=1)
+            results = batch.process_urls([
+                'http://mg.co.za/article/2013-12-22-bar',
+                'http://mg.co.za/article/2013-12-22-foo',
+                ])
+
+        self.assertEqual(['failed', 'added'], [r.status for r in results])
+        db.session.remove()
+        self.assertEqual(1, Document.query.count())
+        self.assertEqual(0, Entity.query.filter(Entity.name.like('% Entity')).count())
+        self.assertEqual(0, DocumentEntity.query.count())
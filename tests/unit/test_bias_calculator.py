@@ -1,5 +1,10 @@
 import unittest
+import datetime
+import random
 
+from dexter.models import Document, DocumentSource, DocumentFairness, DocumentRollup, Fairness, Affiliation, Medium
+from dexter.models.support import db
+from dexter.models.seeds import seed_db
 from dexter.processing.bias import BiasCalculator
 
 class TestUser(unittest.TestCase):
@@ -65,3 +70,119 @@ class TestUser(unittest.TestCase):
         self.assertAlmostEqual(0.93, entropies['Sowetan'], 2)
         self.assertAlmostEqual(0.76, entropies['BD'], 2)
         self.assertAlmostEqual(0.9, entropies['Citizen'], 2)
+
+    def test_entropy_matches_loops(self):
+        rand = random.Random(42)
+
+        for cols, rows in [(1, 1), (3, 1), (5, 8), (40, 30), (300, 60)]:
+            table = {}
+            for c in xrange(cols):
+                table['medium %d' % c] = dict(
+                        ('party %d' % r, rand.choice([0, 0, 1, 2, 5, 30, 400]))
+                        for r in xrange(rows) if rand.random() < 0.7)
+
+            # exactly the same, not just approximately
+            self.assertEqual(self.c.calculate_entropy_loops(table), self.c.calculate_entropy(table))
+
+
+class TestGroupedBiasScores(unittest.TestCase):
+    def setUp(self):
+        self.db = db
+        self.db.drop_all()
+        self.db.create_all()
+        seed_db(db)
+
+        self.c = BiasCalculator()
+
+        parties = Affiliation.query.filter(Affiliation.code.startswith('4.')).order_by(Affiliation.id).all()
+        fairness = dict((f.name, f) for f in Fairness.query)
+        media = [Medium.query.filter(Medium.name == name).one() for name in
+                ['Etv English News', 'Etv Sunrise', 'Beeld', 'Mail and Guardian']]
+
+        # a mix of fair and unfair documents, with and without
+        # party sources, for each medium
+        for i in xrange(20):
+            doc = Document()
+            doc.url = 'http://example.com/%d' % i
+            doc.title = 'Title %d' % i
+            doc.text = 'Text'
+            doc.published_at = datetime.datetime(2014, 1, 1 + i)
+            doc.medium = media[i % len(media)]
+            doc.document_type_id = 1
+
+            for j in xrange(i % 3):
+                ds = DocumentSource()
+                ds.name = 'Source %d' % j
+                ds.affiliation = parties[(i + j) % 5]
+                doc.sources.append(ds)
+
+            if i % 5 == 1:
+                df = DocumentFairness()
+                df.fairness = fairness['Fair']
+                doc.fairness.append(df)
+            elif i % 5 == 3:
+                df = DocumentFairness()
+                df.fairness = fairness['Unclear']
+                doc.fairness.append(df)
+            elif i % 5 == 2:
+                df = DocumentFairness()
+                df.fairness = fairness['Omission']
+                df.bias_favour = parties[i % 3]
+                doc.fairness.append(df)
+
+                df = DocumentFairness()
+                df.fairness = fairness['Presentation']
+                df.bias_oppose = parties[i % 2]
+                doc.fairness.append(df)
+
+            db.session.add(doc)
+        db.session.commit()
+
+    def tearDown(self):
+        self.db.session.remove()
+        self.db.drop_all()
+
+    def assertScoresEqual(self, expected, actual):
+        self.assertEqual([s.group for s in expected], [s.group for s in actual])
+
+        for e, a in zip(expected, actual):
+            self.assertEqual(e.count, a.count)
+            self.assertEqual(e.favour, a.favour)
+            self.assertEqual(e.oppose, a.oppose)
+            self.assertAlmostEqual(e.fair, a.fair)
+            self.assertAlmostEqual(e.parties, a.parties)
+            self.assertAlmostEqual(e.score, a.score)
+
+    def test_matches_in_memory_scores(self):
+        expected = self.c.calculate_bias_scores(self.c.get_query().all(), key=lambda d: d.medium.group_name())
+        actual = self.c.calculate_grouped_bias_scores(Document.query, [BiasCalculator.MEDIUM_GROUP])
+
+        self.assertEqual(['Beeld', 'Mail and Guardian', 'etv'], [s.group for s in actual])
+        self.assertScoresEqual(expected, actual)
+
+    def test_blank_medium_group(self):
+        # media with a blank group are grouped by name
+        for medium in Medium.query.filter(Medium.name.in_(['Beeld', 'Mail and Guardian'])):
+            medium.medium_group = ''
+        db.session.commit()
+
+        expected = self.c.calculate_bias_scores(self.c.get_query().all(), key=lambda d: d.medium.group_name())
+        actual = self.c.calculate_grouped_bias_scores(Document.query, [BiasCalculator.MEDIUM_GROUP])
+
+        self.assertEqual(['Beeld', 'Mail and Guardian', 'etv'], [s.group for s in actual])
+        self.assertScoresEqual(expected, actual)
+
+    def test_multiple_groups(self):
+        query = Document.query.filter(Document.published_at >= datetime.datetime(2014, 1, 5))
+
+        expected = self.c.calculate_bias_scores(query.all(), key=lambda d: (d.medium.group_name(), d.medium.medium_type))
+        actual = self.c.calculate_grouped_bias_scores(query, [BiasCalculator.MEDIUM_GROUP, Medium.medium_type])
+
+        self.assertScoresEqual(expected, actual)
+
+    def test_rollup_matches_grouped_scores(self):
+        expected = self.c.calculate_grouped_bias_scores(Document.query, [DocumentRollup.MEDIUM_GROUP, Medium.medium_type])
+        actual = self.c.calculate_rollup_bias_scores(datetime.date(2014, 1, 1), datetime.date(2014, 1, 31))
+
+        self.assertEqual(3, len(actual))
+        self.assertScoresEqual(expected, actual)
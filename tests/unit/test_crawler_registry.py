@@ -0,0 +1,34 @@
+import unittest
+
+from dexter.processing.crawlers import registry, MGCrawler, IOLCrawler, GenericCrawler
+from dexter.processing.crawlers.registry import CrawlerRegistry
+
+
+class TestCrawlerRegistry(unittest.TestCase):
+    def test_dispatch_by_hostname(self):
+        self.assertIsInstance(registry.crawler_for('http://mg.co.za/article/2013-12-22-foo'), MGCrawler)
+        self.assertIsInstance(registry.crawler_for('http://www.mg.co.za/article/2013-12-22-foo'), MGCrawler)
+        self.assertIsInstance(registry.crawler_for('https://WWW.IOL.co.za/news/foo'), IOLCrawler)
+
+    def test_fallback(self):
+        self.assertIsInstance(registry.crawler_for('http://example.com/foo'), GenericCrawler)
+        # a different host that merely contains a known domain
+        self.assertIsInstance(registry.crawler_for('http://mg.co.za.example.com/foo'), GenericCrawler)
+
+    def test_invalid_urls(self):
+        for url in ['not a url', 'ftp://mg.co.za/foo', '', None, 'http://']:
+            self.assertIsNone(registry.crawler_for(url))
+            self.assertFalse(registry.valid_url(url))
+
+    def test_register(self):
+        r = CrawlerRegistry()
+        crawler = MGCrawler()
+        r.register(crawler, ['www.Example.com'])
+
+        self.assertIs(crawler, r.crawler_for('http://example.com/foo'))
+        self.assertIs(crawler, r.crawler_for('http://www.example.com/foo'))
+        self.assertIsNone(r.crawler_for('http://other.com/foo'))
+
+    def test_offer(self):
+        self.assertTrue(MGCrawler().offer('http://www.mg.co.za/article/foo'))
+        self.assertFalse(MGCrawler().offer('http://example.com/foo'))
@@ -1,7 +1,7 @@
 import unittest
 import datetime
 
-from dexter.models import Document, DocumentEntity, Entity, Utterance
+from dexter.models import Document, DocumentEntity, DocumentKeyword, DocumentSource, Entity, Person, Utterance
 
 from dexter.models.support import db
 from dexter.models.seeds import seed_db
@@ -46,6 +46,64 @@ class TestDocument(unittest.TestCase):
         # shouldn't add dup
         self.assertEqual([de], list(doc.entities))
 
+    def test_add_entities_merges_offsets(self):
+        doc = Document()
+
+        for i, name in enumerate(['Zuma', 'Zille', 'ZUMA']):
+            e = Entity()
+            e.group = 'person'
+            e.name = name
+
+            de = DocumentEntity()
+            de.entity = e
+            de.relevance = 0.5
+            de.offset_list = '%d:4' % (i * 10)
+            doc.add_entity(de)
+
+        self.assertEqual(2, len(doc.entities))
+        self.assertEqual([(0, 4), (20, 4)], doc.entities[0].offsets())
+        self.assertEqual(doc.entities[1], doc.mentioned_entity(doc.entities[1].entity))
+
+    def test_merge_index_sees_direct_changes(self):
+        doc = Document()
+
+        k = DocumentKeyword()
+        k.keyword = 'Elections'
+        k.relevance = 0.5
+        self.assertTrue(doc.add_keyword(k))
+
+        # changed behind the index's back
+        k2 = DocumentKeyword()
+        k2.keyword = 'voting'
+        k2.relevance = 0.5
+        doc.keywords.append(k2)
+
+        k3 = DocumentKeyword()
+        k3.keyword = 'Voting'
+        k3.relevance = 0.5
+        k3.offset_list = '1:6'
+        self.assertTrue(doc.add_keyword(k3))
+        self.assertEqual(2, len(doc.keywords))
+        self.assertEqual([(1, 6)], k2.offsets())
+
+        doc.keywords.remove(k)
+        self.assertTrue(doc.add_keyword(k))
+        self.assertEqual(2, len(doc.keywords))
+
+    def test_add_source(self):
+        doc = Document()
+        p = Person()
+        p.name = 'Fred'
+
+        s = DocumentSource()
+        s.person = p
+        self.assertTrue(doc.add_source(s))
+
+        s2 = DocumentSource()
+        s2.person = p
+        self.assertFalse(doc.add_source(s2))
+        self.assertEqual([s], doc.sources)
+
     def test_add_utterance(self):
         doc = Document()
         doc.text = 'And Fred said "Hello" to everyone.'
@@ -1,4 +1,9 @@
 import unittest
+import datetime
+import unicodedata
+
+from mock import patch
+from sqlalchemy.schema import CreateTable
 
 from dexter.models import Document, DocumentEntity, Entity
 from dexter.models.entity import sanitise_name
@@ -27,6 +32,22 @@ class TestDocumentEntity(unittest.TestCase):
         self.assertFalse(de.add_offset((3, 4)))
         self.assertEqual('1:2 3:4', de.offset_list)
 
+    def test_offsets_add_many(self):
+        de = DocumentEntity()
+        self.assertTrue(de.add_offsets([(9, 1), (1, 2), (9, 1)]))
+        self.assertTrue(de.add_offsets([(1, 2), (5, 3)]))
+        self.assertFalse(de.add_offsets([(5, 3)]))
+        self.assertEqual([(1, 2), (5, 3), (9, 1)], de.offsets())
+
+    def test_offsets_packed(self):
+        de = DocumentEntity()
+        de.set_offsets([(70000, 3), (1, 2)])
+        self.assertEqual(16, len(de.offset_data))
+        self.assertEqual([(1, 2), (70000, 3)], DocumentEntity.unpack_offsets(de.offset_data))
+
+        de.offset_data = None
+        self.assertEqual([], de.offsets())
+
 class TestEntity(unittest.TestCase):
     def setUp(self):
         self.db = db
@@ -41,9 +62,98 @@ class TestEntity(unittest.TestCase):
     def test_add_entity(self):
         self.assertEqual(Entity.get_or_create('person', 'Zuma'), Entity.get_or_create('person', 'Zuma]'))
 
+    def test_many_offsets(self):
+        # more than would fit in the old offset_list string column
+        doc = Document()
+        doc.url = 'http://example.com'
+        doc.title = 'Title'
+        doc.text = 'Text'
+        doc.published_at = datetime.datetime(2014, 1, 1)
+        doc.medium_id = 1
+        doc.document_type_id = 1
+
+        de = DocumentEntity()
+        de.entity = Entity.get_or_create('person', 'Zuma')
+        de.relevance = 0.5
+        de.set_offsets((i * 10, 4) for i in xrange(1000))
+        doc.entities.append(de)
+
+        db.session.add(doc)
+        db.session.commit()
+        db.session.expire_all()
+
+        de = DocumentEntity.query.one()
+        self.assertEqual(1000, len(de.offsets()))
+        self.assertEqual((9990, 4), de.offsets()[-1])
+
     def test_sanitise_name(self):
         self.assertEqual('foo', sanitise_name('foo'))
         self.assertEqual('A.N.C', sanitise_name('A.N.C.'))
         self.assertEqual('Zuma', sanitise_name('Zuma,]'))
         self.assertEqual('Jacob Zuma', sanitise_name(u'Jacob\xa0Zuma'))
         self.assertEqual('Zuma', sanitise_name(u'Zuma -'))
+
+    def test_bulk_get_or_create(self):
+        zuma = Entity.get_or_create('person', 'Jacob Zuma')
+
+        entities = Entity.bulk_get_or_create([
+            ('person', 'Jacob Zuma'),
+            ('person', 'Helen Zille.'),
+            ('organization', 'ANC'),
+            ('organization', 'ANC'),
+            ])
+
+        self.assertEqual(3, len(entities))
+        self.assertEqual(zuma.id, entities[('person', 'jacob zuma')].id)
+        self.assertEqual('Helen Zille', entities[('person', 'helen zille')].name)
+        self.assertEqual(3, Entity.query.count())
+
+        # again, from the id cache
+        again = Entity.bulk_get_or_create([('organization', 'anc'), ('person', 'Helen Zille')])
+        self.assertEqual(entities[('organization', 'anc')].id, again[('organization', 'anc')].id)
+        self.assertEqual(3, Entity.query.count())
+
+    def test_bulk_get_or_create_concurrent(self):
+        # another process creates an entity after we've looked for it
+        bulk_get = Entity.bulk_get.im_func
+
+        def racing_bulk_get(cls, pairs, lock=False):
+            if not lock:
+                Entity.get_or_create('person', 'Jacob Zuma')
+            return bulk_get(cls, pairs, lock)
+
+        with patch.object(Entity, 'bulk_get', classmethod(racing_bulk_get)):
+            entities = Entity.bulk_get_or_create([('person', 'Jacob Zuma'), ('person', 'Helen Zille')])
+
+        self.assertEqual(2, len(entities))
+        self.assertEqual('Jacob Zuma', entities[('person', 'jacob zuma')].name)
+        self.assertEqual(2, Entity.query.count())
+
+    def test_bulk_get_or_create_collation(self):
+        # compare names ignoring accents, like MySQL's default collations
+        def fold(s):
+            if isinstance(s, str):
+                s = s.decode('utf-8')
+            return u''.join(c for c in unicodedata.normalize('NFKD', s) if not unicodedata.combining(c)).lower()
+
+        db.session.connection().connection.connection.create_collation(
+                'accents', lambda a, b: cmp(fold(a), fold(b)))
+
+        ddl = unicode(CreateTable(Entity.__table__).compile(db.engine))
+        db.session.execute('DROP TABLE entities')
+        db.session.execute(ddl.replace('name VARCHAR(150) NOT NULL', 'name VARCHAR(150) COLLATE accents NOT NULL'))
+        db.session.execute('CREATE UNIQUE INDEX entity_group_name_ix ON entities ("group", name)')
+
+        jose = Entity.get_or_create('person', 'Jose Dos Santos')
+
+        for i in xrange(2):
+            entities = Entity.bulk_get_or_create([('person', u'Jos\xe9 Dos Santos'), ('person', 'Jose dos Santos')])
+            self.assertEqual(jose.id, entities[('person', u'jos\xe9 dos santos')].id)
+            self.assertEqual(jose.id, entities[('person', 'jose dos santos')].id)
+            self.assertEqual(1, Entity.query.count())
+
+    def test_bulk_get_or_create_stale_cache(self):
+        Entity.id_cache[('person', 'jacob zuma')] = 12345
+        entities = Entity.bulk_get_or_create([('person', 'Jacob Zuma')])
+        self.assertEqual('Jacob Zuma', entities[('person', 'jacob zuma')].name)
+        self.assertNotEqual(12345, Entity.id_cache[('person', 'jacob zuma')])
@@ -0,0 +1,79 @@
+import unittest
+import threading
+import time
+
+from dexter.models import Document
+from dexter.processing import DocumentProcessor, ProcessingError
+from dexter.processing.extractors.base import BaseExtractor
+
+
+class Rendezvous(object):
+    """ Lets +count+ threads wait until they've all arrived, or until +timeout+
+    seconds have passed. """
+    def __init__(self, count, timeout=5):
+        self.count = count
+        self.timeout = timeout
+        self.arrived = 0
+        self.cond = threading.Condition()
+
+    def wait(self):
+        """ Returns False if the others didn't arrive in time. """
+        deadline = time.time() + self.timeout
+        with self.cond:
+            self.arrived += 1
+            self.cond.notify_all()
+            while self.arrived < self.count:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+
+class FakeExtractor(BaseExtractor):
+    def __init__(self, name, merged, error=None, rendezvous=None):
+        self.name = name
+        self.merged = merged
+        self.error = error
+        self.rendezvous = rendezvous
+
+    def fetch_tasks(self, doc):
+        return [('data', self.fetch)]
+
+    def fetch(self):
+        if self.rendezvous and not self.rendezvous.wait():
+            raise AssertionError("fetch tasks didn't run concurrently")
+        if self.error:
+            raise self.error
+        return (self.name, threading.current_thread())
+
+    def merge(self, doc, results):
+        self.merged.append((results['data'][0], threading.current_thread()))
+
+
+class TestDocumentProcessor(unittest.TestCase):
+    def setUp(self):
+        self.proc = DocumentProcessor()
+        self.doc = Document()
+        self.doc.text = u'text'
+        self.merged = []
+
+    def test_extract_concurrently(self):
+        # each fetch waits for the others, so they must all run at once
+        rendezvous = Rendezvous(3)
+        self.proc.extractors = [FakeExtractor(n, self.merged, rendezvous=rendezvous) for n in ['a', 'b', 'c']]
+
+        self.proc.extract(self.doc)
+
+        # merged in order, on this thread
+        self.assertEqual([('a', threading.current_thread()),
+                          ('b', threading.current_thread()),
+                          ('c', threading.current_thread())], self.merged)
+
+    def test_extract_error(self):
+        self.proc.extractors = [
+                FakeExtractor('a', self.merged),
+                FakeExtractor('b', self.merged, ProcessingError('bad'))]
+
+        self.assertRaises(ProcessingError, self.proc.extract, self.doc)
+        self.assertEqual([], self.merged)
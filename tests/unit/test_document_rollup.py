@@ -0,0 +1,207 @@
+import unittest
+import datetime
+
+from mock import patch
+
+from dexter.models import Document, DocumentSource, DocumentFairness, DocumentRollup, DocumentRollupDay, PendingRollup, Fairness, Affiliation, Medium, Topic, Person
+from dexter.models.support import db
+from dexter.models.seeds import seed_db
+
+
+class TestDocumentRollup(unittest.TestCase):
+    def setUp(self):
+        self.db = db
+        self.db.drop_all()
+        self.db.create_all()
+        seed_db(db)
+
+        self.fairness = dict((f.name, f) for f in Fairness.query)
+        self.party = Affiliation.query.filter(Affiliation.code.startswith('4.')).order_by(Affiliation.id).first()
+        self.topic = Topic.query.order_by(Topic.id).first()
+        self.beeld = Medium.query.filter(Medium.name == 'Beeld').one()
+        self.mg = Medium.query.filter(Medium.name == 'Mail and Guardian').one()
+
+    def tearDown(self):
+        self.db.session.remove()
+        self.db.drop_all()
+
+    def add_document(self, i, medium, day):
+        doc = Document()
+        doc.url = 'http://example.com/%d' % i
+        doc.title = 'Title %d' % i
+        doc.text = 'Text'
+        doc.published_at = datetime.datetime(2014, 1, day, 10, 30)
+        doc.medium = medium
+        doc.topic = self.topic
+        doc.document_type_id = 1
+        db.session.add(doc)
+        return doc
+
+    def counts(self, metric, day):
+        return dict(((r.medium_id, r.label_id, r.sublabel), r.count) for r in
+                    DocumentRollup.query.filter(DocumentRollup.metric == metric,
+                                                DocumentRollup.date == datetime.date(2014, 1, day)))
+
+    def test_refreshed_on_commit(self):
+        self.add_document(1, self.beeld, 1)
+        self.add_document(2, self.beeld, 1)
+        doc = self.add_document(3, self.mg, 2)
+        db.session.commit()
+
+        self.assertEqual({(self.beeld.id, None, None): 2}, self.counts('documents', 1))
+        self.assertEqual({(self.beeld.id, self.topic.id, None): 2}, self.counts('topic', 1))
+        self.assertEqual({(self.mg.id, None, None): 1}, self.counts('documents', 2))
+        self.assertEqual({}, self.counts('unfair', 2))
+
+        # changing a document's analysis refreshes its day
+        df = DocumentFairness()
+        df.fairness = self.fairness['Omission']
+        df.bias_favour = self.party
+        doc.fairness.append(df)
+
+        ds = DocumentSource()
+        ds.name = 'Jacob Zuma'
+        ds.affiliation = self.party
+        doc.sources.append(ds)
+        db.session.commit()
+
+        self.assertEqual({(self.mg.id, None, None): 1}, self.counts('unfair', 2))
+        self.assertEqual({(self.mg.id, self.party.id, None): 1}, self.counts('favour', 2))
+        self.assertEqual({(self.mg.id, self.party.id, 'Jacob Zuma'): 1}, self.counts('party_source', 2))
+
+        db.session.delete(df)
+        db.session.commit()
+        self.assertEqual({}, self.counts('unfair', 2))
+
+    def test_moved_document(self):
+        self.add_document(1, self.beeld, 1)
+        doc = self.add_document(2, self.beeld, 1)
+        db.session.commit()
+
+        doc.published_at = datetime.datetime(2014, 1, 3)
+        doc.medium = self.mg
+        db.session.commit()
+
+        self.assertEqual({(self.beeld.id, None, None): 1}, self.counts('documents', 1))
+        self.assertEqual({(self.mg.id, None, None): 1}, self.counts('documents', 3))
+
+        db.session.delete(doc)
+        db.session.commit()
+        self.assertEqual({}, self.counts('documents', 3))
+
+    def test_rollback_forgets_changes(self):
+        self.add_document(1, self.beeld, 1)
+        db.session.flush()
+        db.session.rollback()
+
+        self.add_document(2, self.mg, 2)
+        db.session.commit()
+
+        self.assertEqual({}, self.counts('documents', 1))
+        self.assertEqual({(self.mg.id, None, None): 1}, self.counts('documents', 2))
+
+    def test_refreshed_days(self):
+        self.add_document(1, self.beeld, 1)
+        db.session.commit()
+
+        day = DocumentRollupDay.query.one()
+        self.assertEqual((datetime.date(2014, 1, 1), self.beeld.id), (day.date, day.medium_id))
+        self.assertIsNotNone(day.refreshed_at)
+        self.assertEqual(0, PendingRollup.query.count())
+
+        # savepoints don't refresh
+        with patch.object(DocumentRollup, 'refresh') as refresh:
+            db.session.begin_nested()
+            self.add_document(2, self.beeld, 1)
+            db.session.commit()
+            self.assertFalse(refresh.called)
+
+            db.session.commit()
+            self.assertTrue(refresh.called)
+
+    def test_refresh_pending(self):
+        # the process dies before refreshing
+        with patch.object(DocumentRollup, 'refresh'):
+            self.add_document(1, self.beeld, 1)
+            db.session.commit()
+
+        self.assertEqual({}, self.counts('documents', 1))
+        self.assertEqual(1, PendingRollup.query.count())
+
+        self.assertEqual(0, DocumentRollup.refresh_pending())
+        self.assertEqual(1, DocumentRollup.refresh_pending(min_age=0))
+        self.assertEqual({(self.beeld.id, None, None): 1}, self.counts('documents', 1))
+        self.assertEqual(0, PendingRollup.query.count())
+
+    def test_summary(self):
+        self.add_document(1, self.beeld, 1)
+        self.add_document(2, self.beeld, 2)
+        self.add_document(3, self.beeld, 5)
+        db.session.commit()
+
+        rows = DocumentRollup.summary('topic', datetime.date(2014, 1, 1), datetime.date(2014, 1, 2)).all()
+        self.assertEqual(1, len(rows))
+        self.assertEqual(2, rows[0].record_count)
+        self.assertEqual(self.topic.name, rows[0].label)
+        self.assertEqual(self.beeld.group_name(), rows[0].medium_group)
+        self.assertEqual(self.beeld.medium_type, rows[0].medium_type)
+
+    def test_summary_renamed(self):
+        doc = self.add_document(1, self.beeld, 1)
+        ds = DocumentSource()
+        ds.person = Person.get_or_create('Jacob Zuma')
+        ds.affiliation = self.party
+        doc.sources.append(ds)
+        db.session.commit()
+
+        # renaming doesn't change the rollups, but shows up in summaries
+        self.topic.name = 'Renamed topic'
+        self.party.name = 'Renamed party'
+        ds.person.name = 'Renamed person'
+        db.session.commit()
+
+        row = DocumentRollup.summary('topic', datetime.date(2014, 1, 1), datetime.date(2014, 1, 1)).one()
+        self.assertEqual('Renamed topic', row.label)
+
+        row = DocumentRollup.summary('party_source', datetime.date(2014, 1, 1), datetime.date(2014, 1, 1)).one()
+        self.assertEqual('Renamed party', row.label)
+        self.assertEqual('Renamed person', row.sublabel)
+
+    def test_rebuild(self):
+        self.add_document(1, self.beeld, 1)
+        self.add_document(2, self.mg, 2)
+        db.session.commit()
+
+        before = sorted((r.date, r.medium_id, r.metric, r.label_id, r.person_id, r.sublabel, r.count) for r in DocumentRollup.query)
+        db.session.execute(DocumentRollup.__table__.delete())
+        db.session.commit()
+
+        self.assertEqual(2, DocumentRollup.rebuild())
+        after = sorted((r.date, r.medium_id, r.metric, r.label_id, r.person_id, r.sublabel, r.count) for r in DocumentRollup.query)
+        self.assertEqual(before, after)
+
+    def test_rebuild_in_place(self):
+        self.add_document(1, self.beeld, 1)
+        self.add_document(2, self.mg, 2)
+        db.session.commit()
+
+        # a wrong count, and a day without documents
+        DocumentRollup.query.filter(DocumentRollup.metric == 'documents', DocumentRollup.date == datetime.date(2014, 1, 2)).update({'count': 5})
+        db.session.execute(DocumentRollup.__table__.insert(), {
+            'date': datetime.date(2014, 1, 3), 'medium_id': self.mg.id, 'metric': 'documents', 'count': 1})
+        db.session.commit()
+
+        # other days are left alone while each day is rebuilt
+        refresh = DocumentRollup.refresh.im_func
+        seen = []
+        def check(cls, keys, pending=None):
+            seen.append(self.counts('documents', 2))
+            refresh(cls, keys, pending)
+
+        with patch.object(DocumentRollup, 'refresh', classmethod(check)):
+            self.assertEqual(3, DocumentRollup.rebuild(batch_size=1))
+
+        self.assertEqual({(self.mg.id, None, None): 5}, seen[0])
+        self.assertEqual({(self.beeld.id, None, None): 1}, self.counts('documents', 1))
+        self.assertEqual({(self.mg.id, None, None): 1}, self.counts('documents', 2))
+        self.assertEqual({}, self.counts('documents', 3))
@@ -0,0 +1,96 @@
+import unittest
+import tempfile
+import shutil
+
+from dexter.models import Document
+from dexter.processing.extractors import AlchemyExtractor, CalaisExtractor
+from dexter.processing.extractors.cache import FileCacheStore, SQLiteCacheStore, copy_cache
+
+
+class TestExtractorCache(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_put_get(self):
+        cache = SQLiteCacheStore(self.root + '/cache.db')
+        self.assertIsNone(cache.get('foo'))
+
+        cache.put('foo', {'entities': [u'caf\xe9']})
+        self.assertEqual({'entities': [u'caf\xe9']}, cache.get('foo'))
+
+        cache.put('foo', {'entities': []})
+        self.assertEqual({'entities': []}, cache.get('foo'))
+
+        stats = cache.stats()
+        self.assertEqual(2, stats['hits'])
+        self.assertEqual(1, stats['misses'])
+        self.assertEqual(1, stats['entries'])
+
+    def test_evict_lru(self):
+        cache = SQLiteCacheStore(self.root + '/cache.db')
+        for key in ['a', 'b', 'c']:
+            cache.put(key, 'x' * 1000)
+        size = cache.size()
+
+        # a is now more recently used than b
+        cache.get('a')
+        cache.max_size = size
+        cache.put('d', 'x' * 1000)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('d'))
+        self.assertLessEqual(cache.size(), size)
+
+    def test_extractor(self):
+        AlchemyExtractor.API_KEY = 'fake'
+        ex = AlchemyExtractor()
+        ex.cache = SQLiteCacheStore(self.root + '/cache.db')
+
+        doc = Document()
+        self.assertIsNone(ex.check_cache(doc, 'alchemy-entities'))
+
+        doc.text = u'Caf\xe9 society'
+        self.assertIsNone(ex.check_cache(doc, 'alchemy-entities'))
+        ex.update_cache(doc, 'alchemy-entities', {'status': 'OK'})
+        self.assertEqual({'status': 'OK'}, ex.check_cache(doc, 'alchemy-entities'))
+        self.assertIsNone(ex.check_cache(doc, 'alchemy-keywords'))
+
+        # same text, no URL
+        other = Document()
+        other.text = u'Caf\xe9 society \n'
+        self.assertEqual({'status': 'OK'}, ex.check_cache(other, 'alchemy-entities'))
+
+        # edited text
+        other.text = u'Caf\xe9 society.'
+        self.assertIsNone(ex.check_cache(other, 'alchemy-entities'))
+
+        # new extractor version
+        ex.VERSION = 2
+        self.assertIsNone(ex.check_cache(doc, 'alchemy-entities'))
+
+    def test_rekey(self):
+        ex = CalaisExtractor()
+        ex.cache = SQLiteCacheStore(self.root + '/cache.db')
+
+        doc = Document()
+        doc.url = 'http://foo.com'
+        doc.text = u'Some text'
+        ex.cache.put(ex.url_cache_key(doc.url, 'calais'), {'foo': 'bar'})
+
+        self.assertEqual(1, ex.rekey_cache(doc))
+        self.assertEqual({'foo': 'bar'}, ex.check_cache(doc, 'calais'))
+        self.assertEqual(0, ex.rekey_cache(doc))
+
+    def test_migrate(self):
+        old = FileCacheStore(self.root + '/extractors')
+        old.put('abc.alchemy-entities', {'status': 'OK'})
+        old.put('def.calais', [1, 2])
+
+        new = SQLiteCacheStore(self.root + '/cache.db')
+        self.assertEqual(2, copy_cache(old, new))
+        self.assertEqual({'status': 'OK'}, new.get('abc.alchemy-entities'))
+        self.assertEqual([1, 2], new.get('def.calais'))
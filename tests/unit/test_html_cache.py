@@ -0,0 +1,95 @@
+import os
+import unittest
+import tempfile
+import shutil
+
+from mock import MagicMock, patch
+from requests.models import Response
+
+from dexter.processing import ProcessingError
+from dexter.processing.crawlers.base import BaseCrawler
+from dexter.processing.crawlers.html_cache import HTMLCache
+from dexter.processing.extractors.cache import SQLiteCacheStore
+
+def response(status, content='', headers=None):
+    r = Response()
+    r.status_code = status
+    r._content = content
+    r.encoding = 'utf-8'
+    r.headers.update(headers or {})
+    return r
+
+
+class TestHTMLCache(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+        self.crawler = BaseCrawler()
+        self.store = SQLiteCacheStore(self.root + '/crawlers.db')
+        self.crawler.html_cache = HTMLCache(self.store)
+        self.crawler.http = MagicMock()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_put_get(self):
+        cache = self.crawler.html_cache
+        self.assertIsNone(cache.get('http://www.iol.co.za/foo'))
+
+        cache.put('http://www.iol.co.za/foo', response(200, '<p>caf\xc3\xa9</p>', {'ETag': '"abc"'}))
+
+        r = cache.get('http://www.iol.co.za/foo')
+        self.assertEqual(u'<p>caf\xe9</p>', r.text)
+        self.assertEqual('"abc"', r.headers['etag'])
+        self.assertEqual(1, cache.stats()['entries'])
+
+    def test_binary(self):
+        cache = self.crawler.html_cache
+        cache.put('http://www.iol.co.za/foo', response(200, '\xff\x00\xfe'))
+        self.assertEqual('\xff\x00\xfe', cache.get('http://www.iol.co.za/foo').content)
+
+    def test_evicted(self):
+        cache = HTMLCache(SQLiteCacheStore(self.root + '/small.db', max_size=2000))
+        cache.put('http://www.iol.co.za/foo', response(200, os.urandom(1000)))
+        cache.put('http://www.iol.co.za/bar', response(200, os.urandom(1000)))
+
+        self.assertIsNone(cache.get('http://www.iol.co.za/foo'))
+        self.assertIsNotNone(cache.get('http://www.iol.co.za/bar'))
+
+    def test_directory_created_concurrently(self):
+        cache = HTMLCache(SQLiteCacheStore(self.root + '/new/crawlers.db'))
+
+        # another thread creates the directory after we've checked for it
+        exists = os.path.exists
+        def racing_exists(path):
+            result = exists(path)
+            if path == self.root + '/new':
+                os.mkdir(path)
+            return result
+
+        with patch('os.path.exists', racing_exists):
+            cache.put('http://www.iol.co.za/foo', response(200, 'first'))
+        self.assertEqual('first', cache.get('http://www.iol.co.za/foo').content)
+
+    def test_conditional_get(self):
+        self.crawler.http.get.return_value = response(200, 'first', {'ETag': '"abc"', 'Last-Modified': 'yesterday'})
+        self.assertEqual('first', self.crawler.fetch('http://www.iol.co.za/foo'))
+
+        self.crawler.http.get.return_value = response(304)
+        self.assertEqual('first', self.crawler.fetch('http://www.iol.co.za/foo'))
+        self.crawler.http.get.assert_called_with('http://www.iol.co.za/foo', headers={
+            'If-None-Match': '"abc"',
+            'If-Modified-Since': 'yesterday'})
+
+        self.crawler.http.get.return_value = response(200, 'second')
+        self.assertEqual('second', self.crawler.fetch('http://www.iol.co.za/foo'))
+
+    def test_offline(self):
+        self.crawler.http.get.return_value = response(200, 'first')
+        self.crawler.fetch('http://www.iol.co.za/foo')
+
+        self.crawler.offline = True
+        self.assertEqual('first', self.crawler.fetch('http://www.iol.co.za/foo'))
+        self.assertEqual(1, self.crawler.http.get.call_count)
+
+        self.assertRaises(ProcessingError, self.crawler.fetch, 'http://www.iol.co.za/bar')
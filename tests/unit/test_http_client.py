@@ -0,0 +1,52 @@
+import unittest
+
+from mock import patch, MagicMock
+from requests.exceptions import HTTPError, ConnectionError
+
+from dexter.processing.crawlers.http_client import HTTPClient
+
+def response(status):
+    r = MagicMock()
+    r.status_code = status
+    if status >= 400:
+        r.raise_for_status.side_effect = HTTPError('%d error' % status)
+    return r
+
+
+class TestHTTPClient(unittest.TestCase):
+    def setUp(self):
+        self.client = HTTPClient(retries=2)
+        self.client.session = MagicMock()
+
+        self.sleep = patch('time.sleep')
+        self.sleep.start()
+
+    def tearDown(self):
+        self.sleep.stop()
+
+    def test_get(self):
+        self.client.session.get.return_value = response(200)
+        self.assertEqual(200, self.client.get('http://www.iol.co.za/foo').status_code)
+
+    def test_retry_server_error(self):
+        self.client.session.get.side_effect = [response(503), ConnectionError('reset'), response(200)]
+        self.assertEqual(200, self.client.get('http://www.iol.co.za/foo').status_code)
+        self.assertEqual(3, self.client.session.get.call_count)
+
+    def test_give_up(self):
+        self.client.session.get.return_value = response(503)
+        self.assertRaises(HTTPError, self.client.get, 'http://www.iol.co.za/foo')
+        self.assertEqual(3, self.client.session.get.call_count)
+
+    def test_no_retry_not_found(self):
+        self.client.session.get.return_value = response(404)
+        self.assertRaises(HTTPError, self.client.get, 'http://www.iol.co.za/foo')
+        self.assertEqual(1, self.client.session.get.call_count)
+
+    def test_host_semaphore(self):
+        self.assertIs(
+            self.client.host_semaphore('http://www.iol.co.za/foo'),
+            self.client.host_semaphore('http://WWW.iol.co.za/bar'))
+        self.assertIsNot(
+            self.client.host_semaphore('http://www.iol.co.za/foo'),
+            self.client.host_semaphore('http://www.news24.com/foo'))
@@ -0,0 +1,133 @@
+import datetime
+import unittest
+
+from mock import patch
+from requests.exceptions import HTTPError
+
+from dexter.models import Document, Job
+from dexter.models.support import db
+from dexter.models.seeds import seed_db
+from dexter.processing import JobRunner
+from dexter.processing.crawlers import MGCrawler
+from dexter.processing.extractors import AlchemyExtractor, CalaisExtractor
+
+HTML = """
+<div class="headline_printable">title</div>
+<div class="body_printable"><p>body</p></div>
+<div class="content_place_line">2013/12/22</div>
+"""
+
+def fake_fetch(self, url):
+    if 'broken' in url:
+        raise HTTPError('404 Not Found')
+    return HTML
+
+
+class TestJobRunner(unittest.TestCase):
+    def setUp(self):
+        self.db = db
+        self.db.drop_all()
+        self.db.create_all()
+        seed_db(db)
+
+        AlchemyExtractor.API_KEY = 'fake'
+
+        self.patches = [
+            patch.object(MGCrawler, 'fetch', fake_fetch),
+            patch.object(AlchemyExtractor, 'fetch_entities', return_value=[]),
+            patch.object(AlchemyExtractor, 'fetch_keywords', return_value=[]),
+            patch.object(CalaisExtractor, 'fetch_data', return_value={}),
+        ]
+        for p in self.patches:
+            p.start()
+
+        self.runner = JobRunner('test')
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.db.session.remove()
+        self.db.drop_all()
+
+    def test_claim(self):
+        first = Job.enqueue('process_url', {'url': 'http://mg.co.za/article/2013-12-22-foo'})
+        second = Job.enqueue('process_url', {'url': 'http://mg.co.za/article/2013-12-22-bar'})
+        db.session.commit()
+
+        self.assertEqual(first.id, Job.claim('test').id)
+        self.assertEqual(second.id, Job.claim('test').id)
+        self.assertIsNone(Job.claim('test'))
+
+        job = Job.query.get(first.id)
+        self.assertEqual(Job.RUNNING, job.status)
+        self.assertEqual('test', job.worker)
+        self.assertEqual(1, job.attempts)
+
+    def test_process_url(self):
+        Job.enqueue('process_url', {'url': 'http://mg.co.za/article/2013-12-22-foo'})
+        db.session.commit()
+
+        job = self.runner.run_next()
+        self.assertEqual(Job.DONE, job.status)
+        self.assertIsNotNone(job.finished_at)
+
+        doc = Document.query.get(job.get_result()['document_id'])
+        self.assertEqual('title', doc.title)
+
+        # already exists
+        Job.enqueue('process_url', {'url': 'http://mg.co.za/article/2013-12-22-foo'})
+        db.session.commit()
+
+        job = self.runner.run_next()
+        self.assertEqual({'document_id': doc.id, 'existing': True}, job.get_result())
+        self.assertEqual(1, Document.query.count())
+
+        self.assertIsNone(self.runner.run_next())
+
+    def test_failed(self):
+        Job.enqueue('process_url', {'url': 'http://mg.co.za/article/2013-12-22-broken'})
+        Job.enqueue('unknown', {})
+        db.session.commit()
+
+        job = self.runner.run_next()
+        self.assertEqual(Job.FAILED, job.status)
+        self.assertIn('404', job.error)
+
+        job = self.runner.run_next()
+        self.assertEqual(Job.FAILED, job.status)
+        self.assertEqual(0, Document.query.count())
+
+    def test_reclaim_abandoned(self):
+        job = Job.enqueue('process_url', {'url': 'http://mg.co.za/article/2013-12-22-foo'})
+        db.session.commit()
+        self.assertEqual(job.id, Job.claim('dead').id)
+
+        # still alive
+        self.assertIsNone(Job.claim('test'))
+
+        # the worker died
+        job = Job.query.get(job.id)
+        job.heartbeat_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=Job.STALE_AFTER + 1)
+        db.session.commit()
+
+        job = self.runner.run_next()
+        self.assertEqual(Job.DONE, job.status)
+        self.assertEqual('test', job.worker)
+        self.assertEqual(2, job.attempts)
+
+    def test_abandoned_too_often(self):
+        job = Job.enqueue('process_url', {'url': 'http://mg.co.za/article/2013-12-22-foo'})
+        db.session.commit()
+        self.assertEqual(job.id, Job.claim('dead').id)
+
+        job = Job.query.get(job.id)
+        job.attempts = Job.MAX_ATTEMPTS
+        job.heartbeat_at = datetime.datetime.utcnow() - datetime.timedelta(seconds=Job.STALE_AFTER + 1)
+        db.session.commit()
+
+        self.assertIsNone(Job.claim('test'))
+
+        job = Job.query.get(job.id)
+        self.assertEqual(Job.FAILED, job.status)
+        self.assertIsNotNone(job.error)
+        self.assertIsNotNone(job.finished_at)
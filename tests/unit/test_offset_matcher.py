@@ -0,0 +1,28 @@
+import unittest
+
+from dexter.processing.extractors.matcher import OffsetMatcher
+
+class TestOffsetMatcher(unittest.TestCase):
+    def test_offsets(self):
+        m = OffsetMatcher('she said his name, he said hers')
+        self.assertEqual([(1, 2), (19, 2), (27, 2)], m.offsets('he'))
+        self.assertEqual([(4, 4), (22, 4)], m.offsets('said'))
+        self.assertEqual([], m.offsets('He'))
+        self.assertEqual('4:4 22:4', m.offset_list('said'))
+
+    def test_no_overlaps(self):
+        m = OffsetMatcher('aaaaa')
+        self.assertEqual([(0, 2), (2, 2)], m.offsets('aa'))
+
+    def test_first(self):
+        m = OffsetMatcher('foo bar baz bar')
+        self.assertEqual((4, 3), m.first('bar'))
+        self.assertIsNone(m.first('bam'))
+        self.assertIsNone(m.first(''))
+
+    def test_remembers(self):
+        m = OffsetMatcher('foo bar')
+        self.assertEqual([(4, 3)], m.offsets('bar'))
+
+        m.text = 'changed'
+        self.assertEqual([(4, 3)], m.offsets('bar'))
@@ -0,0 +1,104 @@
+import unittest
+import tempfile
+import shutil
+import datetime
+
+from mock import patch
+
+from dexter.models import Document, Entity
+from dexter.models.support import db
+from dexter.models.seeds import seed_db
+from dexter.processing import Reextractor, ProcessingError
+from dexter.processing.extractors import AlchemyExtractor, CalaisExtractor
+from dexter.processing.extractors.base import BaseExtractor
+from dexter.processing.extractors.cache import SQLiteCacheStore
+
+ENTITIES = {
+    'status': 'OK',
+    'entities': [{
+        'type': 'Person',
+        'relevance': '0.7',
+        'count': '1',
+        'text': 'Jacob Zuma',
+    }],
+}
+
+
+class TestReextractor(unittest.TestCase):
+    def setUp(self):
+        self.db = db
+        self.db.drop_all()
+        self.db.create_all()
+        seed_db(db)
+
+        self.root = tempfile.mkdtemp()
+        self.cache = BaseExtractor.cache
+        BaseExtractor.cache = SQLiteCacheStore(self.root + '/cache.db')
+
+        AlchemyExtractor.API_KEY = 'fake'
+        self.alchemy = AlchemyExtractor()
+        self.calais = CalaisExtractor()
+
+        self.docs = []
+        for i in range(5):
+            doc = Document()
+            doc.text = u'Jacob Zuma said something %d.' % i
+            doc.published_at = datetime.datetime(2014, 1, 1)
+            doc.medium_id = 1
+            db.session.add(doc)
+            self.docs.append(doc)
+        db.session.commit()
+
+        # cache responses for all but the last document
+        for doc in self.docs[:-1]:
+            self.alchemy.update_cache(doc, 'alchemy-entities', ENTITIES)
+            self.alchemy.update_cache(doc, 'alchemy-keywords', {'status': 'OK', 'keywords': []})
+            self.calais.update_cache(doc, 'calais', {'doc': {'info': {}}})
+
+        self.ids = [d.id for d in self.docs]
+
+    def tearDown(self):
+        BaseExtractor.cache = self.cache
+        shutil.rmtree(self.root)
+        self.db.session.remove()
+        self.db.drop_all()
+
+    def test_reextract(self):
+        counts = Reextractor(processes=0, chunk_size=2).run()
+        self.assertEqual({'processed': 4, 'skipped': 1, 'failed': 0}, counts)
+        self.assertFalse(BaseExtractor.offline)
+
+        doc = Document.query.get(self.ids[0])
+        self.assertEqual(['Jacob Zuma'], [de.entity.name for de in doc.entities])
+
+        # the skipped document isn't changed at all
+        doc = Document.query.get(self.ids[-1])
+        self.assertEqual([], doc.entities)
+        self.assertEqual([], doc.fairness)
+        self.assertIsNone(doc.document_type)
+
+        # running again doesn't duplicate anything
+        Reextractor(processes=0, chunk_size=2, reset=True).run()
+        doc = Document.query.get(self.ids[0])
+        self.assertEqual(['Jacob Zuma'], [de.entity.name for de in doc.entities])
+        self.assertEqual(1, Entity.query.count())
+
+    def test_checkpoint(self):
+        checkpoint = self.root + '/checkpoint.json'
+
+        r = Reextractor(processes=0, chunk_size=2, checkpoint=checkpoint)
+        r.run(db.session.query(Document.id).filter(Document.id <= self.ids[1]))
+        self.assertEqual(self.ids[1], r.last_id)
+
+        # resumes after the first two
+        r = Reextractor(processes=0, chunk_size=2, checkpoint=checkpoint)
+        counts = r.run()
+        self.assertEqual({'processed': 4, 'skipped': 1, 'failed': 0}, counts)
+        self.assertEqual(self.ids[-1], r.last_id)
+
+    def test_online_errors_fail(self):
+        with patch.object(AlchemyExtractor, 'fetch_entities', side_effect=ProcessingError('API error')):
+            counts = Reextractor(processes=0, chunk_size=2, offline=False).run()
+
+        self.assertEqual({'processed': 0, 'skipped': 0, 'failed': 5}, counts)
+        self.assertEqual([], Document.query.get(self.ids[0]).fairness)
@@ -0,0 +1,78 @@
+import unittest
+
+from sqlalchemy import event
+from sqlalchemy.orm.exc import NoResultFound
+
+from dexter.models import Gender, Medium, Person
+from dexter.models.support import db
+from dexter.models.seeds import seed_db
+from dexter.models.reference import reference
+
+
+class TestReferenceCache(unittest.TestCase):
+    def setUp(self):
+        self.db = db
+        self.db.drop_all()
+        self.db.create_all()
+        seed_db(db)
+
+        self.queries = []
+        event.listen(db.engine, 'before_cursor_execute', self.count_query)
+
+    def tearDown(self):
+        event.remove(db.engine, 'before_cursor_execute', self.count_query)
+        self.db.session.remove()
+        self.db.drop_all()
+
+    def count_query(self, conn, cursor, statement, *args):
+        self.queries.append(statement)
+
+    def test_cached(self):
+        self.assertEqual('Male', Gender.male().name)
+        self.queries = []
+
+        male = Gender.male()
+        self.assertEqual('Female', Gender.female().name)
+        self.assertEqual(['Female', 'Male', 'Other: Transgender, Transsexual'],
+                         [g.name for g in reference.all(Gender, order_by='name')])
+        self.assertEqual(male, reference.get(Gender, str(male.id)))
+        self.assertIsNone(reference.get(Gender, ''))
+        self.assertEqual([], self.queries)
+
+        self.assertRaises(NoResultFound, reference.one, Gender, name='Nobody')
+
+    def test_usable_in_session(self):
+        p = Person()
+        p.name = 'Jacob Zuma'
+        p.gender = Gender.male()
+        db.session.add(p)
+        db.session.commit()
+
+        self.assertEqual('Male', Person.query.one().gender.name)
+
+    def test_invalidate_on_change(self):
+        self.assertEqual(3, len(reference.all(Gender)))
+
+        g = Gender()
+        g.name = 'Unknown'
+        db.session.add(g)
+        db.session.commit()
+        self.assertEqual(4, len(reference.all(Gender)))
+
+        m = reference.one(Medium, name='Unknown')
+        m.name = 'Unknown medium'
+        db.session.commit()
+        self.assertEqual('Unknown medium', reference.get(Medium, m.id).name)
+
+    def test_rolled_back_change(self):
+        self.assertEqual(3, len(reference.all(Gender)))
+
+        g = Gender()
+        g.name = 'Unknown'
+        db.session.add(g)
+        db.session.flush()
+        reference.all(Gender)
+        db.session.rollback()
+
+        self.assertEqual(3, len(reference.all(Gender)))
+        self.assertEqual(3, Gender.query.count())
@@ -0,0 +1,75 @@
+import gzip
+import unittest
+import tempfile
+
+from mock import MagicMock, patch
+
+from dexter.models import Document
+from dexter.models.support import db
+from dexter.models.seeds import seed_db
+from dexter.processing.tabular import CSVBuilder, ParquetBuilder
+
+from tests.fixtures import dbfixture, DocumentData
+
+
+class TestTabularBuilder(unittest.TestCase):
+    def setUp(self):
+        self.db = db
+        self.db.drop_all()
+        self.db.create_all()
+        seed_db(db)
+
+        self.fx = dbfixture.data(DocumentData)
+        self.fx.setup()
+
+        self.form = MagicMock()
+        self.form.filter_query = lambda q: q.filter(Document.published_at >= '2012-02-01')
+        self.form.sheet.data = 'documents'
+
+    def tearDown(self):
+        self.fx.teardown()
+        self.db.session.remove()
+        self.db.drop_all()
+
+    def fake_sheet(self, builder):
+        # the views only exist in mysql, so use the documents table instead
+        table = Document.__table__
+        query = db.session.query(table.c.id, table.c.title, table.c.published_at, table.c.summary)\
+                .select_from(table)
+        return patch.object(builder, 'sheet_query', return_value=builder.filter(query))
+
+    def test_csv(self):
+        builder = CSVBuilder(self.form)
+
+        with self.fake_sheet(builder):
+            output = builder.build()
+
+        lines = gzip.GzipFile(fileobj=output, mode='rb').read().splitlines()
+        self.assertEqual([
+            'id,title,published_at,summary',
+            '%d,Another title,2012-03-03 00:00:00,Another document summary' % self.fx.DocumentData.simple2.id,
+            ], lines)
+
+    def test_columns(self):
+        builder = CSVBuilder(self.form)
+        table = Document.__table__
+        query = db.session.query(table.c.title, table.c.id, table.c.title)
+
+        self.assertEqual(['title', 'id', 'title'], [c for c, _ in builder.columns(query)])
+        self.assertEqual(['id', 'title'], [c for c, _ in builder.columns(query, dedup=True)])
+
+    def test_unknown_sheet(self):
+        self.form.sheet.data = 'secrets'
+        self.assertRaises(ValueError, CSVBuilder, self.form)
+
+    @unittest.skipUnless(ParquetBuilder.available(), "pyarrow isn't installed")
+    def test_parquet(self):
+        import pyarrow.parquet as pq
+
+        builder = ParquetBuilder(self.form)
+        with self.fake_sheet(builder):
+            output = builder.build()
+
+        table = pq.read_table(output)
+        self.assertEqual(['id', 'title', 'published_at', 'summary'], table.schema.names)
+        self.assertEqual(1, table.num_rows)
@@ -0,0 +1,107 @@
+import unittest
+import tempfile
+import zipfile
+
+import xlsxwriter
+from mock import MagicMock
+from sqlalchemy import event
+from sqlalchemy.util import KeyedTuple
+
+from dexter.models import Document
+from dexter.models.support import db
+from dexter.models.seeds import seed_db
+from dexter.processing.xlsx import XLSXBuilder
+
+from tests.fixtures import dbfixture, DocumentData
+
+
+class TestXLSXBuilder(unittest.TestCase):
+    def setUp(self):
+        self.builder = XLSXBuilder(MagicMock())
+
+        self.output = tempfile.TemporaryFile()
+        self.wb = xlsxwriter.Workbook(self.output, {'constant_memory': True})
+        self.builder.formats['bold'] = self.wb.add_format({'bold': True})
+
+    def tearDown(self):
+        self.output.close()
+
+    def sheet_xml(self):
+        self.wb.close()
+        self.output.seek(0)
+        return zipfile.ZipFile(self.output).read('xl/worksheets/sheet1.xml')
+
+    def test_write_table_from_iterator(self):
+        ws = self.wb.add_worksheet('documents')
+        rows = (KeyedTuple([i, 'title %d' % i], ['id', 'title']) for i in xrange(3))
+
+        self.builder.write_table(ws, rows)
+
+        xml = self.sheet_xml()
+        self.assertIn('<autoFilter ref="A1:B4"/>', xml)
+        self.assertIn('title 2', xml)
+        self.assertLess(xml.index('>id<'), xml.index('title 0'))
+
+    def test_write_table_dedup(self):
+        ws = self.wb.add_worksheet('fairness')
+        rows = iter([KeyedTuple([1, 'b', 1], ['document_id', 'bias', 'document_id'])])
+
+        self.builder.write_table(ws, rows, dedup=True)
+
+        xml = self.sheet_xml()
+        self.assertIn('<autoFilter ref="A1:B2"/>', xml)
+        self.assertLess(xml.index('>bias<'), xml.index('>document_id<'))
+
+    def test_write_table_empty(self):
+        ws = self.wb.add_worksheet('sources')
+        self.builder.write_table(ws, iter([]))
+
+        self.assertNotIn('autoFilter', self.sheet_xml())
+
+
+class TestXLSXBuilderFilter(unittest.TestCase):
+    def setUp(self):
+        self.db = db
+        self.db.drop_all()
+        self.db.create_all()
+        seed_db(db)
+
+        self.fx = dbfixture.data(DocumentData)
+        self.fx.setup()
+
+    def tearDown(self):
+        self.fx.teardown()
+        self.db.session.remove()
+        self.db.drop_all()
+
+    def test_filter(self):
+        form = MagicMock()
+        form.filter_query = lambda q: q.filter(Document.published_at >= '2012-02-01')
+
+        builder = XLSXBuilder(form)
+        query = builder.filter(Document.query)
+
+        self.assertEqual([self.fx.DocumentData.simple2.id], [d.id for d in query])
+        # the filter is a join, not a list of ids
+        self.assertNotIn(' IN ', str(query))
+
+    def test_stream_pages(self):
+        form = MagicMock()
+        form.filter_query = lambda q: q
+        builder = XLSXBuilder(form)
+        builder.PAGE_SIZE = 1
+
+        statements = []
+        def count_rows(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'after_cursor_execute', count_rows)
+        try:
+            # the views only exist in mysql, so use the documents table instead
+            rows = list(builder.stream(builder.filter(Document.query)))
+        finally:
+            event.remove(db.engine, 'after_cursor_execute', count_rows)
+
+        ids = [self.fx.DocumentData.simple.id, self.fx.DocumentData.simple2.id]
+        self.assertEqual(ids, [r.id for r in rows])
+        # a page of ids and a page of rows for each document, then an empty page
+        self.assertEqual(5, len(statements))
@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+#
+# Run background jobs, such as processing new articles, as they're queued.
+#
+#   python worker.py
+#
+# Run as many of these as you like; each job is only run once.
+#
+import argparse
+
+from dexter.core import app
+from dexter.processing import JobRunner
+
+parser = argparse.ArgumentParser(description='Run background jobs.')
+parser.add_argument('--poll-interval', type=float, default=1, help='seconds to wait between checks for new jobs')
+parser.add_argument('--once', action='store_true', help='run all pending jobs and then exit')
+args = parser.parse_args()
+
+runner = JobRunner()
+
+if args.once:
+    while runner.run_next():
+        pass
+else:
+    runner.run_forever(poll_interval=args.poll_interval)